@@ -1,4 +1,5 @@
 import re
+import time
 import logging
 from datetime import datetime
 
@@ -20,6 +21,38 @@ def convert_bengali_numerals_to_english(text):
         text = text.replace(bengali, english)
     return text
 
+# Date of birth formats, tried in order.
+# Prioritize DD-MM-YYYY, then YYYY-MM-DD, then MM-DD-YYYY
+DATE_FORMATS = ["%d-%m-%Y", "%Y-%m-%d", "%m-%d-%Y", "%d/%m/%Y", "%Y/%m/%d", "%m/%d/%Y"]
+
+# Records start on a new line with a Bengali or English number followed by a dot.
+RECORD_BOUNDARY_PATTERN = re.compile(r'\n\s*(?=(?:[০-৯]+|[0-9]+)\.)')
+
+REQUIRED_FIELDS = ('ক্রমিক_নং', 'নাম', 'ভোটার_নং')
+
+# Rejected records keep at most this much of their raw text.
+MAX_REJECTED_RAW_TEXT = 2000
+
+def parse_date_of_birth(dob_str):
+    """
+    Parses a date of birth string (Bengali or English numerals).
+    Returns (datetime, matched_format), or (None, None) if no format matches.
+    """
+    if not dob_str:
+        return None, None
+    dob_str_english = convert_bengali_numerals_to_english(dob_str)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(dob_str_english, fmt), fmt
+        except ValueError:
+            continue # Try next format
+    return None, None
+
+def age_from_birth_date(birth_date):
+    """Returns the age in completed years for a birth date."""
+    today = datetime.today()
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
 def calculate_age(dob_str):
     """
     Calculates age from a date of birth string.
@@ -28,92 +61,153 @@ def calculate_age(dob_str):
     """
     if not dob_str:
         return None
-    
-    # Convert any Bengali numerals to English first
-    dob_str_english = convert_bengali_numerals_to_english(dob_str)
 
     try:
-        # Attempt to parse common date formats
-        # Prioritize DD-MM-YYYY, then YYYY-MM-DD, then MM-DD-YYYY
-        for fmt in ["%d-%m-%Y", "%Y-%m-%d", "%m-%d-%Y", "%d/%m/%Y", "%Y/%m/%d", "%m/%d/%Y"]:
-            try:
-                birth_date = datetime.strptime(dob_str_english, fmt)
-                today = datetime.today()
-                age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-                return age
-            except ValueError:
-                continue # Try next format
-        logger.warning(f"Could not parse date of birth string: {dob_str}. Returning None for age.")
-        return None
+        birth_date, _ = parse_date_of_birth(dob_str)
+        if birth_date is None:
+            logger.warning(f"Could not parse date of birth string: {dob_str}. Returning None for age.")
+            return None
+        return age_from_birth_date(birth_date)
     except Exception as e:
         logger.error(f"Error calculating age for '{dob_str}': {e}")
         return None
 
-def process_text_file(content, default_gender=None):
-    """Process the text file content and extract structured data."""
+def split_records_with_positions(content):
+    """
+    Splits raw file content into record texts.
+    Yields (record_text, line_no, byte_offset) where line_no is 1-based and
+    byte_offset is the UTF-8 offset of that line in the original content.
+    """
+    # Byte offset of every line start in the original (un-normalised) content
+    line_offsets = [0]
+    for line in content.split('\n'):
+        line_offsets.append(line_offsets[-1] + len(line.encode('utf-8')) + 1)
+
+    # Remove BOM and normalize newlines
+    normalised = content.replace('\ufeff', '').replace('\r\n', '\n')
+    body = normalised.strip()
+    leading = normalised[:len(normalised) - len(normalised.lstrip())]
+
+    line_no = leading.count('\n') + 1
+    position = 0
+    start = 0
+    for boundary in RECORD_BOUNDARY_PATTERN.finditer(body):
+        line_no += body.count('\n', position, start)
+        position = start
+        yield body[start:boundary.start()], line_no, line_offsets[line_no - 1]
+        start = boundary.end()
+    line_no += body.count('\n', position, start)
+    yield body[start:], line_no, line_offsets[line_no - 1]
+
+def extract_record_fields(record, default_gender=None):
+    """Extracts the known fields from one raw record text into a dict."""
+    record_dict = {}
+
+    # Define field patterns with more flexible matching
+    field_patterns = {
+        'ক্রমিক_নং': (r'^([০-৯]+|[0-9]+)\.', True),  # True means take full match
+        'নাম': (r'নাম:?\s*([^,\n।]+)', False),
+        'ভোটার_নং': (r'ভোটার\s*নং:?\s*([^,\n।]+)', False),
+        'পিতার_নাম': (r'পিতা:?\s*([^,\n।]+)', False),
+        'মাতার_নাম': (r'মাতা:?\s*([^,\n।]+)', False),
+        'পেশা': (r'পেশা:?\s*([^,।\n]+)', False),
+        'জন্ম_তারিখ': (r'জন্ম\s*তারিখ:?\s*([^,\n।]+)', False),
+        'ঠিকানা': (r'ঠিকানা:?\s*([^,\n।]+(?:[,\n।][^,\n।]+)*)', False),
+        'gender': (r'লিঙ্গ:?\s*(পুরুষ|মহিলা|অন্যান্য|Male|Female|Other)', False) # Added gender pattern
+    }
+
+    # Extract each field
+    for field, (pattern, full_match) in field_patterns.items():
+        match = re.search(pattern, record, re.MULTILINE | re.IGNORECASE) # Ignore case for gender
+        if match:
+            # For ক্রমিক_নং, take the full match and remove the dot
+            value = match.group(0).strip() if full_match else match.group(1).strip()
+            if field == 'ক্রমিক_নং':
+                value = value.rstrip('.')
+            record_dict[field] = value.strip()
+
+    # If gender not found in text, use default_gender
+    if 'gender' not in record_dict and default_gender:
+        record_dict['gender'] = default_gender
+
+    return record_dict
+
+def process_text_file_with_report(content, default_gender=None):
+    """
+    Process the text file content and extract structured data, with diagnostics.
+
+    Returns (records, report). The report holds records_found, records_accepted,
+    records_rejected, rejected_by_reason, date_formats (matched format -> count,
+    plus 'unparsed' and 'missing'), parse_seconds, accepted_positions (the
+    (line_no, byte_offset) of each accepted record, parallel to records) and
+    rejected_records (line_no, byte_offset, reason, detail and raw_text of
+    every rejected record).
+    """
+    started = time.perf_counter()
     records = []
+    report = {
+        'records_found': 0,
+        'records_accepted': 0,
+        'records_rejected': 0,
+        'rejected_by_reason': {},
+        'date_formats': {},
+        'parse_seconds': 0.0,
+        'accepted_positions': [],
+        'rejected_records': [],
+    }
+    date_formats = report['date_formats']
 
     try:
-        # Remove BOM and normalize newlines
-        content = content.strip().replace('\ufeff', '').replace('\r\n', '\n')
-
-        # Split into records using both Bengali and English numerals
-        # This pattern looks for lines starting with numbers followed by a dot
-        raw_records = re.split(r'\n\s*(?=(?:[০-৯]+|[0-9]+)\.)', content)
-        logger.info(f"Initial split found {len(raw_records)} potential records")
-
-        for record in raw_records:
+        for record, line_no, byte_offset in split_records_with_positions(content):
             if not record.strip():
                 continue
+            report['records_found'] += 1
 
             logger.debug(f"Processing record: {record[:100]}...")
-            record_dict = {}
-
-            # Define field patterns with more flexible matching
-            field_patterns = {
-                'ক্রমিক_নং': (r'^([০-৯]+|[0-9]+)\.', True),  # True means take full match
-                'নাম': (r'নাম:?\s*([^,\n।]+)', False),
-                'ভোটার_নং': (r'ভোটার\s*নং:?\s*([^,\n।]+)', False),
-                'পিতার_নাম': (r'পিতা:?\s*([^,\n।]+)', False),
-                'মাতার_নাম': (r'মাতা:?\s*([^,\n।]+)', False),
-                'পেশা': (r'পেশা:?\s*([^,।\n]+)', False),
-                'জন্ম_তারিখ': (r'জন্ম\s*তারিখ:?\s*([^,\n।]+)', False),
-                'ঠিকানা': (r'ঠিকানা:?\s*([^,\n।]+(?:[,\n।][^,\n।]+)*)', False),
-                'gender': (r'লিঙ্গ:?\s*(পুরুষ|মহিলা|অন্যান্য|Male|Female|Other)', False) # Added gender pattern
-            }
-
-            # Extract each field
-            for field, (pattern, full_match) in field_patterns.items():
-                match = re.search(pattern, record, re.MULTILINE | re.IGNORECASE) # Ignore case for gender
-                if match:
-                    # For ক্রমিক_নং, take the full match and remove the dot
-                    value = match.group(0).strip() if full_match else match.group(1).strip()
-                    if field == 'ক্রমিক_নং':
-                        value = value.rstrip('.')
-                    record_dict[field] = value.strip()
-            
-            # If gender not found in text, use default_gender
-            if 'gender' not in record_dict and default_gender:
-                record_dict['gender'] = default_gender
+            record_dict = extract_record_fields(record, default_gender)
 
             # Calculate age from 'জন্ম_তারিখ'
             dob = record_dict.get('জন্ম_তারিখ')
+            record_dict['age'] = None # Ensure age is set to None if DOB is missing
             if dob:
-                record_dict['age'] = calculate_age(dob)
+                birth_date, fmt = parse_date_of_birth(dob)
+                if birth_date is not None:
+                    record_dict['age'] = age_from_birth_date(birth_date)
+                    date_formats[fmt] = date_formats.get(fmt, 0) + 1
+                else:
+                    date_formats['unparsed'] = date_formats.get('unparsed', 0) + 1
             else:
-                record_dict['age'] = None # Ensure age is set to None if DOB is missing
+                date_formats['missing'] = date_formats.get('missing', 0) + 1
 
             # Only add records that have at least a few key fields
-            required_fields = {'ক্রমিক_নং', 'নাম', 'ভোটার_নং'}
-            if all(field in record_dict for field in required_fields):
+            missing_fields = [field for field in REQUIRED_FIELDS if field not in record_dict]
+            if not missing_fields:
                 records.append(record_dict)
+                report['accepted_positions'].append((line_no, byte_offset))
                 logger.debug(f"Added record with fields: {list(record_dict.keys())}")
             else:
-                logger.warning(f"Skipped incomplete record: missing required fields")
-
+                reason = 'missing:' + '+'.join(missing_fields)
+                report['rejected_by_reason'][reason] = report['rejected_by_reason'].get(reason, 0) + 1
+                report['rejected_records'].append({
+                    'line_no': line_no,
+                    'byte_offset': byte_offset,
+                    'reason': reason,
+                    'detail': f"Missing required fields: {', '.join(missing_fields)}",
+                    'raw_text': record[:MAX_REJECTED_RAW_TEXT],
+                })
+                logger.warning(f"Skipped incomplete record at line {line_no}: missing {', '.join(missing_fields)}")
+
+        report['records_accepted'] = len(records)
+        report['records_rejected'] = len(report['rejected_records'])
+        report['parse_seconds'] = round(time.perf_counter() - started, 4)
         logger.info(f"Successfully processed {len(records)} complete records")
-        return records
+        return records, report
 
     except Exception as e:
         logger.error(f"Error processing file: {str(e)}")
         raise Exception(f"Failed to process file: {str(e)}")
+
+def process_text_file(content, default_gender=None):
+    """Process the text file content and extract structured data."""
+    records, _ = process_text_file_with_report(content, default_gender)
+    return records
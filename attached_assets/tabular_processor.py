@@ -0,0 +1,182 @@
+import os
+import re
+import time
+import logging
+from datetime import datetime
+
+import pandas as pd
+
+from attached_assets.data_processor import BENGALI_NUMERALS, DATE_FORMATS, REQUIRED_FIELDS, MAX_REJECTED_RAW_TEXT
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# File types handled by the tabular ingest path
+TABULAR_EXTENSIONS = ('.csv', '.xlsx', '.parquet')
+
+# Record fields a spreadsheet column can be mapped onto
+TABULAR_FIELDS = (
+    'ক্রমিক_নং', 'নাম', 'ভোটার_নং', 'পিতার_নাম', 'মাতার_নাম', 'পেশা', 'occupation_details',
+    'জন্ম_তারিখ', 'ঠিকানা', 'phone_number', 'whatsapp_number', 'facebook_link', 'tiktok_link',
+    'youtube_link', 'insta_link', 'photo_link', 'description', 'political_status',
+    'relationship_status', 'gender'
+)
+
+# Header spellings seen in voter list spreadsheets, after normalize_header()
+COLUMN_ALIASES = {
+    'ক্রমিক নং': 'ক্রমিক_নং', 'ক্রমিক': 'ক্রমিক_নং', 'serial': 'ক্রমিক_নং', 'serial no': 'ক্রমিক_নং',
+    'sl': 'ক্রমিক_নং', 'sl no': 'ক্রমিক_নং',
+    'নাম': 'নাম', 'name': 'নাম', 'voter name': 'নাম',
+    'ভোটার নং': 'ভোটার_নং', 'ভোটার নম্বর': 'ভোটার_নং', 'voter no': 'ভোটার_নং', 'voter number': 'ভোটার_নং',
+    'voter id': 'ভোটার_নং',
+    'পিতার নাম': 'পিতার_নাম', 'পিতা': 'পিতার_নাম', 'father': 'পিতার_নাম', 'fathers name': 'পিতার_নাম',
+    'father name': 'পিতার_নাম',
+    'মাতার নাম': 'মাতার_নাম', 'মাতা': 'মাতার_নাম', 'mother': 'মাতার_নাম', 'mothers name': 'মাতার_নাম',
+    'mother name': 'মাতার_নাম',
+    'পেশা': 'পেশা', 'occupation': 'পেশা', 'profession': 'পেশা',
+    'জন্ম তারিখ': 'জন্ম_তারিখ', 'date of birth': 'জন্ম_তারিখ', 'dob': 'জন্ম_তারিখ', 'birth date': 'জন্ম_তারিখ',
+    'ঠিকানা': 'ঠিকানা', 'address': 'ঠিকানা',
+    'লিঙ্গ': 'gender', 'gender': 'gender', 'sex': 'gender',
+    'ফোন': 'phone_number', 'ফোন নম্বর': 'phone_number', 'ফোন নাম্বার': 'phone_number', 'phone': 'phone_number',
+    'mobile': 'phone_number', 'whatsapp': 'whatsapp_number', 'facebook': 'facebook_link',
+    'বিবরণ': 'description',
+}
+COLUMN_ALIASES.update({field.replace('_', ' ').lower(): field for field in TABULAR_FIELDS})
+
+# Columns whose numerals are converted to English digits
+NUMERIC_TEXT_FIELDS = ('ক্রমিক_নং', 'ভোটার_নং', 'জন্ম_তারিখ', 'phone_number', 'whatsapp_number')
+
+BENGALI_NUMERAL_TABLE = str.maketrans(BENGALI_NUMERALS)
+
+def normalize_header(header):
+    """Lower-cases a column header and folds underscores, punctuation and repeated spaces."""
+    header = str(header).replace('\ufeff', '').replace('_', ' ').lower()
+    header = re.sub(r"[:.'’]", '', header)
+    return re.sub(r'\s+', ' ', header).strip()
+
+def read_tabular_file(path, file_name=None):
+    """Reads a CSV, XLSX or Parquet voter list into a DataFrame of strings."""
+    extension = os.path.splitext(file_name or path)[1].lower()
+    if extension == '.csv':
+        return pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    if extension == '.xlsx':
+        return pd.read_excel(path, dtype=str, keep_default_na=False)
+    if extension == '.parquet':
+        frame = pd.read_parquet(path)
+        return frame.astype('string').fillna('')
+    raise ValueError(f"Unsupported tabular file type: {extension}")
+
+def parse_dates_vectorised(values):
+    """
+    Parses a column of date strings, trying DATE_FORMATS in order over whole columns.
+    Returns (datetime Series, {matched format: count}).
+    """
+    # Spreadsheet dates often arrive as 'YYYY-MM-DD 00:00:00'
+    values = values.str.replace(r'^(\d{4}-\d{2}-\d{2}) 00:00:00$', r'\1', regex=True)
+    parsed = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    matched = {}
+    remaining = values.notna()
+    for fmt in DATE_FORMATS:
+        if not remaining.any():
+            break
+        attempt = pd.to_datetime(values[remaining], format=fmt, errors='coerce')
+        hits = attempt.notna()
+        if hits.any():
+            parsed.loc[attempt.index[hits]] = attempt[hits]
+            matched[fmt] = int(hits.sum())
+            remaining.loc[attempt.index[hits]] = False
+    return parsed, matched
+
+def ages_from_birth_dates(birth_dates):
+    """Vectorised equivalent of data_processor.age_from_birth_date."""
+    today = datetime.today()
+    not_had_birthday = (birth_dates.dt.month > today.month) | (
+        (birth_dates.dt.month == today.month) & (birth_dates.dt.day > today.day)
+    )
+    return (today.year - birth_dates.dt.year - not_had_birthday.astype('Int64')).astype('Int64')
+
+def process_tabular_frame(frame, default_gender=None):
+    """
+    Maps a spreadsheet onto the records schema and normalises it column by column.
+
+    Returns (records, report). `records` is a DataFrame with the TABULAR_FIELDS,
+    'age' and 'src_line' (the spreadsheet row number) columns, ready for
+    Database.stage_frame. The report has the same shape as
+    data_processor.process_text_file_with_report, plus 'unmapped_columns'.
+    """
+    started = time.perf_counter()
+
+    # Map known headers onto record fields; the first column wins if two map to the same field
+    renames = {}
+    unmapped = []
+    for column in frame.columns:
+        field = COLUMN_ALIASES.get(normalize_header(column))
+        if field and field not in renames.values():
+            renames[column] = field
+        else:
+            unmapped.append(str(column))
+    records = frame[list(renames)].rename(columns=renames)
+    for field in TABULAR_FIELDS:
+        if field not in records.columns:
+            records[field] = pd.NA
+    records = records[list(TABULAR_FIELDS)].astype('string')
+
+    # Trim every column and treat empty cells as missing
+    for field in TABULAR_FIELDS:
+        records[field] = records[field].str.strip().replace('', pd.NA)
+
+    # Bengali digits to English, and drop the '.0' spreadsheets add to whole numbers
+    for field in NUMERIC_TEXT_FIELDS:
+        records[field] = records[field].str.translate(BENGALI_NUMERAL_TABLE)
+        if field != 'জন্ম_তারিখ':
+            records[field] = records[field].str.replace(r'^(\d+)\.0$', r'\1', regex=True)
+
+    if default_gender:
+        records['gender'] = records['gender'].fillna(default_gender)
+
+    birth_dates, date_formats = parse_dates_vectorised(records['জন্ম_তারিখ'])
+    records['age'] = ages_from_birth_dates(birth_dates)
+    has_dob = records['জন্ম_তারিখ'].notna()
+    unparsed = int((has_dob & birth_dates.isna()).sum())
+    missing = int((~has_dob).sum())
+    if unparsed:
+        date_formats['unparsed'] = unparsed
+    if missing:
+        date_formats['missing'] = missing
+
+    # Header is row 1, so the first data row is row 2
+    records['src_line'] = pd.RangeIndex(2, len(records) + 2)
+
+    # Required field check over whole columns
+    missing_mask = records[list(REQUIRED_FIELDS)].isna()
+    valid = ~missing_mask.any(axis=1)
+    rejected_by_reason = {}
+    rejected_records = []
+    if not valid.all():
+        reasons = missing_mask[~valid].apply(
+            lambda row: 'missing:' + '+'.join(field for field in REQUIRED_FIELDS if row[field]), axis=1
+        )
+        rejected_by_reason = {reason: int(count) for reason, count in reasons.value_counts().items()}
+        raw_rows = frame.loc[~valid.to_numpy()].astype(str).agg(' | '.join, axis=1)
+        for (line_no, reason), raw_text in zip(zip(records.loc[~valid, 'src_line'], reasons), raw_rows):
+            rejected_records.append({
+                'line_no': int(line_no),
+                'byte_offset': None,
+                'reason': reason,
+                'detail': f"Missing required fields: {reason[len('missing:'):].replace('+', ', ')}",
+                'raw_text': raw_text[:MAX_REJECTED_RAW_TEXT],
+            })
+
+    accepted = records[valid].reset_index(drop=True)
+    report = {
+        'records_found': len(records),
+        'records_accepted': len(accepted),
+        'records_rejected': len(rejected_records),
+        'rejected_by_reason': rejected_by_reason,
+        'date_formats': date_formats,
+        'parse_seconds': round(time.perf_counter() - started, 4),
+        'unmapped_columns': unmapped,
+        'rejected_records': rejected_records,
+    }
+    logger.info(f"Processed tabular file: {len(accepted)} of {len(records)} rows accepted")
+    return accepted, report
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import argparse
+import logging
+
+# Add the current directory to Python path to ensure imports work correctly
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+from utils.database import Database
+from utils.ingest_jobs import process_ingest_job
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def run_worker(job_id=None, loop=False, poll_interval=5):
+    """
+    Claims and processes queued ingest jobs.
+    With `job_id`, only that job is processed. Otherwise the worker drains the
+    queue and exits, or keeps polling for new jobs when `loop` is set.
+    """
+    job_db = Database()
+    data_db = Database()
+    try:
+        while True:
+            job = job_db.claim_ingest_job(job_id=job_id, worker_pid=os.getpid())
+            if job:
+                logger.info(f"Processing ingest job {job['id']} ({job['total_files']} files).")
+                status = process_ingest_job(job_db, data_db, job)
+                logger.info(f"Ingest job {job['id']} finished with status '{status}'.")
+                if job_id is not None:
+                    break
+            elif loop and job_id is None:
+                time.sleep(poll_interval)
+            else:
+                break
+    finally:
+        job_db.conn.close()
+        data_db.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background worker for voter list uploads.")
+    parser.add_argument("--job-id", type=int, help="Process only this job.")
+    parser.add_argument("--loop", action="store_true", help="Keep polling for queued jobs instead of exiting when the queue is empty.")
+    parser.add_argument("--poll-interval", type=float, default=5, help="Seconds between polls in --loop mode.")
+    args = parser.parse_args()
+    run_worker(job_id=args.job_id, loop=args.loop, poll_interval=args.poll_interval)
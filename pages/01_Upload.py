@@ -1,13 +1,147 @@
 import streamlit as st
+import pandas as pd
 import os
-from attached_assets.data_processor import process_text_file
 from utils.database import Database
+from utils.ingest_jobs import stage_uploaded_files, start_ingest_worker
 from utils.styling import apply_custom_styling
 import logging
 
 logger = logging.getLogger(__name__)
 apply_custom_styling()
 
+JOB_STATUS_LABELS = {
+    'queued': '⏳ অপেক্ষমাণ',
+    'running': '⚙️ চলছে',
+    'completed': '✅ সম্পন্ন',
+    'failed': '❌ ব্যর্থ',
+    'cancelled': '⛔ বাতিল',
+}
+
+def display_job_report(db, job):
+    """
+    Shows the stored parse report of every file in a job, without re-parsing
+    anything. Reports and their rejected records are only loaded while the
+    report toggle is on.
+    """
+    if not st.toggle("📋 ফাইল রিপোর্ট", key=f"job_report_{job['id']}"):
+        return
+    with st.container(border=True):
+        for job_file in db.get_ingest_job_files(job['id']):
+            stats = job_file['parse_stats']
+            st.markdown(f"**{job_file['file_name']}** — {JOB_STATUS_LABELS.get(job_file['status'], job_file['status'])}")
+            if job_file['error']:
+                st.error(job_file['error'])
+            if not stats:
+                st.caption("এখনও কোনো রিপোর্ট নেই।")
+                continue
+
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("পাওয়া রেকর্ড", stats.get('records_found', 0))
+            col2.metric("গৃহীত", stats.get('records_accepted', 0))
+            col3.metric("যোগ করা হয়েছে", stats.get('records_inserted', job_file['records_inserted']))
+            col4.metric("পার্স সময় (সেকেন্ড)", stats.get('parse_seconds', 0))
+
+            if stats.get('unmapped_columns'):
+                st.caption(f"উপেক্ষিত কলাম: {', '.join(stats['unmapped_columns'])}")
+
+            col5, col6 = st.columns(2)
+            with col5:
+                st.markdown("###### বাদ পড়ার কারণ")
+                rejected_by_reason = stats.get('rejected_by_reason', {})
+                if rejected_by_reason:
+                    st.dataframe(
+                        pd.DataFrame(list(rejected_by_reason.items()), columns=['কারণ', 'সংখ্যা']),
+                        hide_index=True, use_container_width=True
+                    )
+                else:
+                    st.caption("কোনো রেকর্ড বাদ পড়েনি।")
+            with col6:
+                st.markdown("###### জন্ম তারিখের ফরম্যাট")
+                date_formats = stats.get('date_formats', {})
+                if date_formats:
+                    st.dataframe(
+                        pd.DataFrame(list(date_formats.items()), columns=['ফরম্যাট', 'সংখ্যা']),
+                        hide_index=True, use_container_width=True
+                    )
+
+            reject_counts = db.get_ingest_reject_counts(job_file['id'])
+            if reject_counts:
+                reason = st.selectbox(
+                    "বাদ পড়া রেকর্ড দেখুন",
+                    options=[row['reason'] for row in reject_counts],
+                    format_func=lambda x: f"{x} ({next(r['count'] for r in reject_counts if r['reason'] == x)})",
+                    key=f"reject_reason_{job_file['id']}"
+                )
+                rejects = db.get_ingest_rejects(job_file['id'], reason=reason)
+                st.dataframe(
+                    pd.DataFrame(rejects).rename(columns={
+                        'line_no': 'লাইন', 'byte_offset': 'বাইট অফসেট', 'reason': 'কারণ',
+                        'detail': 'বিস্তারিত', 'raw_text': 'মূল লেখা'
+                    }),
+                    hide_index=True, use_container_width=True
+                )
+            st.markdown("---")
+
+def has_active_ingest_jobs(jobs):
+    """Whether any job is queued or running with a live worker, i.e. its progress still changes."""
+    return any(job['status'] in ('queued', 'running') and not job['is_stale'] for job in jobs)
+
+def display_ingest_jobs(db):
+    """Shows recent upload jobs, polling their progress every few seconds only while one is active."""
+    polling = has_active_ingest_jobs(db.get_recent_ingest_jobs())
+    st.fragment(run_every=2 if polling else None)(ingest_jobs_fragment)(db, polling)
+
+def ingest_jobs_fragment(db, polling):
+    jobs = db.get_recent_ingest_jobs()
+    if has_active_ingest_jobs(jobs) != polling:
+        # A job finished, or was resumed: rerun the page to start or stop polling
+        # (and to list the new records of the batch).
+        st.rerun()
+    if not jobs:
+        return
+
+    st.subheader("আপলোড জবসমূহ")
+    for job in jobs:
+        status_label = JOB_STATUS_LABELS.get(job['status'], job['status'])
+        if job['is_stale']:
+            status_label = "⚠️ সাড়া নেই"
+        with st.container(border=True):
+            st.markdown(f"**জব #{job['id']}** — ব্যাচ: {job['batch_name'] or 'N/A'} — {status_label}")
+            total_files = job['total_files'] or 1
+            st.progress(
+                min(job['files_done'] / total_files, 1.0),
+                text=f"ফাইল: {job['files_done']}/{job['total_files']}"
+            )
+
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("পার্স করা রেকর্ড", job['records_parsed'])
+            col2.metric("যোগ করা রেকর্ড", job['records_inserted'])
+            col3.metric("বাদ পড়া রেকর্ড", job['records_skipped'])
+            col4.metric("ত্রুটি", job['errors'])
+
+            if job['last_error']:
+                st.error(f"সর্বশেষ ত্রুটি: {job['last_error']}")
+
+            if job['status'] != 'queued':
+                display_job_report(db, job)
+
+            if job['status'] == 'running' and not job['is_stale']:
+                for job_file in db.get_ingest_job_files(job['id']):
+                    if job_file['status'] == 'running' and job_file['records_parsed']:
+                        st.caption(
+                            f"{job_file['file_name']}: {job_file['records_staged']}/{job_file['records_parsed']} রেকর্ড স্টেজিং টেবিলে লোড হয়েছে"
+                        )
+
+            if job['status'] in ('queued', 'running') and not job['is_stale']:
+                if st.button("⛔ বাতিল করুন", key=f"cancel_job_{job['id']}", disabled=job['cancel_requested']):
+                    db.request_ingest_job_cancel(job['id'])
+                    st.rerun(scope="fragment")
+            elif job['status'] in ('failed', 'cancelled') or job['is_stale']:
+                if st.button("▶️ পুনরায় শুরু করুন", key=f"resume_job_{job['id']}"):
+                    if db.resume_ingest_job(job['id']):
+                        start_ingest_worker(job['id'])
+                    st.rerun(scope="fragment")
+
 def upload_page():
     if 'authenticated' not in st.session_state or not st.session_state.authenticated:
         st.warning("অনুগ্রহ করে প্রথমে লগইন করুন")
@@ -29,72 +163,50 @@ def upload_page():
 
     # File upload
     uploaded_files = st.file_uploader(
-        "টেক্সট ফাইল আপলোড করুন",
-        type=['txt'],
+        "টেক্সট, CSV, Excel (XLSX) বা Parquet ফাইল আপলোড করুন",
+        type=['txt', 'csv', 'xlsx', 'parquet'],
         accept_multiple_files=True
     )
 
     if uploaded_files and batch_name:
         if st.button("আপলোড করুন", type="primary"):
-            total_records_processed = 0
-            total_records_added_to_db = 0
-
             try:
-                with st.spinner("প্রক্রিয়াকরণ চলছে..."):
-                    # Check if batch already exists
-                    existing_batch = db.get_batch_by_name(batch_name)
-                    if existing_batch:
-                        batch_id = existing_batch['id']
-                        st.info(f"'{batch_name}' ব্যাচে ফাইল যোগ করা হচ্ছে...")
-                    else:
-                        # Create new batch
-                        batch_id = db.add_batch(batch_name)
-                        st.success(f"নতুন ব্যাচ '{batch_name}' তৈরি করা হয়েছে")
-
-                    # Start a single transaction for all files in this upload session
-                    # db.conn.autocommit is already False from __init__
-
-                    for uploaded_file in uploaded_files:
-                        try:
-                            content = uploaded_file.read().decode('utf-8')
-                            records = process_text_file(content, default_gender=selected_gender if selected_gender else None)
-                            total_records_processed += len(records)
-
-                            for record in records:
-                                db.add_record(batch_id, uploaded_file.name, record)
-                                total_records_added_to_db += 1
-                            
-                            logger.info(f"Records from file '{uploaded_file.name}' prepared for insertion.")
-
-                        except Exception as file_e:
-                            # Log the error for this specific file but don't rollback the whole transaction yet
-                            logger.error(f"Failed to process and add records for file {uploaded_file.name}: {file_e}")
-                            st.error(f"ফাইল '{uploaded_file.name}' প্রক্রিয়াকরণ এবং যোগ করতে ব্যর্থ: {file_e}. এই ফাইলের কোনো রেকর্ড যোগ করা হয়নি।")
-                            # Continue to next file, the overall transaction will be rolled back later if needed
-
-                # After processing all files, attempt to commit all changes
-                if total_records_added_to_db > 0:
-                    db.commit_changes() # Explicitly commit here
-                    st.success(f"সফলভাবে {len(uploaded_files)} টি ফাইল থেকে {total_records_added_to_db} টি রেকর্ড ডাটাবেসে আপলোড করা হয়েছে!")
-                    st.markdown(f"**মোট রেকর্ড:** {db.get_total_records_count()}") # Display total count
+                # Check if batch already exists
+                existing_batch = db.get_batch_by_name(batch_name)
+                if existing_batch:
+                    batch_id = existing_batch['id']
+                    st.info(f"'{batch_name}' ব্যাচে ফাইল যোগ করা হচ্ছে...")
                 else:
-                    st.warning("কোনো রেকর্ড ডাটাবেসে যোগ করা যায়নি। ফাইল ফরম্যাট বা ডাটাবেস স্কিমা পরীক্ষা করুন।")
-                    db.rollback_changes() # Rollback if no records were added (e.g., all skipped or failed)
+                    # Create new batch
+                    batch_id = db.add_batch(batch_name)
+                    st.success(f"নতুন ব্যাচ '{batch_name}' তৈরি করা হয়েছে")
+
+                # Stage the files on disk and hand them to a background worker, so a
+                # closed tab or an interrupted rerun no longer loses the upload.
+                staging_dir, staged_files = stage_uploaded_files(uploaded_files)
+                job_id = db.create_ingest_job(
+                    batch_id, staging_dir, staged_files,
+                    default_gender=selected_gender if selected_gender else None
+                )
+                start_ingest_worker(job_id)
+                st.success(f"{len(staged_files)} টি ফাইল আপলোড কিউতে যোগ করা হয়েছে (জব #{job_id})। নিচে অগ্রগতি দেখুন।")
 
             except Exception as e:
                 db.rollback_changes() # Ensure rollback for any top-level errors
                 logger.error(f"Upload process failed: {str(e)}")
                 st.error(f"আপলোড প্রক্রিয়া ব্যর্থ হয়েছে: {str(e)}")
 
+    display_ingest_jobs(db)
+
     # Display existing batches
     st.subheader("বিদ্যমান ব্যাচসমূহ")
     batches = db.get_all_batches()
 
     if batches:
+        record_counts = db.get_batch_record_counts()
         for batch in batches:
             with st.expander(f"ব্যাচ: {batch['name']} ({batch['created_at'].strftime('%Y-%m-%d %H:%M')})"):
-                records = db.get_batch_records(batch['id'])
-                st.write(f"মোট রেকর্ড: {len(records)}")
+                st.write(f"মোট রেকর্ড: {record_counts.get(batch['id'], 0)}")
     else:
         st.info("কোন ব্যাচ পাওয়া যায়নি")
 
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
-from utils.database import Database
+from utils.database import Database, RELATIONSHIP_STATUSES
+from utils.address_parser import LOCALITY_LEVELS, LOCALITY_LABELS
 from utils.styling import apply_custom_styling
 import logging
 
@@ -27,6 +28,8 @@ def display_result_card(result, db):
         if result.get('file_name'):
             location_str += f" / {result['file_name']}"
         st.markdown(f"📍 **স্থান:** {location_str}")
+        if result.get('household_key'):
+            st.markdown(f"🏠 **খানা:** #{result['household_key']} ({result.get('household_size', 1)} জন)")
 
         st.markdown("---")
 
@@ -98,6 +101,18 @@ def search_page():
             occupation = st.text_input("পেশা")
             address = st.text_input("ঠিকানা")
             gender = st.selectbox("লিঙ্গ", options=['সব', 'Male', 'Female', 'Other']) # Gender search filter
+        col5, col6 = st.columns(2)
+        with col5:
+            household_id = st.text_input("খানা নং")
+        with col6:
+            min_household_size = st.number_input("খানার ন্যূনতম সদস্য সংখ্যা", min_value=0, value=0, step=1)
+        # Parsed address components; faster and more precise than searching the whole ঠিকানা
+        with st.expander("📍 এলাকা অনুযায়ী খুঁজুন"):
+            locality_cols = st.columns(len(LOCALITY_LEVELS))
+            locality_criteria = {
+                level: column.text_input(LOCALITY_LABELS[level], key=f"locality_{level}").strip()
+                for level, column in zip(LOCALITY_LEVELS, locality_cols)
+            }
             
     # Search button
     if st.button("অনুসন্ধান করুন", type="primary", use_container_width=True):
@@ -112,7 +127,10 @@ def search_page():
                     'পেশা': occupation,
                     'ঠিকানা': address,
                     'জন্ম_তারিখ': date_of_birth,
-                    'gender': gender # Include gender in search criteria
+                    'gender': gender, # Include gender in search criteria
+                    'household_id': household_id.strip().lstrip('#'),
+                    'min_household_size': min_household_size,
+                    **locality_criteria
                 }
                 # Remove empty criteria to avoid searching on empty strings, but keep 'gender' if 'সব' is selected
                 search_criteria = {k: v for k, v in search_criteria.items() if v or k == 'gender'}
@@ -121,19 +139,119 @@ def search_page():
                     st.warning("অনুসন্ধানের জন্য অন্তত একটি ফিল্টার পূরণ করুন।")
                     return
 
-                results = db.search_records_advanced(search_criteria)
+                if search_criteria.get('household_id') and not search_criteria['household_id'].isdigit():
+                    st.warning("খানা নং একটি সংখ্যা হতে হবে।")
+                    return
 
-                if results:
-                    st.success(f"{len(results)}টি ফলাফল পাওয়া গেছে")
-                    # Display results in the improved card format
-                    for result in results:
-                        display_result_card(result, db)
-                else:
-                    st.info("আপনার অনুসন্ধানের সাথে মেলে এমন কোনো ফলাফল পাওয়া যায়নি।")
+                # Criteria and results are kept for the session so selecting records for a
+                # bulk update does not lose the search on rerun; compact rows keep that cheap
+                results = db.search_records_advanced(search_criteria, projection='full', compact=True)
+                st.session_state.search_page_results = (search_criteria, results)
 
         except Exception as e:
             logger.error(f"Search error: {str(e)}")
             st.error(f"অনুসন্ধানে সমস্যা হয়েছে: {str(e)}")
+            return
+
+    if 'search_page_results' not in st.session_state:
+        return
+    search_criteria, results = st.session_state.search_page_results
+
+    if not results:
+        st.info("আপনার অনুসন্ধানের সাথে মেলে এমন কোনো ফলাফল পাওয়া যায়নি।")
+        return
+
+    st.success(f"{len(results)}টি ফলাফল পাওয়া গেছে")
+    status_changed = display_bulk_status_update(search_criteria, results, db)
+    events_changed = display_bulk_event_update(search_criteria, results, db)
+    if status_changed or events_changed:
+        results = db.search_records_advanced(search_criteria, projection='full', compact=True)
+        st.session_state.search_page_results = (search_criteria, results)
+
+    # Display results in the improved card format
+    for result in results:
+        display_result_card(result, db)
+
+
+def select_bulk_targets(search_criteria, results, db, key_prefix):
+    """
+    Widgets choosing the records of a bulk action: picked results or every match.
+    Returns (record_ids or None for all matches, number of records affected).
+    """
+    target = st.radio(
+        "কোন রেকর্ডগুলো পরিবর্তন হবে",
+        options=['selected', 'all'],
+        format_func=lambda t: "নির্বাচিত রেকর্ড" if t == 'selected' else "অনুসন্ধানের সব রেকর্ড",
+        horizontal=True,
+        key=f'{key_prefix}_target'
+    )
+    if target == 'all':
+        return None, db.count_records_matching(search_criteria)
+    results_by_id = {result['id']: result for result in results}
+    selected_ids = st.multiselect(
+        "রেকর্ড নির্বাচন করুন",
+        options=list(results_by_id),
+        format_func=lambda record_id: f"{results_by_id[record_id]['নাম']} ({results_by_id[record_id]['ভোটার_নং']})",
+        key=f'{key_prefix}_ids'
+    )
+    return selected_ids, len(selected_ids)
+
+
+def display_bulk_status_update(search_criteria, results, db):
+    """
+    Lets the user set the relationship status of selected results, or of every
+    record matching the search, in one update. Returns True if records were changed.
+    """
+    with st.expander("🔄 সম্পর্কের ধরণ একসাথে পরিবর্তন করুন"):
+        selected_ids, affected = select_bulk_targets(search_criteria, results, db, 'search_bulk')
+        status = st.selectbox("নতুন সম্পর্কের ধরণ", options=RELATIONSHIP_STATUSES, key='search_bulk_status')
+        st.caption(f"{affected}টি রেকর্ড প্রভাবিত হবে।")
+
+        if st.button("প্রয়োগ করুন", disabled=not affected, key='search_bulk_apply'):
+            try:
+                if selected_ids is not None:
+                    updated = db.update_relationship_status_bulk(status, record_ids=selected_ids)
+                else:
+                    updated = db.update_relationship_status_bulk(status, criteria=search_criteria)
+                st.success(f"{updated}টি রেকর্ডের সম্পর্কের ধরণ '{status}' করা হয়েছে।")
+                return updated > 0
+            except Exception as e:
+                db.rollback_changes()
+                logger.error(f"Bulk relationship status update failed: {e}")
+                st.error("সম্পর্কের ধরণ পরিবর্তন করতে সমস্যা হয়েছে।")
+    return False
+
+def display_bulk_event_update(search_criteria, results, db):
+    """
+    Adds or removes events for selected results, or every record matching the
+    search, in one transaction. Returns True if any event link changed.
+    """
+    with st.expander("🗓️ ইভেন্ট একসাথে যোগ বা বাদ দিন"):
+        selected_ids, affected = select_bulk_targets(search_criteria, results, db, 'search_events')
+        event_map = {event['name']: event['id'] for event in db.get_all_events()}
+        add_events = st.multiselect("যোগ করার ইভেন্ট", options=event_map.keys(), key='search_events_add')
+        remove_events = st.multiselect(
+            "বাদ দেওয়ার ইভেন্ট",
+            options=[name for name in event_map if name not in add_events],
+            key='search_events_remove'
+        )
+        st.caption(f"{affected}টি রেকর্ড প্রভাবিত হবে।")
+
+        if st.button("প্রয়োগ করুন", disabled=not affected or not (add_events or remove_events), key='search_events_apply'):
+            try:
+                add_ids = [event_map[name] for name in add_events]
+                remove_ids = [event_map[name] for name in remove_events]
+                if selected_ids is not None:
+                    added, removed = db.update_events_bulk(add_ids, remove_ids, record_ids=selected_ids)
+                else:
+                    added, removed = db.update_events_bulk(add_ids, remove_ids, criteria=search_criteria)
+                st.success(f"{added}টি ইভেন্ট নির্ধারণ যোগ এবং {removed}টি বাদ দেওয়া হয়েছে।")
+                return added + removed > 0
+            except Exception as e:
+                db.rollback_changes()
+                logger.error(f"Bulk event update failed: {e}")
+                st.error("ইভেন্ট নির্ধারণের সময় একটি সমস্যা হয়েছে।")
+    return False
 
 if __name__ == "__main__":
     search_page()
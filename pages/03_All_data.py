@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 from utils.database import Database
 from utils.styling import apply_custom_styling
@@ -27,12 +26,8 @@ def all_data_page():
         if st.button("🔴 সম্পূর্ণ ডাটাবেস মুছে ফেলুন (সাবধান!)", type="secondary", use_container_width=True):
             if st.session_state.get('confirm_clear_db', False):
                 try:
-                    # Delete all records first (which will also delete record_events due to CASCADE)
-                    with db.conn.cursor() as cur:
-                        cur.execute("DELETE FROM records")
-                        cur.execute("DELETE FROM batches")
-                        cur.execute("DELETE FROM events")
-                    db.conn.commit()
+                    # Truncates every table and drops the batch partitions
+                    db.clear_all_data()
                     st.success("✅ সম্পূর্ণ ডাটাবেস সফলভাবে মুছে ফেলা হয়েছে!")
                     st.session_state.pop('confirm_clear_db', None) # Reset confirmation
                     st.rerun()
@@ -89,12 +84,8 @@ def all_data_page():
         if st.button("🔴 সম্পূর্ণ ডাটাবেস মুছে ফেলুন (সাবধান!)", type="secondary", use_container_width=True):
             if st.session_state.get('confirm_clear_db', False):
                 try:
-                    # Delete all records first (which will also delete record_events due to CASCADE)
-                    with db.conn.cursor() as cur:
-                        cur.execute("DELETE FROM records")
-                        cur.execute("DELETE FROM batches")
-                        cur.execute("DELETE FROM events")
-                    db.conn.commit()
+                    # Truncates every table and drops the batch partitions
+                    db.clear_all_data()
                     st.success("✅ সম্পূর্ণ ডাটাবেস সফলভাবে মুছে ফেলা হয়েছে!")
                     st.session_state.pop('confirm_clear_db', None) # Reset confirmation
                     st.rerun()
@@ -108,31 +99,30 @@ def all_data_page():
 
         return
         
+    files_by_name = {file['file_name']: file for file in files}
     selected_file_name = st.selectbox(
         "ফাইল নির্বাচন করুন",
-        options=['সব'] + [file['file_name'] for file in files],
-        format_func=lambda x: f"ফাইল: {x}" if x != 'সব' else "সব ফাইল দেখুন",
+        options=['সব'] + list(files_by_name),
+        format_func=lambda x: f"ফাইল: {x} ({files_by_name[x]['record_count']})" if x != 'সব' else "সব ফাইল দেখুন",
         key="file_selector" # Added a unique key for the selectbox
     )
 
     # --- Data Display and Editing ---
+    # Records are read straight into a DataFrame, without building a dict per row
     if selected_file_name == 'সব':
-        records = db.get_batch_records(selected_batch_id)
+        df = db.get_records_frame(selected_batch_id, projection='full')
     else:
-        records = db.get_file_records(selected_batch_id, selected_file_name)
+        df = db.get_records_frame(selected_batch_id, file_id=files_by_name[selected_file_name]['id'], projection='full')
 
-    if records:
-        df = pd.DataFrame(records)
-        st.write(f"মোট রেকর্ড: {len(records)}")
-
-        # IMPORTANT: Update original_df in session state whenever records are loaded or filtered
-        # This ensures that the comparison in st.data_editor is always against the currently displayed data
-        st.session_state.original_df = df.copy()
+    if not df.empty:
+        st.write(f"মোট রেকর্ড: {len(df)}")
 
         edited_df = st.data_editor(
             df,
             column_config={
-                'id': None, 'batch_id': None, 'file_name': None, 'created_at': None, 'batch_name': None,
+                'id': None, 'batch_id': None, 'file_id': None, 'file_name': None, 'created_at': None, 'batch_name': None,
+                # Derived on save from ঠিকানা, পেশা and family links, so not edited here
+                'household_id': None, 'occupation_id': None, 'locality_id': None,
                 'ক্রমিক_নং': st.column_config.TextColumn('ক্রমিক নং', width="small"),
                 'নাম': st.column_config.TextColumn('নাম', width="medium"),
                 'ভোটার_নং': st.column_config.TextColumn('ভোটার নং', width="medium"),
@@ -170,8 +160,8 @@ def all_data_page():
         with col1:
             if st.button("💾 পরিবর্তন সংরক্ষণ", type="primary", use_container_width=True):
                 try:
-                    # Retrieve the original_df from session state
-                    original_df = st.session_state.original_df
+                    # `df` is re-read on every run, so it holds the saved state the edits are compared against
+                    original_df = df
                     
                     # Ensure both DataFrames have the same index before comparing
                     # This step is crucial if the index somehow got misaligned
@@ -199,8 +189,6 @@ def all_data_page():
                             db.update_record(record_id, updated_data)
                             updated_count += 1
                         st.success(f"{updated_count} টি রেকর্ডের পরিবর্তন সফলভাবে সংরক্ষিত হয়েছে!")
-                        # After saving, re-fetch data or update original_df to reflect saved changes
-                        st.session_state.original_df = edited_df.copy() # Update session state with the new state
                         st.rerun() # Rerun to refresh the data editor with the latest saved data
                     else:
                         st.info("কোনো পরিবর্তন সনাক্ত করা যায়নি।")
@@ -215,7 +203,7 @@ def all_data_page():
                 all_events = db.get_all_events()
                 event_map = {event['name']: event['id'] for event in all_events}
                 
-                record_options = {f"{rec['ক্রমিক_নং']}: {rec['নাম']}": rec['id'] for rec in records}
+                record_options = {f"{serial}: {name}": int(record_id) for serial, name, record_id in zip(df['ক্রমিক_নং'], df['নাম'], df['id'])}
                 selected_record_display = st.selectbox(
                     "রেকর্ড নির্বাচন করুন",
                     options=record_options.keys(),
@@ -243,6 +231,60 @@ def all_data_page():
                             logger.error(f"Event assignment error: {e}")
                             st.error("ইভেন্ট নির্ধারণের সময় একটি সমস্যা হয়েছে।")
 
+        with col3:
+            popover = st.popover("👥 একাধিক রেকর্ডে ইভেন্ট", use_container_width=True)
+            with popover:
+                st.markdown("##### অনেক রেকর্ডে একসাথে ইভেন্ট যোগ বা বাদ দিন")
+                all_events = db.get_all_events()
+                event_map = {event['name']: event['id'] for event in all_events}
+
+                scope_label = "পুরো ব্যাচ" if selected_file_name == 'সব' else "পুরো ফাইল"
+                target = st.radio(
+                    "কোন রেকর্ডগুলো",
+                    options=['selected', 'all'],
+                    format_func=lambda t: "নির্বাচিত রেকর্ড" if t == 'selected' else f"{scope_label} ({len(df)})",
+                    horizontal=True,
+                    key="bulk_event_target"
+                )
+                if target == 'selected':
+                    record_options = {int(record_id): f"{serial}: {name}" for serial, name, record_id in zip(df['ক্রমিক_নং'], df['নাম'], df['id'])}
+                    selected_record_ids = st.multiselect(
+                        "রেকর্ড নির্বাচন করুন",
+                        options=list(record_options),
+                        format_func=record_options.get,
+                        key="bulk_event_records"
+                    )
+                    affected = len(selected_record_ids)
+                else:
+                    affected = len(df)
+
+                add_events = st.multiselect("যোগ করার ইভেন্ট", options=event_map.keys(), key="bulk_event_add")
+                remove_events = st.multiselect(
+                    "বাদ দেওয়ার ইভেন্ট",
+                    options=[name for name in event_map if name not in add_events],
+                    key="bulk_event_remove"
+                )
+                st.caption(f"{affected}টি রেকর্ড প্রভাবিত হবে।")
+
+                if st.button("✅ প্রয়োগ করুন", type="primary", disabled=not affected or not (add_events or remove_events),
+                             key="bulk_event_apply"):
+                    try:
+                        add_ids = [event_map[name] for name in add_events]
+                        remove_ids = [event_map[name] for name in remove_events]
+                        if target == 'selected':
+                            added, removed = db.update_events_bulk(add_ids, remove_ids, record_ids=selected_record_ids)
+                        else:
+                            criteria = {'batch_id': selected_batch_id}
+                            if selected_file_name != 'সব':
+                                criteria['file_id'] = files_by_name[selected_file_name]['id']
+                            added, removed = db.update_events_bulk(add_ids, remove_ids, criteria=criteria)
+                        st.success(f"{added}টি ইভেন্ট নির্ধারণ যোগ এবং {removed}টি বাদ দেওয়া হয়েছে।")
+                        st.rerun()
+                    except Exception as e:
+                        db.rollback_changes()
+                        logger.error(f"Bulk event assignment error: {e}")
+                        st.error("ইভেন্ট নির্ধারণের সময় একটি সমস্যা হয়েছে।")
+
     else:
         st.info("এই ফাইল বা ব্যাচে কোন রেকর্ড পাওয়া যায়নি।")
 
@@ -273,12 +315,8 @@ def all_data_page():
     if st.button("🔴 সম্পূর্ণ ডাটাবেস মুছে ফেলুন (সাবধান!)", type="secondary", use_container_width=True):
         if st.session_state.get('confirm_clear_db', False):
             try:
-                # Delete all records first (which will also delete record_events due to CASCADE)
-                with db.conn.cursor() as cur:
-                    cur.execute("DELETE FROM records")
-                    cur.execute("DELETE FROM batches")
-                    cur.execute("DELETE FROM events")
-                db.conn.commit()
+                # Truncates every table and drops the batch partitions
+                db.clear_all_data()
                 st.success("✅ সম্পূর্ণ ডাটাবেস সফলভাবে মুছে ফেলা হয়েছে!")
                 st.session_state.pop('confirm_clear_db', None) # Reset confirmation
                 st.rerun()
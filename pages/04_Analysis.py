@@ -2,7 +2,9 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from utils.database import Database
+from utils.database import Database, RELATIONSHIP_STATUSES
+from utils.analytics import rollup_counts, count_records
+from utils.address_parser import LOCALITY_LEVELS, LOCALITY_LABELS
 from utils.styling import apply_custom_styling
 import logging
 
@@ -26,36 +28,52 @@ def analysis_page():
             st.info("বিশ্লেষণের জন্য কোন ডাটা পাওয়া যায়নি")
             return
 
-        # Batch selection
-        selected_batch = st.selectbox(
-            "ব্যাচ নির্বাচন করুন",
-            options=['সব ব্যাচ'] + [batch['name'] for batch in batches],
-            format_func=lambda x: x
-        )
+        # Counts below are rolled up from the analytics cube; only batches changed since
+        # the last refresh are re-aggregated
+        db.refresh_analytics_cube()
+        batch_names = {batch['id']: batch['name'] for batch in batches}
+        event_names = {event['id']: event['name'] for event in db.get_all_events()}
 
-        # Get selected batch ID
-        selected_batch_id = None
-        if selected_batch != 'সব ব্যাচ':
-            selected_batch_id = next(batch['id'] for batch in batches if batch['name'] == selected_batch)
+        # --- Filters ---
+        with st.expander("🔎 ফিল্টার", expanded=True):
+            filter_col1, filter_col2 = st.columns(2)
+            with filter_col1:
+                selected_batch_ids = st.multiselect("ব্যাচ", options=list(batch_names), format_func=batch_names.get,
+                                                    placeholder="সব ব্যাচ")
+                selected_genders = st.multiselect("লিঙ্গ", options=['Male', 'Female', 'Other'], placeholder="সব")
+                age_range = st.slider("বয়স", min_value=0, max_value=120, value=(0, 120))
+            with filter_col2:
+                selected_statuses = st.multiselect("সম্পর্কের ধরণ", options=RELATIONSHIP_STATUSES, placeholder="সব")
+                selected_occupations = st.multiselect(
+                    "পেশা", options=sorted(row['occupation'] for row in db.get_analytics_rollup(['occupation']) if row['occupation']),
+                    placeholder="সব"
+                )
+                selected_events = st.multiselect("ইভেন্ট (যেকোনো একটি)", options=list(event_names),
+                                                 format_func=event_names.get, placeholder="সব")
+
+        filters = {
+            'batch_ids': selected_batch_ids,
+            'genders': selected_genders,
+            # The full range also keeps records without an age
+            'age_range': None if age_range == (0, 120) else age_range,
+            'occupations': selected_occupations,
+            'relationship_statuses': selected_statuses,
+            'events_any': selected_events,
+        }
+        selected_batch = ', '.join(batch_names[batch_id] for batch_id in selected_batch_ids) or 'সব ব্যাচ'
+        selected_batch_id = selected_batch_ids[0] if len(selected_batch_ids) == 1 else None
 
         # Total records metrics
         total_metrics_col1, total_metrics_col2 = st.columns(2)
 
         with total_metrics_col1:
-            # Overall statistics
-            if selected_batch == 'সব ব্যাচ':
-                total_records = sum(len(db.get_batch_records(batch['id'])) for batch in batches)
-                st.metric("মোট রেকর্ড (সব ব্যাচ)", total_records)
-            else:
-                batch_records = db.get_batch_records(selected_batch_id)
-                st.metric(f"মোট রেকর্ড ({selected_batch})", len(batch_records))
+            st.metric(f"মোট রেকর্ড ({selected_batch})", count_records(db, **filters))
 
         # --- Gender Distribution Analysis ---
         st.subheader("লিঙ্গ অনুযায়ী বিতরণ")
-        gender_stats = db.get_gender_stats(selected_batch_id)
+        df_gender = rollup_counts(db, ['gender'], **filters).dropna(subset=['gender'])
 
-        if gender_stats:
-            df_gender = pd.DataFrame(gender_stats)
+        if not df_gender.empty:
             fig_gender = px.pie(
                 df_gender,
                 values='count',
@@ -87,12 +105,10 @@ def analysis_page():
 
         # --- Age Distribution Analysis ---
         st.subheader("বয়স অনুযায়ী বিতরণ")
-        # Fetch age distribution from dashboard stats (which now includes it)
-        dashboard_stats = db.get_dashboard_stats()
-        age_distribution_data = dashboard_stats.get('age_distribution', [])
+        df_age = rollup_counts(db, ['age_group'], **filters)
+        df_age = df_age[df_age['age_group'] != 'Unknown'].copy()
 
-        if age_distribution_data:
-            df_age = pd.DataFrame(age_distribution_data)
+        if not df_age.empty:
             # Sort age groups for better visualization
             df_age['age_group_sort_key'] = df_age['age_group'].apply(lambda x: int(x.split('-')[0]) if x != 'Unknown' else -1)
             df_age = df_age.sort_values('age_group_sort_key')
@@ -122,15 +138,10 @@ def analysis_page():
 
         # --- Occupation Distribution Analysis ---
         st.subheader("পেশা অনুযায়ী বিতরণ")
-        if selected_batch == 'সব ব্যাচ':
-            occupation_stats = db.get_occupation_stats()
-        else:
-            occupation_stats = db.get_batch_occupation_stats(selected_batch_id)
-
-        if occupation_stats:
-            # Convert to DataFrame for visualization
-            df_occupation = pd.DataFrame(occupation_stats)
+        df_occupation = rollup_counts(db, ['occupation'], **filters).dropna(subset=['occupation'])
+        df_occupation = df_occupation.rename(columns={'occupation': 'পেশা'})
 
+        if not df_occupation.empty:
             # Create donut chart
             fig_occupation = px.pie(
                 df_occupation,
@@ -160,18 +171,71 @@ def analysis_page():
         else:
             st.info("পেশা বিশ্লেষণের জন্য কোন ডাটা পাওয়া যায়নি")
 
-        # --- Batch-wise Record Distribution (if 'সব ব্যাচ' selected) ---
-        if selected_batch == 'সব ব্যাচ':
+        # --- Locality Distribution Analysis ---
+        # Addresses are counted by the components parsed out of ঠিকানা at upload
+        st.subheader("এলাকা অনুযায়ী বিতরণ")
+        locality_level = st.selectbox("এলাকার স্তর", options=list(LOCALITY_LEVELS), format_func=LOCALITY_LABELS.get)
+        df_locality = rollup_counts(db, [locality_level], **filters).dropna(subset=[locality_level])
+
+        if not df_locality.empty:
+            level_label = LOCALITY_LABELS[locality_level]
+            df_locality = df_locality.rename(columns={locality_level: level_label, 'count': 'সংখ্যা'})
+            fig_locality = px.bar(
+                df_locality.head(30),
+                x=level_label,
+                y='সংখ্যা',
+                title=f"{level_label} অনুযায়ী বিতরণ ({selected_batch})"
+            )
+            fig_locality.update_layout(
+                font=dict(family="Noto Sans Bengali"),
+                height=450
+            )
+            # Ward numbers are names, not quantities
+            fig_locality.update_xaxes(type='category')
+            st.plotly_chart(fig_locality, use_container_width=True)
+
+            st.markdown(f"##### বিস্তারিত {level_label} পরিসংখ্যান")
+            st.dataframe(df_locality, hide_index=True, use_container_width=True)
+        else:
+            st.info("এলাকা বিশ্লেষণের জন্য কোন ডাটা পাওয়া যায়নি")
+
+        # --- Household Analysis ---
+        # Households are not part of the snapshot; they follow the batch filter only when one batch is selected
+        st.subheader("খানা (পরিবার) অনুযায়ী বিশ্লেষণ")
+        household_summary, household_sizes = db.get_household_stats(selected_batch_id)
+        household_cols = st.columns(4)
+        household_cols[0].metric("মোট খানা", household_summary['households'])
+        household_cols[1].metric("একাধিক সদস্যের খানা", household_summary['multi_member'])
+        household_cols[2].metric("গড় সদস্য", household_summary['avg_size'])
+        household_cols[3].metric("সবচেয়ে বড় খানা", household_summary['largest'])
+
+        if household_sizes:
+            df_households = pd.DataFrame(household_sizes)
+            fig_households = px.bar(
+                df_households,
+                x='size',
+                y='households',
+                title=f"খানার আকার অনুযায়ী বিতরণ ({selected_batch})",
+                labels={'size': 'সদস্য সংখ্যা', 'households': 'খানা'}
+            )
+            fig_households.update_layout(
+                font=dict(family="Noto Sans Bengali"),
+                height=400
+            )
+            st.plotly_chart(fig_households, use_container_width=True)
+
+        if st.button("🔄 খানা পুনর্গণনা করুন", help="পারিবারিক সংযোগ ও ঠিকানা থেকে সব খানা নতুন করে হিসাব করুন"):
+            with st.spinner("খানা হিসাব করা হচ্ছে..."):
+                changed = db.rebuild_households()
+            st.success(f"খানা হালনাগাদ হয়েছে ({changed} টি রেকর্ড পরিবর্তিত)।")
+            st.rerun()
+
+        # --- Batch-wise Record Distribution (unless a single batch is selected) ---
+        if selected_batch_id is None:
             st.subheader("ব্যাচ অনুযায়ী রেকর্ড বিতরণ")
-            batch_stats = []
-            for batch in batches:
-                records = db.get_batch_records(batch['id'])
-                batch_stats.append({
-                    'ব্যাচ': batch['name'],
-                    'রেকর্ড': len(records)
-                })
-
-            batch_df = pd.DataFrame(batch_stats)
+            batch_df = rollup_counts(db, ['batch_id'], **filters)
+            batch_df = pd.DataFrame({'ব্যাচ': batch_df['batch_id'].map(batch_names), 'রেকর্ড': batch_df['count']})
+
             fig_bar = px.bar(
                 batch_df,
                 x='ব্যাচ',
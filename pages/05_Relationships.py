@@ -1,13 +1,21 @@
 import streamlit as st
 import pandas as pd
-from utils.database import Database
+from utils.database import Database, RELATIONSHIP_STATUSES, DEFAULT_PHOTO_LINK
 from utils.styling import apply_custom_styling
 import logging
-from collections import defaultdict
 
 logger = logging.getLogger(__name__)
 apply_custom_styling()
 
+# Lists shown on this page; 'Regular' records are everyone else
+RELATIONSHIP_SECTIONS = {
+    'Friend': "🤝 বন্ধু তালিকা",
+    'Enemy': "⚔️ শত্রু তালিকা",
+    'Connected': "🔗 সংযুক্ত তালিকা",
+}
+
+PAGE_SIZE_OPTIONS = [20, 50, 100]
+
 def get_record_location(db, record):
     """Get batch and file information for a record."""
     try:
@@ -26,77 +34,72 @@ def get_record_location(db, record):
         logger.error(f"Error getting record location: {e}")
         return "Unknown Location"
 
-def display_relationship_card(record, db):
-    """Display a single relationship card with profile image and details"""
+def display_relationship_card(record, db, show_photo=False):
+    """Display a single relationship card; the profile image is only loaded when asked for."""
     with st.container(border=True):
-        # Profile section with image and basic info
-        cols = st.columns([1, 3])
-
-        with cols[0]:
-            # Profile image - Add robust handling for photo_link
-            photo_link = record.get('photo_link')
-            if photo_link and photo_link.strip():
-                # Use a try-except block to catch potential issues with st.image
-                try:
-                    st.image(photo_link, width=100)
-                except Exception as e:
-                    logger.warning(f"Could not load image from {photo_link}: {e}. Displaying placeholder.")
-                    st.image("https://placehold.co/100x100/EEE/31343C?text=No+Image", width=100)
-            else:
-                st.image("https://placehold.co/100x100/EEE/31343C?text=No+Image", width=100)
-
-
-        with cols[1]:
-            st.markdown(f"### {record['নাম']}")
-            st.markdown(f"**ক্রমিক নং:** {record['ক্রমিক_নং']}")
-
-        # Location info with both batch name and file name
-        st.markdown(f"📍 **স্থান:** {get_record_location(db, record)}")
-
-        st.markdown("---")
-
-        # Main details in two columns for better organization
-        col3, col4 = st.columns(2)
-        with col3:
-            st.markdown(f"**ভোটার নং:** {record['ভোটার_নং']}")
-            st.markdown(f"**পিতার নাম:** {record['পিতার_নাম']}")
-            st.markdown(f"**মাতার নাম:** {record['মাতার_নাম']}")
-            st.markdown(f"**পেশা:** {record['পেশা']}")
-            st.markdown(f"**Occupation Details:** {record.get('occupation_details', 'N/A')}")
-        with col4:
-            st.markdown(f"**জন্ম তারিখ:** {record.get('জন্ম_তারিখ', 'N/A')}")
-            st.markdown(f"**ঠিকানা:** {record['ঠিকানা']}")
-            st.markdown(f"**লিঙ্গ:** {record.get('gender', 'N/A')}") # Display gender
-            st.markdown(f"**বয়স:** {record.get('age', 'N/A')}") # Display age
-            st.markdown(f"**Political Status:** {record.get('political_status', 'N/A')}")
-
-        # Additional contact information
-        st.markdown(f"**ফোন নাম্বার:** {record.get('phone_number', 'N/A')}")
-        if record.get('whatsapp_number'):
-            st.markdown(f"**Whatsapp:** [Link]({record.get('whatsapp_number')})")
-        if record.get('facebook_link'):
-            st.markdown(f"**ফেসবুক:** [Link]({record.get('facebook_link')})")
-        if record.get('tiktok_link'):
-            st.markdown(f"**Tiktok:** [Link]({record.get('tiktok_link')})")
-        if record.get('youtube_link'):
-            st.markdown(f"**Youtube:** [Link]({record.get('youtube_link')})")
-        if record.get('insta_link'):
-            st.markdown(f"**Instagram:** [Link]({record.get('insta_link')})")
-
-
-        # Description
-        st.markdown(f"**বিবরণ:** {record.get('description', 'N/A')}")
-        
-        # Assigned Events
-        events_list = record.get('events', [])
-        if events_list:
-            st.markdown(f"**নির্ধারিত ইভেন্টস:** {', '.join(events_list)}")
+        if show_photo:
+            cols = st.columns([1, 3])
+            with cols[0]:
+                # Profile image - Add robust handling for photo_link
+                photo_link = record.get('photo_link')
+                if photo_link and photo_link.strip():
+                    # Use a try-except block to catch potential issues with st.image
+                    try:
+                        st.image(photo_link, width=100)
+                    except Exception as e:
+                        logger.warning(f"Could not load image from {photo_link}: {e}. Displaying placeholder.")
+                        st.image(DEFAULT_PHOTO_LINK, width=100)
+                else:
+                    st.image(DEFAULT_PHOTO_LINK, width=100)
+            header = cols[1]
         else:
-            st.markdown(f"**নির্ধারিত ইভেন্টস:** N/A")
+            header = st.container()
 
-
-        # Relationship status
-        st.markdown(f"**সম্পর্কের ধরণ:** {record['relationship_status']}")
+        with header:
+            st.markdown(f"### {record['নাম']}")
+            st.markdown(
+                f"**ক্রমিক নং:** {record['ক্রমিক_নং']} &nbsp;|&nbsp; **ভোটার নং:** {record['ভোটার_নং']}  \n"
+                f"📍 **স্থান:** {get_record_location(db, record)}"
+            )
+
+        # Details are collapsed so a page of cards stays short
+        with st.expander("বিস্তারিত"):
+            col3, col4 = st.columns(2)
+            with col3:
+                st.markdown(
+                    f"**পিতার নাম:** {record['পিতার_নাম']}  \n"
+                    f"**মাতার নাম:** {record['মাতার_নাম']}  \n"
+                    f"**পেশা:** {record['পেশা']}  \n"
+                    f"**Occupation Details:** {record.get('occupation_details', 'N/A')}  \n"
+                    f"**ফোন নাম্বার:** {record.get('phone_number', 'N/A')}"
+                )
+            with col4:
+                st.markdown(
+                    f"**জন্ম তারিখ:** {record.get('জন্ম_তারিখ', 'N/A')}  \n"
+                    f"**ঠিকানা:** {record['ঠিকানা']}  \n"
+                    f"**লিঙ্গ:** {record.get('gender', 'N/A')}  \n"
+                    f"**বয়স:** {record.get('age', 'N/A')}  \n"
+                    f"**Political Status:** {record.get('political_status', 'N/A')}"
+                )
+
+            links = [
+                f"[{label}]({record[field]})"
+                for field, label in (('whatsapp_number', 'Whatsapp'), ('facebook_link', 'ফেসবুক'),
+                                     ('tiktok_link', 'Tiktok'), ('youtube_link', 'Youtube'), ('insta_link', 'Instagram'))
+                if record.get(field)
+            ]
+            if links:
+                st.markdown(" · ".join(links))
+
+            # Description
+            st.markdown(f"**বিবরণ:** {record.get('description', 'N/A')}")
+
+        # Assigned Events and relationship status
+        events_list = record.get('events', [])
+        st.markdown(
+            f"**নির্ধারিত ইভেন্টস:** {', '.join(events_list) if events_list else 'N/A'}  \n"
+            f"**সম্পর্কের ধরণ:** {record['relationship_status']}"
+        )
 
         # Add action button below the card
         if st.button(
@@ -109,6 +112,42 @@ def display_relationship_card(record, db):
             st.success("✅ Regular হিসেবে আপডেট করা হয়েছে!")
             st.rerun()
 
+def display_bulk_status_update(relationship_type, records, total, batch_id, db):
+    """
+    Moves several records of a list to another relationship status with one update:
+    records picked from the current page, or the whole list (all pages).
+    """
+    records_by_id = {record['id']: record for record in records}
+    with st.expander("🔄 একসাথে একাধিক রেকর্ড পরিবর্তন করুন"):
+        selected_ids = st.multiselect(
+            "রেকর্ড নির্বাচন করুন (এই পৃষ্ঠা)",
+            options=list(records_by_id),
+            format_func=lambda record_id: f"{records_by_id[record_id]['নাম']} ({records_by_id[record_id]['ভোটার_নং']})",
+            key=f"bulk_ids_{relationship_type}"
+        )
+        select_all = st.checkbox(f"তালিকার সব {total}টি রেকর্ড", key=f"bulk_all_{relationship_type}")
+        status = st.selectbox(
+            "নতুন সম্পর্কের ধরণ",
+            options=[s for s in RELATIONSHIP_STATUSES if s != relationship_type],
+            key=f"bulk_status_{relationship_type}"
+        )
+        affected = total if select_all else len(selected_ids)
+        st.caption(f"{affected}টি রেকর্ড প্রভাবিত হবে।")
+        if st.button("প্রয়োগ করুন", disabled=not affected, key=f"bulk_apply_{relationship_type}"):
+            try:
+                if select_all:
+                    updated = db.update_relationship_status_bulk(
+                        status, criteria={'relationship_status': relationship_type, 'batch_id': batch_id}
+                    )
+                else:
+                    updated = db.update_relationship_status_bulk(status, record_ids=selected_ids)
+                st.success(f"✅ {updated}টি রেকর্ড '{status}' হিসেবে আপডেট করা হয়েছে!")
+                st.rerun()
+            except Exception as e:
+                db.rollback_changes()
+                logger.error(f"Bulk relationship status update failed: {e}")
+                st.error("সম্পর্কের ধরণ পরিবর্তন করতে সমস্যা হয়েছে।")
+
 def relationships_page():
     if 'authenticated' not in st.session_state or not st.session_state.authenticated:
         st.warning("অনুগ্রহ করে প্রথমে লগইন করুন")
@@ -126,44 +165,54 @@ def relationships_page():
         return
 
     # Batch selection
+    batch_ids = {batch['name']: batch['id'] for batch in batches}
     selected_batch = st.selectbox(
         "ব্যাচ নির্বাচন করুন",
-        options=['সব ব্যাচ'] + [batch['name'] for batch in batches],
-        format_func=lambda x: f"ব্যাচ: {x}"
+        options=['সব ব্যাচ'] + list(batch_ids),
+        format_func=lambda x: f"ব্যাচ: {x}",
+        on_change=lambda: st.session_state.update(relationship_page=1)
+    )
+    batch_id = batch_ids.get(selected_batch)
+
+    # Only the chosen list is loaded; the counts for all of them come from one query
+    counts = db.get_relationship_counts(batch_id)
+    relationship_type = st.radio(
+        "তালিকা",
+        options=list(RELATIONSHIP_SECTIONS),
+        format_func=lambda t: f"{RELATIONSHIP_SECTIONS[t]} ({counts.get(t, 0)})",
+        horizontal=True,
+        label_visibility="collapsed",
+        on_change=lambda: st.session_state.update(relationship_page=1)
     )
 
-    # Create tabs for Friend, Enemy and Connected lists
-    tab1, tab2, tab3 = st.tabs(["🤝 বন্ধু তালিকা", "⚔️ শত্রু তালিকা", "🔗 সংযুক্ত তালিকা"])
-
-    def display_relationship_section(relationship_type):
-        # Get records based on selection
-        if selected_batch == 'সব ব্যাচ':
-            records = db.get_relationship_records(relationship_type)
-        else:
-            batch_id = next(batch['id'] for batch in batches if batch['name'] == selected_batch)
-            # Filter records in Python after fetching all of them
-            all_relationship_records = db.get_relationship_records(relationship_type)
-            records = [r for r in all_relationship_records if r['batch_id'] == batch_id]
-
-        if not records:
-            st.info(f"এই ক্যাটাগরিতে কোনো রেকর্ড যোগ করা হয়নি।")
-            return
-
-        # Show total count
-        st.write(f"মোট: {len(records)}")
-
-        # Display each record in a card format
-        for record in records:
-            display_relationship_card(record, db)
-
-    with tab1:
-        display_relationship_section('Friend')
-
-    with tab2:
-        display_relationship_section('Enemy')
+    total = counts.get(relationship_type, 0)
+    if not total:
+        st.info(f"এই ক্যাটাগরিতে কোনো রেকর্ড যোগ করা হয়নি।")
+        return
 
-    with tab3:
-        display_relationship_section('Connected')
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col2:
+        page_size = st.selectbox("প্রতি পৃষ্ঠায়", options=PAGE_SIZE_OPTIONS, index=0,
+                                 on_change=lambda: st.session_state.update(relationship_page=1))
+    total_pages = (total + page_size - 1) // page_size
+    if st.session_state.get('relationship_page', 1) > total_pages:
+        st.session_state.relationship_page = total_pages
+    with col1:
+        page = st.number_input("পৃষ্ঠা", min_value=1, max_value=total_pages, key='relationship_page')
+    with col3:
+        show_photos = st.checkbox("ছবি দেখান", value=False)
+
+    # Show total count
+    st.write(f"মোট: {total} (পৃষ্ঠা {page} / {total_pages})")
+
+    records = db.get_relationship_records(relationship_type, batch_id=batch_id,
+                                          limit=page_size, offset=(page - 1) * page_size, projection='full')
+
+    display_bulk_status_update(relationship_type, records, total, batch_id, db)
+
+    # Display each record in a card format
+    for record in records:
+        display_relationship_card(record, db, show_photo=show_photos)
 
 if __name__ == "__main__":
     relationships_page()
@@ -1,55 +1,14 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from utils.database import Database
+from utils.analytics import rollup_counts
 from utils.styling import apply_custom_styling
 import logging
 
 logger = logging.getLogger(__name__)
 apply_custom_styling()
 
-def get_relationship_stats(db, batch_id=None):
-    """Get statistics for all relationship statuses"""
-    with db.conn.cursor() as cur:
-        query = """
-            SELECT relationship_status, COUNT(*) as count
-            FROM records
-            """
-        if batch_id:
-            query += " WHERE batch_id = %s"
-            params = (batch_id,)
-        else:
-            params = ()
-
-        query += """
-            GROUP BY relationship_status
-            ORDER BY count DESC
-        """
-        cur.execute(query, params)
-        return cur.fetchall()
-
-def get_batch_relationship_stats(db, selected_batch_id=None):
-    """Get relationship statistics per batch"""
-    with db.conn.cursor() as cur:
-        query = """
-            SELECT b.name as batch_name, r.relationship_status, COUNT(*) as count
-            FROM records r
-            JOIN batches b ON r.batch_id = b.id
-            """
-        if selected_batch_id:
-            query += " WHERE r.batch_id = %s"
-            params = (selected_batch_id,)
-        else:
-            params = ()
-
-        query += """
-            GROUP BY b.name, r.relationship_status
-            ORDER BY b.name, r.relationship_status
-        """
-        cur.execute(query, params)
-        return cur.fetchall()
-
 def relationship_stats_page():
     if 'authenticated' not in st.session_state or not st.session_state.authenticated:
         st.warning("অনুগ্রহ করে প্রথমে লগইন করুন")
@@ -66,27 +25,22 @@ def relationship_stats_page():
         st.info("কোন ডাটা পাওয়া যায়নি")
         return
 
-    # Batch selection
-    selected_batch = st.selectbox(
+    # Batch selection; several batches can be compared at once
+    batch_names = {batch['id']: batch['name'] for batch in batches}
+    selected_batch_ids = st.multiselect(
         "ব্যাচ নির্বাচন করুন",
-        options=['সব ব্যাচ'] + [batch['name'] for batch in batches],
-        format_func=lambda x: f"ব্যাচ: {x}"
+        options=list(batch_names),
+        format_func=lambda batch_id: f"ব্যাচ: {batch_names[batch_id]}",
+        placeholder="সব ব্যাচ"
     )
 
-    # Get selected batch ID
-    selected_batch_id = None
-    if selected_batch != 'সব ব্যাচ':
-        selected_batch_id = next(batch['id'] for batch in batches if batch['name'] == selected_batch)
-
-    # Get overall statistics based on selection
-    stats = get_relationship_stats(db, selected_batch_id)
-    if not stats:
+    # Counts are rolled up from the analytics cube, refreshed for batches changed since the last run
+    db.refresh_analytics_cube()
+    df_stats = rollup_counts(db, ['relationship_status'], batch_ids=selected_batch_ids)
+    if df_stats.empty:
         st.info("কোন পরিসংখ্যান পাওয়া যায়নি")
         return
 
-    # Create DataFrame for overall stats
-    df_stats = pd.DataFrame(stats, columns=['relationship_status', 'count'])
-
     # Show total counts at the top
     total_records = df_stats['count'].sum()
     processed_records = df_stats[df_stats['relationship_status'] != 'Regular']['count'].sum()
@@ -118,10 +72,11 @@ def relationship_stats_page():
     st.plotly_chart(fig_pie, use_container_width=True)
 
     # Display bar chart for batch-wise distribution
-    batch_stats = get_batch_relationship_stats(db, selected_batch_id)
-    if batch_stats:
+    df_batch_stats = rollup_counts(db, ['batch_id', 'relationship_status'], batch_ids=selected_batch_ids)
+    if not df_batch_stats.empty:
         st.subheader("📊 ব্যাচ অনুযায়ী সম্পর্কের বিতরণ")
-        df_batch_stats = pd.DataFrame(batch_stats, columns=['batch_name', 'relationship_status', 'count'])
+        df_batch_stats['batch_name'] = df_batch_stats['batch_id'].map(batch_names)
+        df_batch_stats = df_batch_stats[['batch_name', 'relationship_status', 'count']].sort_values(['batch_name', 'relationship_status'])
 
         # Create bar chart with custom colors
         fig = px.bar(
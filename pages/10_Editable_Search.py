@@ -55,7 +55,7 @@ def editable_search_page():
 
         try:
             with st.spinner("অনুসন্ধান করা হচ্ছে..."):
-                results = db.search_records_advanced(search_criteria)
+                results = db.search_records_advanced(search_criteria, projection='full', compact=True)
             
             st.session_state.search_results = results
             if not results:
@@ -171,9 +171,10 @@ def editable_search_page():
 
                             db.update_record(record['id'], updated_data)
 
-                            # 2. Update Event Assignments
-                            selected_event_ids = [event_map[name] for name in selected_events]
-                            db.assign_events_to_record(record['id'], selected_event_ids)
+                            # 2. Update Event Assignments, only if the selection changed
+                            if set(selected_events) != set(assigned_events):
+                                selected_event_ids = [event_map[name] for name in selected_events]
+                                db.assign_events_to_record(record['id'], selected_event_ids)
 
                             st.success(f"রেকর্ড '{record['নাম']}' সফলভাবে আপডেট করা হয়েছে।")
                             # Clear results to allow a new search
@@ -10,23 +10,31 @@ logger = logging.getLogger(__name__)
 # Apply custom styling to the page
 apply_custom_styling()
 
+PAGE_SIZE_OPTIONS = [25, 50, 100, 250]
+
+# Columns shown in the results table, in order
+DISPLAY_COLUMNS = [
+    'ক্রমিক_নং', 'নাম', 'ভোটার_নং', 'পিতার_নাম', 'মাতার_নাম',
+    'পেশা', 'ঠিকানা', 'জন্ম_তারিখ', 'phone_number',
+    'facebook_link', 'relationship_status', 'gender', 'batch_name', 'events'
+]
+
 def event_filter_page():
     """
-    Streamlit page to filter and display records based on a selected event.
-    It provides a dropdown to select an event and shows all associated records
-    in a clean, readable table upon filtering.
+    Streamlit page to filter records by a combination of events, e.g. "attended
+    A and B but not C", narrowed by batch, gender, name and address. Shows the
+    number of matching records and a paginated table of them.
     """
     # Check if the user is authenticated before showing the page content
     if 'authenticated' not in st.session_state or not st.session_state.authenticated:
         st.warning("অনুগ্রহ করে প্রথমে লগইন করুন")
         return
 
-    st.title("🗓️ ইভেন্ট অনুযায়ী ফিল্টার")
-    st.markdown("এখানে আপনি একটি নির্দিষ্ট ইভেন্টের জন্য নির্ধারিত সমস্ত রেকর্ড দেখতে পারেন।")
+    st.title("🗓️ ইভেন্ট অনুযায়ী ফিল্টার")
+    st.markdown("একাধিক ইভেন্ট মিলিয়ে রেকর্ড খুঁজুন: সবগুলোতে আছে, যেকোনোটিতে আছে বা কোনোটিতেই নেই।")
 
     db = Database()
 
-    # --- Event Selection Dropdown ---
     try:
         # Fetch all available events from the database
         all_events = db.get_all_events()
@@ -36,47 +44,70 @@ def event_filter_page():
 
         # Create a mapping from event name to event ID for easy lookup
         event_map = {event['name']: event['id'] for event in all_events}
-        
-        # Display a selectbox for the user to choose an event
-        selected_event_name = st.selectbox(
-            "একটি ইভেন্ট নির্বাচন করুন",
-            options=event_map.keys(),
-            help="তালিকা থেকে একটি ইভেন্ট নির্বাচন করে ফিল্টার করুন।"
-        )
+        batches = db.get_all_batches()
+        batch_map = {batch['name']: batch['id'] for batch in batches}
+
+        with st.container(border=True):
+            all_of = st.multiselect("সবগুলো ইভেন্টে আছে (AND)", options=event_map.keys())
+            any_of = st.multiselect("যেকোনো একটি ইভেন্টে আছে (OR)", options=event_map.keys())
+            none_of = st.multiselect("কোনো ইভেন্টে নেই (NOT)", options=event_map.keys())
+
+            col1, col2 = st.columns(2)
+            with col1:
+                batch_name = st.selectbox("ব্যাচ", options=['সব ব্যাচ'] + list(batch_map))
+                name = st.text_input("নাম")
+            with col2:
+                gender = st.selectbox("লিঙ্গ", options=['সব', 'Male', 'Female', 'Other'])
+                address = st.text_input("ঠিকানা")
 
         # --- Filter Button ---
         if st.button("🔍 ফিল্টার করুন", type="primary", use_container_width=True):
-            if selected_event_name:
-                selected_event_id = event_map[selected_event_name]
-
-                with st.spinner(f"'{selected_event_name}' ইভেন্টের জন্য রেকর্ড আনা হচ্ছে..."):
-                    # Fetch records associated with the selected event from the database
-                    records = db.get_records_for_event(selected_event_id)
-
-                    if records:
-                        st.success(f"'{selected_event_name}' ইভেন্টের জন্য {len(records)} টি রেকর্ড পাওয়া গেছে।")
-                        
-                        # Convert the list of records to a pandas DataFrame for display
-                        df = pd.DataFrame(records)
-                        
-                        # Define which columns to display and in what order
-                        display_columns = [
-                            'ক্রমিক_নং', 'নাম', 'ভোটার_নং', 'পিতার_নাম', 'মাতার_নাম', 
-                            'পেশা', 'ঠিকানা', 'জন্ম_তারিখ', 'phone_number', 
-                            'facebook_link', 'relationship_status', 'gender', 'batch_name' # Added gender
-                        ]
-                        
-                        # Ensure only existing columns are selected to prevent errors
-                        df_display = df[[col for col in display_columns if col in df.columns]]
-
-                        # Display the data in a table
-                        st.dataframe(
-                            df_display,
-                            hide_index=True,
-                            use_container_width=True
-                        )
-                    else:
-                        st.info(f"'{selected_event_name}' ইভেন্টের জন্য কোনো রেকর্ড নির্ধারিত করা হয়নি।")
+            if not (all_of or any_of or none_of):
+                st.warning("অন্তত একটি ইভেন্ট নির্বাচন করুন।")
+                return
+            criteria = {'batch_id': batch_map.get(batch_name), 'gender': gender, 'নাম': name, 'ঠিকানা': address}
+            event_filter = {
+                'all_of': [event_map[n] for n in all_of],
+                'any_of': [event_map[n] for n in any_of],
+                'none_of': [event_map[n] for n in none_of],
+                'criteria': {k: v for k, v in criteria.items() if v},
+            }
+            # The filter and its count are kept for the session so paging only fetches rows
+            st.session_state.event_filter = (event_filter, db.count_records_by_events(**event_filter))
+            st.session_state.event_filter_page = 1
+
+        if 'event_filter' not in st.session_state:
+            return
+        event_filter, total = st.session_state.event_filter
+
+        if not total:
+            st.info("এই শর্তগুলোর সাথে মেলে এমন কোনো রেকর্ড পাওয়া যায়নি।")
+            return
+        st.success(f"{total} টি রেকর্ড পাওয়া গেছে।")
+
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            page_size = st.selectbox("প্রতি পৃষ্ঠায়", options=PAGE_SIZE_OPTIONS, index=1,
+                                     on_change=lambda: st.session_state.update(event_filter_page=1))
+        total_pages = (total + page_size - 1) // page_size
+        with col1:
+            page = st.number_input("পৃষ্ঠা", min_value=1, max_value=total_pages, key='event_filter_page')
+
+        records = db.get_records_by_events(**event_filter, limit=page_size, offset=(page - 1) * page_size,
+                                           projection='full')
+        df = pd.DataFrame(records)
+
+        # Ensure only existing columns are selected to prevent errors
+        df_display = df[[col for col in DISPLAY_COLUMNS if col in df.columns]]
+
+        # Display the data in a table
+        st.dataframe(
+            df_display,
+            column_config={'events': st.column_config.ListColumn('ইভেন্টস')},
+            hide_index=True,
+            use_container_width=True
+        )
+        st.caption(f"পৃষ্ঠা {page} / {total_pages}")
 
     except Exception as e:
         logger.error(f"Error fetching or displaying event data: {e}")
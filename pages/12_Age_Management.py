@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 from utils.database import Database
+from utils.analytics import rollup_counts
 from utils.styling import apply_custom_styling
 from attached_assets.data_processor import calculate_age
 import logging
@@ -58,13 +58,16 @@ def age_management_page():
     # --- Age Distribution Analysis ---
     st.subheader("বয়স অনুযায়ী বিতরণ")
 
-    # Fetch age distribution from dashboard stats
-    dashboard_stats = db.get_dashboard_stats()
-    age_distribution_data = dashboard_stats.get('age_distribution', [])
+    batch_names = {batch['id']: batch['name'] for batch in db.get_all_batches()}
+    selected_batch_ids = st.multiselect("ব্যাচ", options=list(batch_names), format_func=batch_names.get,
+                                        placeholder="সব ব্যাচ")
 
-    if age_distribution_data:
-        df_age = pd.DataFrame(age_distribution_data)
-        
+    # Age groups of the selected batches, rolled up from the analytics cube
+    db.refresh_analytics_cube()
+    df_age = rollup_counts(db, ['age_group'], batch_ids=selected_batch_ids)
+    df_age = df_age[df_age['age_group'] != 'Unknown'].copy()
+
+    if not df_age.empty:
         # Sort age groups for better visualization
         # Handle 'Unknown' or other non-numeric labels for sorting
         df_age['age_group_sort_key'] = df_age['age_group'].apply(lambda x: int(x.split('-')[0]) if x != 'Unknown' else -1)
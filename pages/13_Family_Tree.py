@@ -1,6 +1,8 @@
 import streamlit as st
-from utils.database import Database
+import pandas as pd
+from utils.database import Database, FAMILY_RELATIONSHIP_INVERSES
 from utils.styling import apply_custom_styling
+from utils.family_graph import family_graph
 from datetime import datetime
 
 # --- Page Configuration and Initialization ---
@@ -17,50 +19,39 @@ def search_voters(query):
     if not query:
         return []
     search_criteria = {"নাম": query, "ভোটার_নং": query}
-    return db.search_records_advanced(search_criteria)
+    return db.search_records_advanced(search_criteria, projection='summary')
 
 @st.cache_data(ttl=30)
-def get_family_connections(_voter_id):
-    """Cached function to get family connections for a specific voter."""
-    if _voter_id is None:
+def get_family_tree(voter_id, max_depth):
+    """Cached function to get the family tree of a voter up to `max_depth` generations."""
+    if voter_id is None:
         return []
-    return db.get_family_connections_for_record(_voter_id)
+    return db.get_family_tree(voter_id, max_depth)
 
 # --- Helper Functions ---
-def get_bidirectional_relationships(relationship_type):
-    """Returns the forward and reverse relationship types."""
-    relationships = {
-        "পিতা": {"source_to_target": "পিতা", "target_to_source": "সন্তান"},
-        "মাতা": {"source_to_target": "মাতা", "target_to_source": "সন্তান"},
-        "স্বামী": {"source_to_target": "স্বামী", "target_to_source": "স্ত্রী"},
-        "স্ত্রী": {"source_to_target": "স্ত্রী", "target_to_source": "স্বামী"},
-        "ছেলে": {"source_to_target": "ছেলে", "target_to_source": "পিতা"},
-        "মেয়ে": {"source_to_target": "মেয়ে", "target_to_source": "মাতা"},
-        "ভাই": {"source_to_target": "ভাই", "target_to_source": "ভাই"},
-        "বোন": {"source_to_target": "বোন", "target_to_source": "বোন"},
-        "দাদা": {"source_to_target": "দাদা", "target_to_source": "নাতি"},
-        "দাদী": {"source_to_target": "দাদী", "target_to_source": "নাতনি"},
-        "নাতি": {"source_to_target": "নাতি", "target_to_source": "দাদা"},
-        "নাতনি": {"source_to_target": "নাতনি", "target_to_source": "দাদী"},
-        "চাচা": {"source_to_target": "চাচা", "target_to_source": "ভাতিজা"},
-        "চাচী": {"source_to_target": "চাচী", "target_to_source": "ভাতিজি"},
-        "ভাতিজা": {"source_to_target": "ভাতিজা", "target_to_source": "চাচা"},
-        "ভাতিজি": {"source_to_target": "ভাতিজি", "target_to_source": "চাচী"},
-        "মামা": {"source_to_target": "মামা", "target_to_source": "ভাগ্নে"},
-        "মামি": {"source_to_target": "মামি", "target_to_source": "ভাগ্নি"},
-        "ভাগ্নে": {"source_to_target": "ভাগ্নে", "target_to_source": "মামা"},
-        "ভাগ্নি": {"source_to_target": "ভাগ্নি", "target_to_source": "মামি"},
-        "শ্বশুর": {"source_to_target": "শ্বশুর", "target_to_source": "জামাই"},
-        "শাশুড়ি": {"source_to_target": "শাশুড়ি", "target_to_source": "বউমা"},
-        "জামাই": {"source_to_target": "জামাই", "target_to_source": "শ্বশুর"},
-        "বউমা": {"source_to_target": "বউমা", "target_to_source": "শাশুড়ি"},
-        "অন্যান্য": {"source_to_target": "অন্যান্য", "target_to_source": "অন্যান্য"},
-    }
-    return relationships.get(relationship_type, {"source_to_target": relationship_type, "target_to_source": "সম্পর্কিত ব্যক্তি"})
+def build_family_tree_dot(root, members):
+    """Builds a Graphviz DOT graph of a family tree, one node per member and one edge per connection used."""
+    def node_label(name, voter_no):
+        label = f"{name or 'N/A'}\\n{voter_no or ''}".strip()
+        return label.replace('"', "'")
+
+    lines = [
+        'digraph family {',
+        '  rankdir=TB;',
+        '  node [shape=box, style="rounded,filled", fillcolor="#F5F5F5", fontname="sans-serif"];',
+        '  edge [fontname="sans-serif", fontsize=10];',
+        f'  n{root["id"]} [label="{node_label(root["নাম"], root.get("ভোটার_নং"))}", fillcolor="#FFE7A0"];',
+    ]
+    for member in members:
+        lines.append(f'  n{member["id"]} [label="{node_label(member["নাম"], member.get("ভোটার_নং"))}"];')
+        relation = (member['relationship_to_source'] or '').replace('"', "'")
+        lines.append(f'  n{member["parent_id"]} -> n{member["id"]} [label="{relation}"];')
+    lines.append('}')
+    return '\n'.join(lines)
 
 def clear_and_rerun():
     """Clears relevant caches and session state, then reruns the app."""
-    get_family_connections.clear()
+    get_family_tree.clear()
     search_voters.clear()
     
     keys_to_clear = ['family_search_query', 'new_family_member_data', 'main_voter_radio', 'current_voter_options', 'main_search_results']
@@ -141,7 +132,7 @@ if st.session_state.selected_main_voter_id:
         
         # --- 2. Add Family Member ---
         st.header("২. পারিবারিক সদস্য যোগ করুন")
-        RELATIONSHIP_OPTIONS = ["পিতা", "মাতা", "স্বামী", "স্ত্রী", "ছেলে", "মেয়ে", "ভাই", "বোন", "দাদা", "দাদী", "নাতি", "নাতনি", "চাচা", "চাচী", "ভাতিজা", "ভাতিজি", "মামা", "মামি", "ভাগ্নে", "ভাগ্নি", "শ্বশুর", "শাশুড়ি", "জামাই", "বউমা", "অন্যান্য"]
+        RELATIONSHIP_OPTIONS = list(FAMILY_RELATIONSHIP_INVERSES.keys())
         tab1, tab2 = st.tabs(["বিদ্যমান সদস্য খুঁজুন", "নতুন সদস্য যোগ করুন"])
 
         with tab1:
@@ -162,16 +153,11 @@ if st.session_state.selected_main_voter_id:
                             with col_m3:
                                 selected_relation = st.selectbox("সম্পর্ক:", RELATIONSHIP_OPTIONS, key=f"relation_select_{member['id']}")
                                 if st.button("যোগ করুন", key=f"add_existing_member_{member['id']}"):
-                                    rel_map = get_bidirectional_relationships(selected_relation)
-                                    try:
-                                        db.add_family_connection(st.session_state.selected_main_voter_id, member['id'], rel_map["source_to_target"])
-                                        db.add_family_connection(member['id'], st.session_state.selected_main_voter_id, rel_map["target_to_source"])
-                                        db.commit_changes()
+                                    if db.add_family_connection(st.session_state.selected_main_voter_id, member['id'], selected_relation):
                                         st.success(f"{member['নাম']} কে পরিবারে যোগ করা হয়েছে।")
                                         clear_and_rerun()
-                                    except Exception as e:
-                                        db.rollback_changes()
-                                        st.error(f"যোগ করতে ব্যর্থ: {e}. সম্পর্ক ইতিমধ্যে বিদ্যমান থাকতে পারে।")
+                                    else:
+                                        st.error("যোগ করতে ব্যর্থ। সম্পর্ক ইতিমধ্যে বিদ্যমান থাকতে পারে।")
                 else:
                     st.info("কোনো সদস্য পাওয়া যায়নি।")
         
@@ -192,12 +178,12 @@ if st.session_state.selected_main_voter_id:
                             family_batch_id = db.add_batch("Family Tree Additions")
                             new_member_data = {"নাম": name, "পিতার_নাম": father_name, "ভোটার_নং": voter_no, "gender": gender, "description": "পরিবার বৃক্ষ থেকে যোগ করা হয়েছে"}
                             new_member_id = db.add_record(family_batch_id, "family_tree_manual", new_member_data)
-                            rel_map = get_bidirectional_relationships(relationship_type)
-                            db.add_family_connection(st.session_state.selected_main_voter_id, new_member_id, rel_map["source_to_target"])
-                            db.add_family_connection(new_member_id, st.session_state.selected_main_voter_id, rel_map["target_to_source"])
-                            db.commit_changes()
-                            st.success(f"নতুন সদস্য '{name}' যোগ করা হয়েছে।")
-                            clear_and_rerun()
+                            # The new record and its link are committed together
+                            if db.add_family_connection(st.session_state.selected_main_voter_id, new_member_id, relationship_type):
+                                st.success(f"নতুন সদস্য '{name}' যোগ করা হয়েছে।")
+                                clear_and_rerun()
+                            else:
+                                st.error("নতুন সদস্য যোগ করতে ব্যর্থ।")
                         except Exception as e:
                             db.rollback_changes()
                             st.error(f"নতুন সদস্য যোগ করতে ব্যর্থ: {e}")
@@ -206,10 +192,21 @@ if st.session_state.selected_main_voter_id:
         
         # --- 3. Display Family Tree ---
         st.header("৩. পরিবার বৃক্ষ প্রদর্শন")
-        family_connections = get_family_connections(st.session_state.selected_main_voter_id)
-        if family_connections:
-            st.write(f"**{main_voter_details['নাম']} এর পারিবারিক সদস্যগণ:**")
-            for connection in family_connections:
+        max_depth = st.slider("কত প্রজন্ম পর্যন্ত দেখাবেন:", min_value=1, max_value=6, value=3, key="family_tree_depth")
+        family_tree = get_family_tree(st.session_state.selected_main_voter_id, max_depth)
+        if family_tree:
+            st.write(f"**{main_voter_details['নাম']} এর পরিবারে {len(family_tree)} জন সদস্য পাওয়া গেছে:**")
+            st.graphviz_chart(build_family_tree_dot(main_voter_details, family_tree), use_container_width=True)
+
+            # Members further away than one connection, with the chain of relationships leading to them
+            extended_members = [member for member in family_tree if member['depth'] > 1]
+            if extended_members:
+                with st.expander(f"দূরের আত্মীয় ({len(extended_members)} জন)"):
+                    for member in extended_members:
+                        st.markdown(f"**{member['নাম']}** ({member.get('ভোটার_নং') or 'N/A'}) — {' → '.join(member['relationship_path'])}")
+
+            st.write(f"**{main_voter_details['নাম']} এর সরাসরি পারিবারিক সদস্যগণ:**")
+            for connection in (member for member in family_tree if member['depth'] == 1):
                 with st.container(border=True):
                     col_d1, col_d2, col_d3 = st.columns([1, 4, 1.5])
                     with col_d1:
@@ -218,18 +215,109 @@ if st.session_state.selected_main_voter_id:
                         st.markdown(f"**সম্পর্ক:** {connection['relationship_to_source']}<br>**নাম:** {connection['নাম']}", unsafe_allow_html=True)
                     with col_d3:
                         if st.button("মুছুন", key=f"delete_connection_{connection['id']}"):
-                            try:
-                                rel_map = get_bidirectional_relationships(connection['relationship_to_source'])
-                                db.delete_family_connection(st.session_state.selected_main_voter_id, connection['id'], rel_map["source_to_target"])
-                                db.delete_family_connection(connection['id'], st.session_state.selected_main_voter_id, rel_map["target_to_source"])
-                                db.commit_changes()
+                            if db.delete_family_connection(st.session_state.selected_main_voter_id, connection['id']):
                                 st.success(f"{connection['নাম']} এর সাথে সম্পর্ক মুছে ফেলা হয়েছে।")
                                 clear_and_rerun()
-                            except Exception as e:
-                                db.rollback_changes()
-                                st.error(f"মুছতে ব্যর্থ: {e}")
+                            else:
+                                st.error("মুছতে ব্যর্থ।")
         else:
             st.info("এই ভোটারের জন্য কোনো পারিবারিক সম্পর্ক নেই।")
 
+        st.markdown("---")
+
+        # --- 4. Relationship Between Two Voters ---
+        st.header("৪. দুই ভোটারের মধ্যে সম্পর্ক খুঁজুন")
+        family_size = len(family_graph.connected_component(db, st.session_state.selected_main_voter_id)) - 1
+        nearby = family_graph.neighbourhood(db, st.session_state.selected_main_voter_id, hops=2)
+        stat_col1, stat_col2 = st.columns(2)
+        stat_col1.metric("সম্পর্কিত মোট ব্যক্তি", family_size)
+        stat_col2.metric("দুই ধাপের মধ্যে", len(nearby) - 1)
+
+        relation_query = st.text_input("অন্য ভোটারকে নাম বা ভোটার নং দ্বারা খুঁজুন:", key="relation_search_input")
+        if relation_query:
+            candidates = [v for v in search_voters(relation_query) if v['id'] != st.session_state.selected_main_voter_id]
+            if candidates:
+                candidate_options = {f"{v['নাম']} ({v['ভোটার_নং'] or 'N/A'}) - ID: {v['id']}": v['id'] for v in candidates}
+                other_label = st.selectbox("ভোটার নির্বাচন করুন:", options=list(candidate_options.keys()), key="relation_target_select")
+                path = family_graph.shortest_path(db, st.session_state.selected_main_voter_id, candidate_options[other_label])
+                if path:
+                    people = db.get_records_by_ids([record_id for record_id, _ in path])
+                    steps = [f"**{people[path[0][0]]['নাম']}**"]
+                    for record_id, relationship in path[1:]:
+                        steps.append(f"{relationship or 'সম্পর্কিত ব্যক্তি'}: **{people[record_id]['নাম']}**")
+                    st.success(f"{len(path) - 1} ধাপের সম্পর্ক পাওয়া গেছে:")
+                    st.markdown(" → ".join(steps))
+                else:
+                    st.info("এই দুই ভোটারের মধ্যে কোনো পারিবারিক সম্পর্ক পাওয়া যায়নি।")
+            else:
+                st.info("কোনো ভোটার পাওয়া যায়নি।")
+
 else:
     st.info("শুরু করতে, অনুগ্রহ করে উপরে একজন প্রধান ভোটার খুঁজুন এবং নির্বাচন করুন।")
+
+st.markdown("---")
+
+# --- 5. Suggested Parent Links ---
+st.header("৫. স্বয়ংক্রিয় পারিবারিক সংযোগ পরামর্শ")
+st.markdown("ভোটারদের পিতার নাম ও মাতার নাম একই ব্যাচের অন্য ভোটারদের নামের সাথে মিলিয়ে সম্ভাব্য পিতা-মাতা খুঁজে বের করা হয়।")
+
+SUGGESTION_PAGE_SIZE = 50
+suggestion_batches = db.get_all_batches()
+suggestion_batch_map = {batch['name']: batch['id'] for batch in suggestion_batches}
+sugg_col1, sugg_col2 = st.columns([3, 1])
+with sugg_col1:
+    suggestion_batch_name = st.selectbox("ব্যাচ:", options=['সব ব্যাচ'] + list(suggestion_batch_map.keys()), key="suggestion_batch_select")
+suggestion_batch_id = suggestion_batch_map.get(suggestion_batch_name)
+with sugg_col2:
+    st.write("") # Vertical spacer for alignment
+    if st.button("পরামর্শ তৈরি করুন", key="generate_suggestions_button"):
+        with st.spinner("সম্ভাব্য সংযোগ খোঁজা হচ্ছে..."):
+            generated = db.generate_family_link_suggestions(suggestion_batch_id)
+        st.success(f"{generated} টি পরামর্শ তৈরি বা হালনাগাদ করা হয়েছে।")
+
+pending_count = db.count_family_link_suggestions(suggestion_batch_id)
+if pending_count:
+    suggestion_pages = (pending_count + SUGGESTION_PAGE_SIZE - 1) // SUGGESTION_PAGE_SIZE
+    suggestion_page = st.number_input("পৃষ্ঠা", min_value=1, max_value=suggestion_pages, value=1, key="suggestion_page")
+    st.caption(f"মোট {pending_count} টি অপেক্ষমাণ পরামর্শ, পৃষ্ঠা {suggestion_page} / {suggestion_pages}")
+    suggestions = db.get_family_link_suggestions(
+        suggestion_batch_id, limit=SUGGESTION_PAGE_SIZE, offset=(suggestion_page - 1) * SUGGESTION_PAGE_SIZE
+    )
+    select_all = st.checkbox("এই পৃষ্ঠার সব নির্বাচন করুন", key="suggestion_select_all")
+    df_suggestions = pd.DataFrame([{
+        'নির্বাচন': select_all,
+        'id': s['id'],
+        'ভোটার': f"{s['child_name']} ({s['child_voter_no'] or 'N/A'})",
+        'সম্পর্ক': s['relationship'],
+        'সম্ভাব্য পিতা/মাতা': f"{s['parent_name']} ({s['parent_voter_no'] or 'N/A'})",
+        'স্কোর': round(s['score'], 2),
+        'একই ঠিকানা': s['same_address'],
+        'বয়সের পার্থক্য': s['age_gap'],
+        'প্রার্থী সংখ্যা': s['candidate_count'],
+    } for s in suggestions])
+    edited_suggestions = st.data_editor(
+        df_suggestions,
+        hide_index=True,
+        use_container_width=True,
+        disabled=[col for col in df_suggestions.columns if col != 'নির্বাচন'],
+        column_config={'id': None},
+        key=f"suggestion_editor_{suggestion_batch_id}_{suggestion_page}_{select_all}"
+    )
+    selected_suggestion_ids = edited_suggestions.loc[edited_suggestions['নির্বাচন'], 'id'].tolist()
+
+    accept_col, reject_col = st.columns(2)
+    with accept_col:
+        if st.button(f"✅ নির্বাচিত {len(selected_suggestion_ids)} টি গ্রহণ করুন", key="accept_suggestions_button", disabled=not selected_suggestion_ids):
+            try:
+                accepted = db.accept_family_link_suggestions(selected_suggestion_ids)
+                st.success(f"{accepted} টি পারিবারিক সংযোগ যোগ করা হয়েছে।")
+                clear_and_rerun()
+            except Exception as e:
+                st.error(f"পরামর্শ গ্রহণ করতে ব্যর্থ: {e}")
+    with reject_col:
+        if st.button(f"❌ নির্বাচিত {len(selected_suggestion_ids)} টি বাতিল করুন", key="reject_suggestions_button", disabled=not selected_suggestion_ids):
+            rejected = db.reject_family_link_suggestions(selected_suggestion_ids)
+            st.success(f"{rejected} টি পরামর্শ বাতিল করা হয়েছে।")
+            st.rerun()
+else:
+    st.info("কোনো অপেক্ষমাণ পরামর্শ নেই। নতুন পরামর্শ পেতে 'পরামর্শ তৈরি করুন' চাপুন।")
@@ -0,0 +1,147 @@
+import streamlit as st
+import pandas as pd
+from utils.database import Database
+from utils.styling import apply_custom_styling
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Apply custom styling to the page
+apply_custom_styling()
+
+CHANGE_TYPE_LABELS = {
+    'added': 'নতুন যুক্ত',
+    'removed': 'বাদ পড়েছে',
+    'changed': 'পরিবর্তিত',
+}
+
+FIELD_LABELS = {
+    'নাম': 'নাম',
+    'পিতার_নাম': 'পিতার নাম',
+    'মাতার_নাম': 'মাতার নাম',
+    'পেশা': 'পেশা',
+    'জন্ম_তারিখ': 'জন্ম তারিখ',
+    'ঠিকানা': 'ঠিকানা',
+    'gender': 'লিঙ্গ',
+}
+
+PAGE_SIZE_OPTIONS = [25, 50, 100, 250]
+
+def format_changes(changes):
+    """Turns a diff row's {field: {old, new}} map into one readable line."""
+    if not changes:
+        return ''
+    return '; '.join(
+        f"{FIELD_LABELS.get(field, field)}: {change['old'] or '—'} → {change['new'] or '—'}"
+        for field, change in changes.items()
+    )
+
+def batch_diff_page():
+    """
+    Streamlit page to compare two batches, e.g. two revisions of an election
+    commission list. Shows how many voters were added, removed or changed and
+    a paginated list of the differences.
+    """
+    # Check if the user is authenticated before showing the page content
+    if 'authenticated' not in st.session_state or not st.session_state.authenticated:
+        st.warning("অনুগ্রহ করে প্রথমে লগইন করুন")
+        return
+
+    st.title("🔀 ব্যাচ তুলনা")
+    st.markdown("একই তালিকার দুটি সংস্করণ তুলনা করুন। ভোটার নম্বর দিয়ে রেকর্ড মেলানো হয়।")
+
+    db = Database()
+
+    try:
+        batches = db.get_all_batches()
+        if len(batches) < 2:
+            st.info("তুলনা করার জন্য অন্তত দুটি ব্যাচ প্রয়োজন।")
+            return
+
+        batch_map = {batch['name']: batch['id'] for batch in batches}
+        batch_names = list(batch_map.keys())
+
+        col1, col2 = st.columns(2)
+        with col1:
+            # Batches are listed newest first, so default to the previous revision as the old side
+            old_batch_name = st.selectbox("পুরাতন ব্যাচ", options=batch_names, index=1)
+        with col2:
+            new_batch_name = st.selectbox("নতুন ব্যাচ", options=batch_names, index=0)
+
+        if st.button("🔍 তুলনা করুন", type="primary", use_container_width=True):
+            if old_batch_name == new_batch_name:
+                st.warning("অনুগ্রহ করে দুটি ভিন্ন ব্যাচ নির্বাচন করুন।")
+            else:
+                batch_a, batch_b = batch_map[old_batch_name], batch_map[new_batch_name]
+                with st.spinner("ব্যাচ তুলনা করা হচ্ছে..."):
+                    # The summary is kept for the session so paging only fetches detail rows
+                    st.session_state.batch_diff = (batch_a, batch_b, db.get_batch_diff_summary(batch_a, batch_b))
+                st.session_state.batch_diff_page = 1
+
+        if 'batch_diff' not in st.session_state:
+            return
+        batch_a, batch_b, summary = st.session_state.batch_diff
+        if batch_a not in batch_map.values() or batch_b not in batch_map.values():
+            del st.session_state.batch_diff
+            return
+
+        batch_names_by_id = {batch_id: name for name, batch_id in batch_map.items()}
+        st.subheader(f"{batch_names_by_id[batch_a]} → {batch_names_by_id[batch_b]}")
+
+        metric_cols = st.columns(4)
+        metric_cols[0].metric("নতুন যুক্ত", summary['added'])
+        metric_cols[1].metric("বাদ পড়েছে", summary['removed'])
+        metric_cols[2].metric("পরিবর্তিত", summary['changed'])
+        metric_cols[3].metric("অপরিবর্তিত", summary['unchanged'])
+
+        if summary['field_changes']:
+            st.markdown("**কোন তথ্য কতজনের পরিবর্তিত হয়েছে**")
+            df_fields = pd.DataFrame(
+                [{'তথ্য': FIELD_LABELS.get(field, field), 'রেকর্ড': count}
+                 for field, count in sorted(summary['field_changes'].items(), key=lambda item: -item[1])]
+            )
+            st.dataframe(df_fields, hide_index=True, use_container_width=True)
+
+        # --- Paginated details ---
+        st.subheader("বিস্তারিত")
+        type_counts = {change_type: summary[change_type] for change_type in CHANGE_TYPE_LABELS}
+        filter_col, size_col = st.columns([3, 1])
+        with filter_col:
+            change_type = st.selectbox(
+                "পরিবর্তনের ধরন",
+                options=[None] + list(CHANGE_TYPE_LABELS),
+                format_func=lambda t: f"সব ({sum(type_counts.values())})" if t is None else f"{CHANGE_TYPE_LABELS[t]} ({type_counts[t]})",
+                on_change=lambda: st.session_state.update(batch_diff_page=1)
+            )
+        with size_col:
+            page_size = st.selectbox("প্রতি পৃষ্ঠায়", options=PAGE_SIZE_OPTIONS, index=1,
+                                     on_change=lambda: st.session_state.update(batch_diff_page=1))
+
+        total_rows = sum(type_counts.values()) if change_type is None else type_counts[change_type]
+        if not total_rows:
+            st.info("এই ধরনের কোনো পার্থক্য পাওয়া যায়নি।")
+            return
+
+        total_pages = (total_rows + page_size - 1) // page_size
+        page = st.number_input("পৃষ্ঠা", min_value=1, max_value=total_pages, key='batch_diff_page')
+        st.caption(f"মোট {total_rows} টি পার্থক্য, পৃষ্ঠা {page} / {total_pages}")
+
+        rows = db.get_batch_diff(batch_a, batch_b, change_type=change_type,
+                                 limit=page_size, offset=(page - 1) * page_size)
+        df = pd.DataFrame([{
+            'ধরন': CHANGE_TYPE_LABELS[row['change_type']],
+            'ভোটার নং': row['ভোটার_নং'],
+            'নাম': row['নাম'],
+            'পিতার নাম': row['পিতার_নাম'],
+            'ঠিকানা': row['ঠিকানা'],
+            'পরিবর্তন': format_changes(row['changes']),
+        } for row in rows])
+        st.dataframe(df, hide_index=True, use_container_width=True)
+
+    except Exception as e:
+        logger.error(f"Error comparing batches: {e}")
+        st.error("ব্যাচ তুলনা করতে একটি অপ্রত্যাশিত সমস্যা হয়েছে।")
+
+if __name__ == "__main__":
+    batch_diff_page()
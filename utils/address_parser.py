@@ -0,0 +1,167 @@
+import os
+import sys
+import re
+import argparse
+import unicodedata
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Locality components parsed out of ঠিকানা, from the most to the least specific;
+# also the column names of the localities table.
+LOCALITY_LEVELS = ('village', 'ward', 'union_name', 'post_office', 'upazila')
+
+LOCALITY_LABELS = {
+    'village': 'গ্রাম/পাড়া',
+    'ward': 'ওয়ার্ড',
+    'union_name': 'ইউনিয়ন',
+    'post_office': 'ডাকঘর',
+    'upazila': 'উপজেলা',
+}
+
+# Labels voter lists put before each component; all but the village ones may also
+# follow it, as in "৫ নং ওয়ার্ড" ("পূর্ব পাড়া" is a para name, not a labelled value).
+ADDRESS_COMPONENT_LABELS = {
+    'village': ('গ্রাম/রাস্তা', 'গ্রাম/মহল্লা', 'গ্রাম', 'মহল্লা', 'পাড়া', 'village', 'vill', 'para'),
+    'ward': ('ওয়ার্ড নং', 'ওয়ার্ড', 'ward no', 'ward'),
+    'union_name': ('ইউনিয়ন', 'ইউপি', 'union'),
+    'post_office': ('ডাকঘর', 'পোস্ট অফিস', 'পোষ্ট অফিস', 'পোঃ', 'post office', 'p.o', 'po'),
+    'upazila': ('উপজেলা/থানা', 'উপজেলা', 'থানা', 'upazila', 'thana'),
+}
+
+_ADDRESS_SEGMENT_SPLIT = re.compile(r'[,;\n।]+')
+_NUMBER_MARK = r'(?:নং|নম্বর|no\.?)'
+# Characters between a label and its value; voter lists mostly use the visarga "ঃ" as a colon
+_SEPARATORS = ':：ঃ.\-–'
+# Characters stripped from the ends of a value
+_STRIP_CHARS = ' .:ঃ-–'
+
+
+def _label_pattern(labels):
+    # Longest labels first, so "গ্রাম/রাস্তা" wins over "গ্রাম"
+    return '|'.join(re.escape(label) for label in sorted(labels, key=len, reverse=True))
+
+
+# A prefix label is followed by a separator or a space, so "po" does not match "Pond Road"
+_PREFIX_PATTERNS = {
+    level: re.compile(rf'^(?:{_label_pattern(labels)})(?:\s*{_NUMBER_MARK})?(?:\s*[{_SEPARATORS}]\s*|\s+)(.+)$', re.IGNORECASE)
+    for level, labels in ADDRESS_COMPONENT_LABELS.items()
+}
+_SUFFIX_PATTERNS = {
+    level: re.compile(rf'^(.+?)\s*{_NUMBER_MARK}?\s+(?:{_label_pattern(labels)})$', re.IGNORECASE)
+    for level, labels in ADDRESS_COMPONENT_LABELS.items() if level != 'village'
+}
+
+
+def clean_component(level, value):
+    """
+    Normalised form of one component: whitespace collapsed and stray punctuation
+    dropped; ward numbers are reduced to English digits ("০৫ নং" -> "5") and post
+    offices lose their postcode ("সাভার - ১৩৪০" -> "সাভার").
+    """
+    value = re.sub(r'\s+', ' ', value).strip(_STRIP_CHARS)
+    if level == 'ward':
+        digits = re.search(r'\d+', value.translate(str.maketrans('০১২৩৪৫৬৭৮৯', '0123456789')))
+        if digits:
+            return str(int(digits.group()))
+    elif level == 'post_office':
+        value = re.sub(r'\s*[-–]?\s*[০-৯0-9]{4}$', '', value).strip(_STRIP_CHARS)
+    return value or None
+
+
+def parse_address(address):
+    """
+    Splits a free-text ঠিকানা into LOCALITY_LEVELS. Segments are separated by
+    commas (or ; । and new lines) and recognised by the labels in
+    ADDRESS_COMPONENT_LABELS, before or after the value. When no segment is
+    labelled as the village, the first unlabelled segment without a label of
+    its own (such as "জেলাঃ ঢাকা") is taken as one.
+    Returns {level: value or None}.
+    """
+    components = dict.fromkeys(LOCALITY_LEVELS)
+    if not address:
+        return components
+    text = unicodedata.normalize('NFC', str(address))
+    unlabelled = []
+    for segment in _ADDRESS_SEGMENT_SPLIT.split(text):
+        segment = segment.strip(_STRIP_CHARS)
+        if not segment:
+            continue
+        for level in LOCALITY_LEVELS:
+            match = _PREFIX_PATTERNS[level].match(segment) or (
+                level in _SUFFIX_PATTERNS and _SUFFIX_PATTERNS[level].match(segment))
+            if match:
+                if components[level] is None:
+                    components[level] = clean_component(level, match.group(1))
+                break
+        else:
+            if not re.search('[:：ঃ]', segment):
+                unlabelled.append(segment)
+    if components['village'] is None and unlabelled:
+        components['village'] = clean_component('village', unlabelled[0])
+    return components
+
+
+# Addresses with the components parse_address must find in them, checked by `--check`.
+ADDRESS_PARSER_EXAMPLES = (
+    ('গ্রাম: রামপুর, ওয়ার্ড নং: 2, ইউনিয়ন: সদর, উপজেলা: সাভার',
+     {'village': 'রামপুর', 'ward': '2', 'union_name': 'সদর', 'upazila': 'সাভার'}),
+    ('গ্রামঃ চরপাড়া, ডাকঘরঃ বাজিতপুর, উপজেলাঃ কুলিয়ারচর',
+     {'village': 'চরপাড়া', 'post_office': 'বাজিতপুর', 'upazila': 'কুলিয়ারচর'}),
+    ('গ্রাম/রাস্তাঃ কাশিপুর, ওয়ার্ড নংঃ ০৫, ডাকঘরঃ সাভার-১৩৪০, উপজেলা/থানাঃ সাভার, জেলাঃ ঢাকা',
+     {'village': 'কাশিপুর', 'ward': '5', 'post_office': 'সাভার', 'upazila': 'সাভার'}),
+    ('রামপুর, ০৫ নং ওয়ার্ড, তেঁতুলিয়া ইউনিয়ন, পোঃ বাজার',
+     {'village': 'রামপুর', 'ward': '5', 'union_name': 'তেঁতুলিয়া', 'post_office': 'বাজার'}),
+    ('পূর্ব পাড়া, ওয়ার্ডঃ ৪', {'village': 'পূর্ব পাড়া', 'ward': '4'}),
+    ('জেলাঃ ঢাকা, পোঃ সাভার', {'post_office': 'সাভার'}),
+    ('vill: Rampur, ward no-3, P.O: Savar, thana: Savar',
+     {'village': 'Rampur', 'ward': '3', 'post_office': 'Savar', 'upazila': 'Savar'}),
+    ('Pond Road, Savar', {'village': 'Pond Road'}),
+)
+
+
+def check_parser():
+    """Parses ADDRESS_PARSER_EXAMPLES and returns a message for every component that differs from the expected one."""
+    failures = []
+    for address, expected in ADDRESS_PARSER_EXAMPLES:
+        parsed = parse_address(address)
+        for level in LOCALITY_LEVELS:
+            if parsed[level] != expected.get(level):
+                failures.append(f"{address!r}: {level} is {parsed[level]!r}, expected {expected.get(level)!r}")
+    return failures
+
+
+def locality_key(components):
+    """Unique key of a combination of components, as stored in localities.locality_key; None when all are missing."""
+    if not any(components.get(level) for level in LOCALITY_LEVELS):
+        return None
+    return '|'.join((components.get(level) or '').lower() for level in LOCALITY_LEVELS)
+
+
+if __name__ == "__main__":
+    # Allow `python utils/address_parser.py` as well as `python -m utils.address_parser`
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.database import Database
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Parses record addresses into localities.")
+    parser.add_argument("--batch-id", type=int, help="Only parse the addresses of this batch.")
+    parser.add_argument("--reparse", action="store_true",
+                        help="Forget earlier parses and parse every address again, e.g. after changing the labels.")
+    parser.add_argument("--check", action="store_true",
+                        help="Only check the parser against ADDRESS_PARSER_EXAMPLES; exits non-zero on a mismatch.")
+    args = parser.parse_args()
+    if args.check:
+        failures = check_parser()
+        for failure in failures:
+            print(failure)
+        print(f"{len(ADDRESS_PARSER_EXAMPLES)} addresses checked, {len(failures)} mismatches.")
+        sys.exit(1 if failures else 0)
+    db = Database()
+    try:
+        changed = db.assign_localities(batch_id=args.batch_id, reparse=args.reparse)
+        db.commit_changes()
+        print(f"{changed} records changed locality.")
+    finally:
+        db.conn.close()
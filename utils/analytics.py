@@ -0,0 +1,247 @@
+import threading
+import logging
+import numpy as np
+import pandas as pd
+
+from utils.database import AGE_GROUP_WIDTH
+from utils.address_parser import LOCALITY_LEVELS
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Dimensions RecordsSnapshot.group_counts can break counts down by.
+DIMENSIONS = ('batch_id', 'gender', 'age_group', 'occupation', 'relationship_status') + LOCALITY_LEVELS
+
+# Snapshot columns holding Categories codes
+CATEGORY_COLUMNS = ('gender', 'occupation', 'relationship_status') + LOCALITY_LEVELS
+
+
+class Categories:
+    """Append-only mapping of the values of a text field to small integer codes; missing values are code 0."""
+
+    def __init__(self):
+        self.values = [None]
+        self.codes = {None: 0}
+
+    def encode(self, values):
+        """Codes for a sequence of values, adding values not seen before. Empty strings count as missing."""
+        local_codes, uniques = pd.factorize(pd.Series(values, dtype=object).replace('', None), use_na_sentinel=True)
+        lookup = np.empty(len(uniques) + 1, dtype=np.int32)
+        lookup[-1] = 0
+        for i, value in enumerate(uniques):
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+            lookup[i] = code
+        return lookup[local_codes]
+
+    def lookup(self, values):
+        """Codes of the given values; values never seen match nothing."""
+        return [self.codes[value] for value in values if value in self.codes]
+
+
+class RecordsSnapshot:
+    """
+    Process-level columnar copy of the analysis fields of records (batch, gender,
+    age, occupation, relationship status, locality and event membership) held in NumPy
+    arrays, so the analysis pages can filter and group in memory instead of
+    running an aggregate query per widget change.
+
+    The snapshot is kept per batch. ensure_current compares every batch's
+    generation (bumped by database triggers when its records change) with the
+    one it was loaded at and reloads only the batches that changed.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # {batch_id: generation the batch was loaded at}
+        self._generations = {}
+        # {batch_id: {'id', 'age', *CATEGORY_COLUMNS, 'links'}}
+        self._chunks = {}
+        # All chunks concatenated, and {event_id: row positions}; rebuilt after a reload
+        self._columns = None
+        self._event_positions = {}
+        self.categories = {name: Categories() for name in CATEGORY_COLUMNS}
+
+    @property
+    def size(self):
+        return 0 if self._columns is None else len(self._columns['id'])
+
+    def ensure_current(self, db):
+        """Reloads the batches whose generation changed and drops deleted ones. Returns the number of batches reloaded."""
+        generations = db.get_batch_generations()
+        with self._lock:
+            stale = [batch_id for batch_id, generation in generations.items()
+                     if self._generations.get(batch_id) != generation]
+            removed = [batch_id for batch_id in self._generations if batch_id not in generations]
+            if not stale and not removed and self._columns is not None:
+                return 0
+            for batch_id in removed:
+                del self._generations[batch_id]
+                del self._chunks[batch_id]
+            if stale:
+                self._load_batches(db, stale)
+                for batch_id in stale:
+                    self._generations[batch_id] = generations[batch_id]
+            self._rebuild()
+            logger.info(f"Analytics snapshot: reloaded {len(stale)} batches, dropped {len(removed)}, {self.size} records.")
+            return len(stale)
+
+    def invalidate(self):
+        """Drops the snapshot; the next ensure_current reloads every batch."""
+        with self._lock:
+            self._generations = {}
+            self._chunks = {}
+            self._columns = None
+            self._event_positions = {}
+
+    def _load_batches(self, db, batch_ids):
+        rows = db.get_analytics_rows(batch_ids)
+        links = db.get_analytics_event_links(batch_ids)
+        # Rows are (id, batch_id, gender, age, occupation, relationship_status, *LOCALITY_LEVELS)
+        fields = list(zip(*rows)) if rows else [()] * (6 + len(LOCALITY_LEVELS))
+        ids, batches, genders, ages, occupations, statuses = fields[:6]
+        batches = np.asarray(batches, dtype=np.int64)
+        columns = {
+            'id': np.asarray(ids, dtype=np.int64),
+            'age': np.asarray([-1 if age is None else age for age in ages], dtype=np.int16),
+        }
+        for name, values in zip(CATEGORY_COLUMNS, (genders, occupations, statuses) + tuple(fields[6:])):
+            columns[name] = self.categories[name].encode(values)
+        link_records = np.asarray([record_id for record_id, _ in links], dtype=np.int64)
+        link_events = np.asarray([event_id for _, event_id in links], dtype=np.int64)
+        # Rows come ordered by batch, so each batch is one contiguous slice
+        for batch_id in batch_ids:
+            start, end = np.searchsorted(batches, [batch_id, batch_id + 1])
+            chunk = {name: values[start:end].copy() for name, values in columns.items()}
+            in_batch = np.isin(link_records, chunk['id'])
+            chunk['links'] = (link_records[in_batch], link_events[in_batch])
+            self._chunks[batch_id] = chunk
+
+    def _rebuild(self):
+        batch_ids = sorted(self._chunks)
+        chunks = [self._chunks[batch_id] for batch_id in batch_ids]
+        columns = {
+            name: np.concatenate([chunk[name] for chunk in chunks]) if chunks else np.empty(0, dtype=np.int64)
+            for name in ('id', 'age') + CATEGORY_COLUMNS
+        }
+        columns['batch_id'] = np.repeat(np.asarray(batch_ids, dtype=np.int64),
+                                        [len(chunk['id']) for chunk in chunks]) if chunks else np.empty(0, dtype=np.int64)
+
+        link_records = np.concatenate([chunk['links'][0] for chunk in chunks]) if chunks else np.empty(0, dtype=np.int64)
+        link_events = np.concatenate([chunk['links'][1] for chunk in chunks]) if chunks else np.empty(0, dtype=np.int64)
+        order = np.argsort(columns['id'])
+        positions = order[np.searchsorted(columns['id'], link_records, sorter=order)] if len(order) else link_records
+        event_positions = {}
+        if len(link_events):
+            by_event = np.argsort(link_events, kind='stable')
+            events, starts = np.unique(link_events[by_event], return_index=True)
+            for event_id, group in zip(events, np.split(positions[by_event], starts[1:])):
+                event_positions[int(event_id)] = group
+        self._columns = columns
+        self._event_positions = event_positions
+
+    def mask(self, batch_ids=None, genders=None, age_range=None, occupations=None, relationship_statuses=None,
+             localities=None, events_all=(), events_any=(), events_none=()):
+        """
+        Boolean row mask for a combination of filters. Every filter left as None
+        (or empty) matches all records. `age_range` is an inclusive (min, max) and
+        excludes records without an age; `localities` maps LOCALITY_LEVELS to
+        values; the event filters take event ids and work like the Event Filter
+        page (all of / any of / none of).
+        """
+        columns = self._columns
+        mask = np.ones(self.size, dtype=bool)
+        if batch_ids:
+            mask &= np.isin(columns['batch_id'], list(batch_ids))
+        category_filters = {'gender': genders, 'occupation': occupations, 'relationship_status': relationship_statuses}
+        category_filters.update((level, values) for level, values in (localities or {}).items() if level in LOCALITY_LEVELS)
+        for name, values in category_filters.items():
+            if values:
+                mask &= np.isin(columns[name], self.categories[name].lookup(values))
+        if age_range is not None:
+            low, high = age_range
+            mask &= (columns['age'] >= low) & (columns['age'] <= high)
+        for event_id in events_all:
+            event_mask = np.zeros(self.size, dtype=bool)
+            event_mask[self._event_positions.get(event_id, [])] = True
+            mask &= event_mask
+        if events_any:
+            any_mask = np.zeros(self.size, dtype=bool)
+            for event_id in events_any:
+                any_mask[self._event_positions.get(event_id, [])] = True
+            mask &= any_mask
+        for event_id in events_none:
+            mask[self._event_positions.get(event_id, [])] = False
+        return mask
+
+    def count(self, **filters):
+        """Number of records matching the filters of `mask`."""
+        with self._lock:
+            return int(self.mask(**filters).sum())
+
+    def _dimension(self, name, mask):
+        """(codes of the masked rows, function turning a code into its label) for one of DIMENSIONS."""
+        columns = self._columns
+        if name == 'batch_id':
+            labels, codes = np.unique(columns['batch_id'][mask], return_inverse=True)
+            return codes, lambda code: int(labels[code])
+        if name == 'age_group':
+            ages = columns['age'][mask].astype(np.int64)
+            codes = np.where(ages < 0, 0, ages // AGE_GROUP_WIDTH + 1)
+            return codes, lambda code: 'Unknown' if code == 0 else \
+                f"{(code - 1) * AGE_GROUP_WIDTH}-{code * AGE_GROUP_WIDTH - 1}"
+        categories = self.categories[name]
+        return columns[name][mask].astype(np.int64), lambda code: categories.values[code]
+
+    def group_counts(self, dimensions, **filters):
+        """
+        Record counts of every combination of `dimensions` (names from DIMENSIONS)
+        among the records matching the filters of `mask`. Returns a DataFrame with
+        one column per dimension and a 'count' column, largest groups first.
+        """
+        unknown = [name for name in dimensions if name not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown analytics dimensions: {unknown}")
+        with self._lock:
+            mask = self.mask(**filters)
+            if not mask.any():
+                return pd.DataFrame(columns=list(dimensions) + ['count'])
+            decoded = [self._dimension(name, mask) for name in dimensions]
+            sizes = [int(codes.max()) + 1 for codes, _ in decoded]
+            keys = np.ravel_multi_index([codes for codes, _ in decoded], sizes)
+            groups, counts = np.unique(keys, return_counts=True)
+            group_codes = np.unravel_index(groups, sizes)
+            frame = pd.DataFrame({
+                name: [label(int(code)) for code in codes]
+                for name, (_, label), codes in zip(dimensions, decoded, group_codes)
+            })
+            frame['count'] = counts
+            return frame.sort_values('count', ascending=False, kind='stable').reset_index(drop=True)
+
+
+# Shared by every page in the process
+records_snapshot = RecordsSnapshot()
+
+
+def rollup_counts(db, dimensions, events_all=(), events_any=(), events_none=(), **filters):
+    """
+    Record counts per combination of `dimensions` as a DataFrame with one column
+    per dimension and a 'count' column, largest groups first. Rolled up from the
+    analytics cube (call db.refresh_analytics_cube first); the cube has no event
+    dimension, so with event filters the counts come from records_snapshot.
+    """
+    if events_all or events_any or events_none:
+        records_snapshot.ensure_current(db)
+        return records_snapshot.group_counts(dimensions, events_all=events_all, events_any=events_any,
+                                             events_none=events_none, **filters)
+    return pd.DataFrame(db.get_analytics_rollup(dimensions, **filters), columns=list(dimensions) + ['count'])
+
+
+def count_records(db, events_all=(), events_any=(), events_none=(), **filters):
+    """Number of records matching the filters of rollup_counts."""
+    if events_all or events_any or events_none:
+        records_snapshot.ensure_current(db)
+        return records_snapshot.count(events_all=events_all, events_any=events_any, events_none=events_none, **filters)
+    return db.get_analytics_rollup([], **filters)[0]['count']
@@ -0,0 +1,249 @@
+import os
+import sys
+import gc
+import time
+import tracemalloc
+import argparse
+
+if __name__ == "__main__":
+    # Allow `python utils/benchmarks.py` as well as `python -m utils.benchmarks`
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import (Database, PROFILE_SELECT_SQL, RECORD_PROJECTIONS, CUBE_DIMENSIONS, CUBE_FROM_SQL,
+                            INDEX_DEFINITIONS)
+
+# List reads compared by profile_split_benchmark: what the list pages fetch, and the
+# same rows with the profile fields joined back in as in the single-table layout.
+LIST_QUERY = """
+    SELECT r.* FROM records r
+    WHERE (%(batch_id)s IS NULL OR r.batch_id = %(batch_id)s)
+    ORDER BY r.id
+"""
+LIST_WITH_PROFILES_QUERY = f"""
+    SELECT r.*, {PROFILE_SELECT_SQL} FROM records r
+    LEFT JOIN record_profiles p ON p.record_id = r.id
+    WHERE (%(batch_id)s IS NULL OR r.batch_id = %(batch_id)s)
+    ORDER BY r.id
+"""
+
+
+def table_stats(db):
+    """
+    Size on disk (all partitions included), row count and average stored row width
+    of records and record_profiles.
+    """
+    stats = {}
+    with db.conn.cursor() as cur:
+        for table in ('records', 'record_profiles'):
+            cur.execute(f"""
+                SELECT
+                    (SELECT SUM(pg_total_relation_size(c.oid)) FROM pg_class c
+                     WHERE c.oid = '{table}'::regclass
+                        OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = '{table}'::regclass)),
+                    COUNT(*),
+                    COALESCE(AVG(pg_column_size(t.*)), 0)
+                FROM {table} t
+            """)
+            size, rows, width = cur.fetchone()
+            stats[table] = {'bytes': int(size), 'rows': rows, 'avg_row_bytes': round(float(width), 1)}
+    db.conn.rollback()
+    return stats
+
+
+def measure_query(db, query, params, repeats=3):
+    """
+    Runs a read `repeats` times and returns the best wall time, the rows and
+    bytes received by the client, and the shared buffers the plan touched.
+    """
+    with db.conn.cursor() as cur:
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, params)
+        plan = cur.fetchone()[0][0]['Plan']
+        best = None
+        for _ in range(repeats):
+            started = time.perf_counter()
+            cur.execute(query, params)
+            rows = cur.fetchall()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+    db.conn.rollback()
+    received = sum(len(str(value).encode('utf-8')) for row in rows for value in row if value is not None)
+    return {
+        'seconds': round(best, 4),
+        'rows': len(rows),
+        'bytes_received': received,
+        'buffers': plan.get('Shared Hit Blocks', 0) + plan.get('Shared Read Blocks', 0),
+    }
+
+
+def profile_split_benchmark(db, batch_id=None, repeats=3):
+    """
+    Compares a list read of the narrow records table with the same read joined to
+    record_profiles, i.e. what every list page paid before the profile fields were
+    split off. Returns {'tables': ..., 'list': ..., 'list_with_profiles': ...}.
+    """
+    params = {'batch_id': batch_id}
+    return {
+        'tables': table_stats(db),
+        'list': measure_query(db, LIST_QUERY, params, repeats),
+        'list_with_profiles': measure_query(db, LIST_WITH_PROFILES_QUERY, params, repeats),
+    }
+
+
+def projection_benchmark(db, batch_id=None, repeats=3):
+    """Measures the list read of every record projection. Returns {projection: measure_query result}."""
+    results = {}
+    for projection in RECORD_PROJECTIONS:
+        columns_sql, from_sql = db.record_projection_sql(projection)
+        query = f"""
+            SELECT {columns_sql} FROM {from_sql}
+            WHERE (%(batch_id)s IS NULL OR r.batch_id = %(batch_id)s)
+            ORDER BY r.id
+        """
+        results[projection] = measure_query(db, query, {'batch_id': batch_id}, repeats)
+    return results
+
+
+# Breakdowns compared by rollup_benchmark, as drawn by the analysis charts.
+ROLLUP_DIMENSIONS = (
+    ('gender',),
+    ('age_group',),
+    ('occupation',),
+    ('batch_id', 'relationship_status'),
+)
+
+
+def rollup_benchmark(db, batch_id=None, repeats=3):
+    """
+    Measures each breakdown of ROLLUP_DIMENSIONS grouped directly over records and
+    rolled up from the analytics cube. Returns {dimensions: {'records': ..., 'cube': ...}}.
+    """
+    db.refresh_analytics_cube()
+    sources = (
+        # Grouping records by the free-text পেশা, as the charts did before the cube
+        ('records', 'records', 'COUNT(*)', {**CUBE_DIMENSIONS, 'occupation': 'পেশা'}),
+        ('cube', CUBE_FROM_SQL, 'SUM(record_count)', CUBE_DIMENSIONS),
+    )
+    results = {}
+    for dimensions in ROLLUP_DIMENSIONS:
+        runs = {}
+        for source, table, count, columns in sources:
+            query = f"""
+                SELECT {', '.join(columns[name] for name in dimensions)}, {count} FROM {table}
+                WHERE (%(batch_id)s IS NULL OR batch_id = %(batch_id)s)
+                GROUP BY {', '.join(str(i) for i in range(1, len(dimensions) + 1))}
+            """
+            runs[source] = measure_query(db, query, {'batch_id': batch_id}, repeats)
+        results[' x '.join(dimensions)] = runs
+    return results
+
+
+def retained_bytes(load):
+    """Python heap bytes still held by the result of `load()` once it returns, and the result."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = load()
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+
+def row_memory_benchmark(db, batch_id, projection='full'):
+    """
+    Memory held by one batch's records read as dict rows, as CompactRows and as a
+    DataFrame. Returns {format: {'bytes': ..., 'rows': ..., 'bytes_per_row': ...}}.
+    """
+    loads = {
+        'dict_rows': lambda: db.get_batch_records(batch_id, projection=projection),
+        'compact_rows': lambda: db.get_batch_records(batch_id, projection=projection, compact=True),
+        'frame': lambda: db.get_records_frame(batch_id, projection=projection),
+    }
+    results = {}
+    for name, load in loads.items():
+        held, rows = retained_bytes(load)
+        if name == 'frame':
+            # String columns may be stored outside the Python heap (e.g. by pyarrow)
+            held = max(held, int(rows.memory_usage(deep=True).sum()))
+        count = len(rows)
+        results[name] = {'bytes': held, 'rows': count, 'bytes_per_row': round(held / count) if count else 0}
+        del rows
+    db.conn.rollback()
+    return results
+
+
+def print_report(result):
+    for table, stats in result['tables'].items():
+        print(f"{table:>16}: {stats['rows']} rows, {stats['bytes'] / 1024:.0f} KiB, "
+              f"{stats['avg_row_bytes']} bytes/row")
+    for name in ('list', 'list_with_profiles'):
+        run = result[name]
+        print(f"{name:>18}: {run['seconds']:.4f} s, {run['rows']} rows, "
+              f"{run['bytes_received'] / 1024:.0f} KiB received, {run['buffers']} buffers")
+    narrow, wide = result['list'], result['list_with_profiles']
+    if wide['seconds'] and wide['bytes_received']:
+        print(f"list reads save {1 - narrow['seconds'] / wide['seconds']:.0%} time and "
+              f"{1 - narrow['bytes_received'] / wide['bytes_received']:.0%} transfer")
+
+
+def print_projection_report(results):
+    for projection, run in results.items():
+        print(f"{projection:>18}: {run['seconds']:.4f} s, {run['rows']} rows, "
+              f"{run['bytes_received'] / 1024:.0f} KiB received, {run['buffers']} buffers")
+
+
+def print_rollup_report(results):
+    for dimensions, runs in results.items():
+        records, cube = runs['records'], runs['cube']
+        print(f"{dimensions:>28}: records {records['seconds']:.4f} s ({records['buffers']} buffers), "
+              f"cube {cube['seconds']:.4f} s ({cube['buffers']} buffers), {cube['rows']} groups")
+
+
+def index_report(db):
+    """
+    Checks the indexes in INDEX_DEFINITIONS: {index_name: 'missing', 'unused' or 'ok'},
+    where unused means the planner cannot serve its INDEX_USAGE_QUERIES query from it
+    (indexes without such a query are only checked for existence).
+    """
+    missing = set(db.verify_indexes())
+    usage = db.check_index_usage()
+    return {
+        index_name: 'missing' if index_name in missing else ('ok' if usage.get(index_name, True) else 'unused')
+        for index_name in INDEX_DEFINITIONS
+    }
+
+
+def print_index_report(results):
+    for index_name, status in results.items():
+        print(f"{index_name:>32}: {status}")
+
+
+def print_memory_report(results):
+    for name, run in results.items():
+        print(f"{name:>18}: {run['bytes'] / 1024:.0f} KiB held for {run['rows']} rows, {run['bytes_per_row']} bytes/row")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures record list reads by the columns they fetch.")
+    parser.add_argument("--batch-id", type=int, help="Only read the records of this batch.")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per query; the best one is reported.")
+    parser.add_argument("--indexes-only", action="store_true",
+                        help="Only check that the planned indexes exist and are used by their queries.")
+    args = parser.parse_args()
+    db = Database()
+    try:
+        indexes = index_report(db)
+        print_index_report(indexes)
+        if args.indexes_only:
+            sys.exit(0 if all(status == 'ok' for status in indexes.values()) else 1)
+        print_report(profile_split_benchmark(db, batch_id=args.batch_id, repeats=args.repeats))
+        print_projection_report(projection_benchmark(db, batch_id=args.batch_id, repeats=args.repeats))
+        print_rollup_report(rollup_benchmark(db, batch_id=args.batch_id, repeats=args.repeats))
+        if args.batch_id is not None:
+            print_memory_report(row_memory_benchmark(db, args.batch_id))
+    finally:
+        db.conn.close()
+    # A planned index that is missing or unused fails the run
+    if any(status != 'ok' for status in indexes.values()):
+        sys.exit(1)
@@ -0,0 +1,61 @@
+from functools import lru_cache
+
+
+class CompactRow(tuple):
+    """
+    Memory-light stand-in for a RealDictRow: the values are kept in a plain tuple
+    and the column names in one index shared by every row of a result, so a row
+    costs a tuple instead of a dict. Supports the read access the pages use on
+    records (row['নাম'], row.get(...), keys(), items()); positional access and
+    unpacking work as on any tuple. Rows are read-only.
+    """
+    __slots__ = ()
+    # {column name: position}, set on the per-result subclass made by compact_row_class
+    index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self.index[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        position = self.index.get(key)
+        return default if position is None else tuple.__getitem__(self, position)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def keys(self):
+        return self.index.keys()
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self.index, self)
+
+    def to_dict(self):
+        return dict(zip(self.index, self))
+
+    def __reduce__(self):
+        # The subclass is created at runtime, so pickle the columns along with the values
+        return make_compact_row, (tuple(self.index), tuple(self))
+
+    def __repr__(self):
+        return f"CompactRow({self.to_dict()!r})"
+
+
+@lru_cache(maxsize=64)
+def compact_row_class(columns):
+    """Returns the CompactRow subclass for a tuple of column names, shared by every result with those columns."""
+    return type('CompactRow', (CompactRow,), {'__slots__': (), 'index': {name: i for i, name in enumerate(columns)}})
+
+
+def make_compact_row(columns, values):
+    return compact_row_class(tuple(columns))(values)
+
+
+def compact_rows(cursor):
+    """Fetches the remaining rows of a plain (tuple) cursor as CompactRows."""
+    row_class = compact_row_class(tuple(column.name for column in cursor.description))
+    return [row_class(row) for row in cursor.fetchall()]
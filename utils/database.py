@@ -1,14 +1,237 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values, Json
 import logging
 import os
 import streamlit as st
 from datetime import datetime
 import re # For Bengali numeral conversion
+import io
+import csv
+import pandas as pd
+from utils.compact_rows import compact_rows
+from utils.family_graph import family_graph
+from utils.households import compute_households
+from utils.occupations import OccupationMatcher, OCCUPATION_DICTIONARY
+from utils.address_parser import parse_address, locality_key, clean_component, LOCALITY_LEVELS
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+DEFAULT_PHOTO_LINK = 'https://placehold.co/100x100/EEE/31343C?text=No+Image'
+
+# Values of records.relationship_status; new records start as 'Regular'.
+RELATIONSHIP_STATUSES = ['Regular', 'Friend', 'Enemy', 'Connected']
+
+# Column order used by add_record and the bulk insert paths.
+RECORD_INSERT_COLUMNS = (
+    'batch_id', 'file_id', 'ক্রমিক_নং', 'নাম', 'ভোটার_নং',
+    'পিতার_নাম', 'মাতার_নাম', 'পেশা', 'জন্ম_তারিখ', 'ঠিকানা',
+    'phone_number', 'political_status', 'relationship_status', 'gender', 'age'
+)
+
+# Wide, rarely filtered fields kept in record_profiles (one row per record, only when
+# one of them is set) so that scans of records stay narrow. A NULL photo_link means
+# DEFAULT_PHOTO_LINK.
+PROFILE_COLUMNS = (
+    'occupation_details', 'whatsapp_number', 'facebook_link', 'tiktok_link',
+    'youtube_link', 'insta_link', 'photo_link', 'description'
+)
+
+# Text that edit forms and DataFrames hand back for an unset profile field.
+PROFILE_EMPTY_VALUES = ('', 'None', 'nan')
+
+
+def profile_value(value):
+    """A profile field as stored: None when unset (None, NaN or PROFILE_EMPTY_VALUES), else the text."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return None if str(value).strip() in PROFILE_EMPTY_VALUES else str(value)
+
+
+# Profile fields of a record for queries joining `LEFT JOIN record_profiles p ON p.record_id = r.id`.
+PROFILE_SELECT_SQL = (
+    "p.occupation_details, p.whatsapp_number, p.facebook_link, p.tiktok_link, p.youtube_link, "
+    f"p.insta_link, p.description, COALESCE(p.photo_link, '{DEFAULT_PHOTO_LINK}') AS photo_link"
+)
+
+# Fields of records kept in the analytics snapshot (utils/analytics.py); changing
+# one of them bumps the generation of the record's batch. Occupations are counted
+# by their canonical occupation (see assign_occupations), not the free-text পেশা,
+# and addresses by their parsed locality (see assign_localities).
+ANALYTICS_FIELDS = ('batch_id', 'gender', 'age', 'occupation_id', 'relationship_status', 'locality_id')
+
+# Width of the age groups of the analysis charts.
+AGE_GROUP_WIDTH = 10
+
+# Dimensions get_analytics_rollup can group the analytics cube by, with the SQL of each;
+# occupation names come from the occupations table joined as `o` and the locality
+# components from localities joined as `l`.
+CUBE_DIMENSIONS = {
+    'batch_id': "batch_id",
+    'gender': "gender",
+    'age': "age",
+    'age_group': (
+        f"CASE WHEN age IS NULL THEN 'Unknown' "
+        f"ELSE (FLOOR(age / {AGE_GROUP_WIDTH}) * {AGE_GROUP_WIDTH} || '-' || "
+        f"(FLOOR(age / {AGE_GROUP_WIDTH}) * {AGE_GROUP_WIDTH} + {AGE_GROUP_WIDTH - 1})) END"
+    ),
+    'occupation': "o.name",
+    'relationship_status': "relationship_status",
+    **{level: f"l.{level}" for level in LOCALITY_LEVELS},
+}
+
+# The cube joined with the occupation names and localities, as read by get_analytics_rollup.
+CUBE_FROM_SQL = (
+    "analytics_cube c "
+    "LEFT JOIN occupations o ON o.id = c.occupation_id "
+    "LEFT JOIN localities l ON l.id = c.locality_id"
+)
+
+
+# Column sets the record list reads return, chosen with their `projection` argument
+# so a page only fetches what it renders (see Database.record_projection_sql):
+#   id      - record ids only, e.g. to count or select records
+#   summary - identifying fields and photo, for pickers and dropdowns
+#   card    - every records column with batch name, file name and event names
+#   full    - card plus the profile fields, for detail views and edit forms
+RECORD_PROJECTIONS = {
+    'id': "r.id",
+    'summary': (
+        "r.id, r.batch_id, r.নাম, r.ভোটার_নং, r.পিতার_নাম, r.মাতার_নাম, r.gender, r.age, "
+        f"COALESCE(p.photo_link, '{DEFAULT_PHOTO_LINK}') AS photo_link"
+    ),
+    'card': "r.*, b.name as batch_name, f.name as file_name, ev.events",
+    'full': f"r.*, b.name as batch_name, f.name as file_name, ev.events, {PROFILE_SELECT_SQL}",
+}
+
+# Record fields carried through the staging table (everything except batch_id and the file).
+STAGED_RECORD_FIELDS = RECORD_INSERT_COLUMNS[2:] + PROFILE_COLUMNS
+
+# Columns of records_staging filled by COPY. Staged rows carry the file name; the
+# files row and its id are resolved when the load is merged.
+STAGING_COPY_COLUMNS = ('load_id', 'src_seq', 'src_line', 'src_offset', 'batch_id', 'file_name') + STAGED_RECORD_FIELDS
+
+# Fields compared by the batch diff. Serial numbers are renumbered in every
+# revision of a list, so they are not treated as a change.
+BATCH_DIFF_FIELDS = ('নাম', 'পিতার_নাম', 'মাতার_নাম', 'পেশা', 'জন্ম_তারিখ', 'ঠিকানা', 'gender')
+
+# Pairs the records of two batches by normalised voter number. The first record of a
+# voter number wins when a batch contains it more than once; records without one are
+# not compared. `changes` maps each differing field to {"old": ..., "new": ...}.
+BATCH_DIFF_CTE = """
+    WITH side_a AS (
+        SELECT DISTINCT ON (voter_no_key(ভোটার_নং))
+            id, voter_no_key(ভোটার_নং) AS voter_key, ভোটার_নং, {side_fields}
+        FROM records
+        WHERE batch_id = %(batch_a)s AND voter_no_key(ভোটার_নং) IS NOT NULL
+        ORDER BY voter_no_key(ভোটার_নং), id
+    ),
+    side_b AS (
+        SELECT DISTINCT ON (voter_no_key(ভোটার_নং))
+            id, voter_no_key(ভোটার_নং) AS voter_key, ভোটার_নং, {side_fields}
+        FROM records
+        WHERE batch_id = %(batch_b)s AND voter_no_key(ভোটার_নং) IS NOT NULL
+        ORDER BY voter_no_key(ভোটার_নং), id
+    ),
+    diff AS (
+        SELECT
+            COALESCE(a.voter_key, b.voter_key) AS voter_key,
+            CASE
+                WHEN a.id IS NULL THEN 'added'
+                WHEN b.id IS NULL THEN 'removed'
+                WHEN changed.fields IS NOT NULL THEN 'changed'
+                ELSE 'unchanged'
+            END AS change_type,
+            a.id AS record_a_id,
+            b.id AS record_b_id,
+            COALESCE(b.ভোটার_নং, a.ভোটার_নং) AS ভোটার_নং,
+            COALESCE(b.নাম, a.নাম) AS নাম,
+            COALESCE(b.পিতার_নাম, a.পিতার_নাম) AS পিতার_নাম,
+            COALESCE(b.ঠিকানা, a.ঠিকানা) AS ঠিকানা,
+            changed.fields AS changes
+        FROM side_a a
+        FULL JOIN side_b b ON a.voter_key = b.voter_key
+        LEFT JOIN LATERAL (
+            SELECT jsonb_object_agg(f.field, jsonb_build_object('old', f.old_value, 'new', f.new_value)) AS fields
+            FROM (VALUES {field_pairs}) AS f(field, old_value, new_value)
+            WHERE a.id IS NOT NULL AND b.id IS NOT NULL AND f.old_value IS DISTINCT FROM f.new_value
+        ) changed ON TRUE
+    )
+""".format(
+    side_fields=', '.join(f"NULLIF(btrim({field}), '') AS {field}" for field in BATCH_DIFF_FIELDS),
+    field_pairs=', '.join(f"('{field}', a.{field}::text, b.{field}::text)" for field in BATCH_DIFF_FIELDS)
+)
+
+# Family relationship labels and the label that describes the other side of the same
+# link, e.g. if B is A's "পিতা", A is B's "সন্তান". Seeded into family_relationship_types;
+# each link is stored once and its inverse is derived when it is read.
+FAMILY_RELATIONSHIP_INVERSES = {
+    "পিতা": "সন্তান", "মাতা": "সন্তান", "স্বামী": "স্ত্রী", "স্ত্রী": "স্বামী",
+    "ছেলে": "পিতা", "মেয়ে": "মাতা", "ভাই": "ভাই", "বোন": "বোন",
+    "দাদা": "নাতি", "দাদী": "নাতনি", "নাতি": "দাদা", "নাতনি": "দাদী",
+    "চাচা": "ভাতিজা", "চাচী": "ভাতিজি", "ভাতিজা": "চাচা", "ভাতিজি": "চাচী",
+    "মামা": "ভাগ্নে", "মামি": "ভাগ্নি", "ভাগ্নে": "মামা", "ভাগ্নি": "মামি",
+    "শ্বশুর": "জামাই", "শাশুড়ি": "বউমা", "জামাই": "শ্বশুর", "বউমা": "শাশুড়ি",
+    "অন্যান্য": "অন্যান্য",
+}
+
+# Label used for the inverse of a relationship that is not in family_relationship_types.
+UNKNOWN_INVERSE_RELATIONSHIP = "সম্পর্কিত ব্যক্তি"
+
+# An ingest job is considered abandoned when its worker stops reporting for this long.
+INGEST_JOB_STALE_AFTER_SECONDS = 120
+
+# Secondary indexes created by Database.create_indexes, keyed by name, with the
+# access path each one serves. Primary keys and unique constraints are not listed.
+INDEX_DEFINITIONS = {
+    # Looks up a batch's records by normalised voter number (upload merge and batch diff)
+    'records_batch_voter_key_idx': "records (batch_id, voter_no_key(ভোটার_নং))",
+    # Looks up a batch's records by normalised name (family link suggestions)
+    'records_batch_name_key_idx': "records (batch_id, voter_name_key(নাম))",
+    # get_batch_records, get_file_records, get_batch_files and delete_batch
+    'records_batch_file_idx': "records (batch_id, file_id)",
+    # Paginated relationship lists, with or without a batch filter
+    'records_relationship_idx': "records (relationship_status, batch_id, created_at DESC)",
+    # Household members and household sizes
+    'records_household_idx': "records (household_id)",
+    # Occupation filters and stats, and the clean-up of unused occupations
+    'records_occupation_idx': "records (occupation_id, batch_id)",
+    # Locality search filters
+    'records_locality_idx': "records (locality_id, batch_id)",
+    # Event member lists and the ON DELETE CASCADE from events
+    'record_events_event_idx': "record_events (event_id, record_id)",
+    # Incoming family links and the ON DELETE CASCADE from records
+    'family_connections_target_idx': "family_connections (target_record_id)",
+    # ON DELETE CASCADE from records to link suggestions naming them as parent
+    'family_link_suggestions_parent_idx': "family_link_suggestions (parent_record_id)",
+}
+
+# Member count of every household with an id, grouped once per query instead of counted
+# again for every record; records without a household are single-member households.
+HOUSEHOLD_SIZES_SQL = """
+    SELECT household_id, COUNT(*) AS size FROM records
+    WHERE household_id IS NOT NULL
+    GROUP BY household_id
+"""
+
+# Representative query for each index, used by Database.check_index_usage. Lookups use
+# values matching few rows (file 0 does not exist), as a common value may be read
+# through another index.
+INDEX_USAGE_QUERIES = {
+    'records_batch_voter_key_idx': "SELECT id FROM records WHERE batch_id = 1 AND voter_no_key(ভোটার_নং) = '1'",
+    'records_batch_name_key_idx': "SELECT id FROM records WHERE batch_id = 1 AND voter_name_key(নাম) = 'x'",
+    'records_batch_file_idx': "SELECT id FROM records WHERE batch_id = 1 AND file_id = 0",
+    'records_relationship_idx': """
+        SELECT id FROM records WHERE relationship_status = 'Friend' AND batch_id = 1 ORDER BY created_at DESC LIMIT 20
+    """,
+    'records_household_idx': "SELECT id FROM records WHERE household_id = 1",
+    'records_occupation_idx': "SELECT id FROM records WHERE occupation_id = 1",
+    'records_locality_idx': "SELECT id FROM records WHERE locality_id = 1",
+    'record_events_event_idx': "SELECT record_id FROM record_events WHERE event_id = 1",
+    'family_connections_target_idx': "SELECT id FROM family_connections WHERE target_record_id = 1",
+    'family_link_suggestions_parent_idx': "SELECT id FROM family_link_suggestions WHERE parent_record_id = 1",
+}
+
 class Database:
     """
     Handles all database operations for the application, including connecting to
@@ -29,6 +252,14 @@ class Database:
             self.conn.autocommit = False 
             self.create_tables()
             self.add_missing_columns() # Call method to add new columns if they don't exist
+            self.partition_records()
+            self.migrate_record_files()
+            self.split_record_profiles()
+            self.migrate_occupations()
+            self.migrate_localities()
+            self.create_generation_triggers()
+            self.create_indexes()
+            self.migrate_family_connections()
         except psycopg2.OperationalError as e:
             logger.error(f"Database connection failed: {e}")
             st.error("ডাটাবেস সংযোগ করতে ব্যর্থ। অনুগ্রহ করে আপনার শংসাপত্রগুলি পরীক্ষা করুন।")
@@ -40,44 +271,122 @@ class Database:
         Removed DROP TABLE statements to ensure data persistence.
         """
         with self.conn.cursor() as cur:
-            # Batches Table: Stores information about data batches.
+            # Batches Table: Stores information about data batches. `generation` changes
+            # whenever the analysis fields or events of the batch's records change (see
+            # create_generation_triggers), so in-process snapshots know what to reload.
+            cur.execute("CREATE SEQUENCE IF NOT EXISTS batch_generation_seq")
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS batches (
                     id SERIAL PRIMARY KEY,
                     name VARCHAR(255) UNIQUE NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    generation BIGINT NOT NULL DEFAULT nextval('batch_generation_seq')
+                )
+            """)
+
+            # Files Table: One row per uploaded (or manually used) file name in a batch,
+            # referenced by records.file_id, with the number of records it holds.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    id SERIAL PRIMARY KEY,
+                    batch_id INTEGER NOT NULL REFERENCES batches(id) ON DELETE CASCADE,
+                    name VARCHAR(255) NOT NULL,
+                    record_count INTEGER NOT NULL DEFAULT 0,
+                    content_hash TEXT,
+                    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (batch_id, name)
                 )
             """)
 
             # Records Table: Stores the main data records.
             # Added new columns for political status, social media links, etc.
+            # List-partitioned by batch (see ensure_batch_partition), so a batch is
+            # dropped as a whole table and per-batch queries only scan their partition.
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS records (
-                    id SERIAL PRIMARY KEY,
-                    batch_id INTEGER REFERENCES batches(id) ON DELETE CASCADE,
-                    file_name VARCHAR(255),
+                    id SERIAL,
+                    batch_id INTEGER NOT NULL REFERENCES batches(id) ON DELETE CASCADE,
+                    file_id INTEGER,
                     ক্রমিক_নং VARCHAR(50),
                     নাম TEXT,
                     ভোটার_নং VARCHAR(100),
                     পিতার_নাম TEXT,
                     মাতার_নাম TEXT,
                     পেশা TEXT,
-                    occupation_details TEXT,
                     জন্ম_তারিখ VARCHAR(100),
                     ঠিকানা TEXT,
                     phone_number VARCHAR(50),
+                    political_status TEXT,
+                    relationship_status VARCHAR(20) DEFAULT 'Regular',
+                    gender VARCHAR(10),
+                    age INTEGER,
+                    occupation_id INTEGER,
+                    locality_id INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (id, batch_id)
+                ) PARTITION BY LIST (batch_id)
+            """)
+
+            # Record Profiles Table: The wide columns of a record (see PROFILE_COLUMNS), loaded
+            # only for detail views and edit forms.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS record_profiles (
+                    record_id INTEGER PRIMARY KEY,
+                    occupation_details TEXT,
                     whatsapp_number VARCHAR(100),
                     facebook_link TEXT,
                     tiktok_link TEXT,
                     youtube_link TEXT,
                     insta_link TEXT,
-                    photo_link TEXT DEFAULT 'https://placehold.co/100x100/EEE/31343C?text=No+Image',
-                    description TEXT,
-                    political_status TEXT,
-                    relationship_status VARCHAR(20) DEFAULT 'Regular',
-                    gender VARCHAR(10),
-                    age INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    photo_link TEXT,
+                    description TEXT
+                )
+            """)
+
+            # Occupations Table: Canonical occupations referenced by records.occupation_id. The
+            # curated ones come from OCCUPATION_DICTIONARY; others are added by assign_occupations
+            # for values that match none of them.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS occupations (
+                    id SERIAL PRIMARY KEY,
+                    name TEXT UNIQUE NOT NULL,
+                    curated BOOLEAN NOT NULL DEFAULT FALSE
+                )
+            """)
+            execute_values(cur, """
+                INSERT INTO occupations (name, curated) VALUES %s
+                ON CONFLICT (name) DO UPDATE SET curated = TRUE WHERE NOT occupations.curated
+            """, [(name, True) for name in OCCUPATION_DICTIONARY])
+
+            # Occupation Aliases Table: The occupation each distinct (trimmed) পেশা value was matched to.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS occupation_aliases (
+                    value TEXT PRIMARY KEY,
+                    occupation_id INTEGER NOT NULL REFERENCES occupations(id) ON DELETE CASCADE
+                )
+            """)
+
+            # Localities Table: Distinct combinations of the address components parsed out of
+            # ঠিকানা (see utils.address_parser), referenced by records.locality_id.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS localities (
+                    id SERIAL PRIMARY KEY,
+                    locality_key TEXT UNIQUE NOT NULL,
+                    village TEXT,
+                    ward TEXT,
+                    union_name TEXT,
+                    post_office TEXT,
+                    upazila TEXT
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS localities_area_idx ON localities (upazila, union_name, ward, village)")
+
+            # Address Localities Table: The locality each distinct (trimmed) ঠিকানা value was parsed
+            # into; NULL when none of its components could be recognised.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS address_localities (
+                    address TEXT PRIMARY KEY,
+                    locality_id INTEGER REFERENCES localities(id) ON DELETE CASCADE
                 )
             """)
 
@@ -91,9 +400,11 @@ class Database:
             """)
 
             # Record-Events Junction Table: Manages the many-to-many relationship between records and events.
+            # Tables pointing at records carry no foreign key to it, since ids are only unique per
+            # partition key; delete_batch and clear_all_data remove their rows instead.
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS record_events (
-                    record_id INTEGER REFERENCES records(id) ON DELETE CASCADE,
+                    record_id INTEGER NOT NULL,
                     event_id INTEGER REFERENCES events(id) ON DELETE CASCADE,
                     PRIMARY KEY (record_id, event_id)
                 )
@@ -103,13 +414,201 @@ class Database:
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS family_connections (
                     id SERIAL PRIMARY KEY,
-                    source_record_id INTEGER REFERENCES records(id) ON DELETE CASCADE,
-                    target_record_id INTEGER REFERENCES records(id) ON DELETE CASCADE,
+                    source_record_id INTEGER NOT NULL,
+                    target_record_id INTEGER NOT NULL,
                     relationship_to_source VARCHAR(50) NOT NULL,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     UNIQUE (source_record_id, target_record_id, relationship_to_source)
                 )
             """)
+
+            # Family Relationship Types Table: Each relationship label and its inverse.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS family_relationship_types (
+                    label VARCHAR(50) PRIMARY KEY,
+                    inverse_label VARCHAR(50) NOT NULL
+                )
+            """)
+            execute_values(cur, """
+                INSERT INTO family_relationship_types (label, inverse_label) VALUES %s
+                ON CONFLICT (label) DO NOTHING
+            """, list(FAMILY_RELATIONSHIP_INVERSES.items()))
+
+            # Normalised voter number used for de-duplication: Bengali digits become
+            # English digits and whitespace is dropped, so "১২৩ ৪" and "1234" match.
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION voter_no_key(value TEXT) RETURNS TEXT
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+                    SELECT NULLIF(regexp_replace(translate(value, '০১২৩৪৫৬৭৮৯', '0123456789'), '\s+', '', 'g'), '')
+                $$
+            """)
+
+            # Records Staging Table: Unlogged landing area for uploads. Rows are validated,
+            # de-duplicated and normalised here before one INSERT ... SELECT into records.
+            cur.execute("""
+                CREATE UNLOGGED TABLE IF NOT EXISTS records_staging (
+                    load_id TEXT NOT NULL,
+                    src_seq INTEGER NOT NULL,
+                    src_line INTEGER,
+                    src_offset BIGINT,
+                    batch_id INTEGER,
+                    file_name TEXT,
+                    ক্রমিক_নং TEXT,
+                    নাম TEXT,
+                    ভোটার_নং TEXT,
+                    পিতার_নাম TEXT,
+                    মাতার_নাম TEXT,
+                    পেশা TEXT,
+                    occupation_details TEXT,
+                    জন্ম_তারিখ TEXT,
+                    ঠিকানা TEXT,
+                    phone_number TEXT,
+                    whatsapp_number TEXT,
+                    facebook_link TEXT,
+                    tiktok_link TEXT,
+                    youtube_link TEXT,
+                    insta_link TEXT,
+                    photo_link TEXT,
+                    description TEXT,
+                    political_status TEXT,
+                    relationship_status TEXT,
+                    gender TEXT,
+                    age INTEGER
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS records_staging_load_idx ON records_staging (load_id)")
+
+            # Ingest Jobs Table: Tracks background uploads processed by ingest_worker.py.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
+                    id SERIAL PRIMARY KEY,
+                    batch_id INTEGER REFERENCES batches(id) ON DELETE CASCADE,
+                    default_gender VARCHAR(10),
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                    staging_dir TEXT NOT NULL,
+                    total_files INTEGER DEFAULT 0,
+                    files_done INTEGER DEFAULT 0,
+                    records_parsed INTEGER DEFAULT 0,
+                    records_inserted INTEGER DEFAULT 0,
+                    records_skipped INTEGER DEFAULT 0,
+                    errors INTEGER DEFAULT 0,
+                    last_error TEXT,
+                    cancel_requested BOOLEAN DEFAULT FALSE,
+                    worker_pid INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP,
+                    heartbeat_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            """)
+
+            # Ingest Job Files Table: Per-file progress, so a resumed job skips files already loaded.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_job_files (
+                    id SERIAL PRIMARY KEY,
+                    job_id INTEGER REFERENCES ingest_jobs(id) ON DELETE CASCADE,
+                    file_name VARCHAR(255) NOT NULL,
+                    staged_path TEXT NOT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                    records_parsed INTEGER DEFAULT 0,
+                    records_staged INTEGER DEFAULT 0,
+                    records_inserted INTEGER DEFAULT 0,
+                    records_skipped INTEGER DEFAULT 0,
+                    parse_stats JSONB,
+                    error TEXT,
+                    finished_at TIMESTAMP,
+                    UNIQUE (job_id, file_name)
+                )
+            """)
+
+            # Ingest Rejects Table: Every record dropped during an upload, with its
+            # location in the source file, so missing records can be traced without re-parsing.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS ingest_rejects (
+                    id BIGSERIAL PRIMARY KEY,
+                    job_file_id INTEGER REFERENCES ingest_job_files(id) ON DELETE CASCADE,
+                    line_no INTEGER,
+                    byte_offset BIGINT,
+                    reason VARCHAR(100) NOT NULL,
+                    detail TEXT,
+                    raw_text TEXT
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS ingest_rejects_file_reason_idx ON ingest_rejects (job_file_id, reason)")
+
+            # Normalised person name used to match parent names to voters: lower-cased, punctuation
+            # dropped, a leading "মৃত"/"মরহুম"/"late" removed and the spellings of "মোঃ" unified.
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION voter_name_key(value TEXT) RETURNS TEXT
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+                    SELECT NULLIF(btrim(regexp_replace(
+                        regexp_replace(
+                            regexp_replace(
+                                ' ' || regexp_replace(lower(value), '[!-/:-@[-`{-~।]+', ' ', 'g') || ' ',
+                                '^[[:space:]]*(মৃত|মরহুম|late)[[:space:]]+', ' '
+                            ),
+                            '[[:space:]](মোহাম্মদ|মোহাম্মাদ|মুহাম্মদ|মোঃ|মোং|মো|md|mohammad|mohammed|muhammad|mohd)(?=[[:space:]])', ' মোঃ', 'g'
+                        ),
+                        '[[:space:]]+', ' ', 'g'
+                    )), '')
+                $$
+            """)
+
+            # Normalised address: Bengali digits to English, punctuation dropped, whitespace collapsed.
+            cur.execute("""
+                CREATE OR REPLACE FUNCTION address_key(value TEXT) RETURNS TEXT
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+                    SELECT NULLIF(btrim(regexp_replace(
+                        regexp_replace(lower(translate(value, '০১২৩৪৫৬৭৮৯', '0123456789')), '[!-/:-@[-`{-~।]+', ' ', 'g'),
+                        '[[:space:]]+', ' ', 'g'
+                    )), '')
+                $$
+            """)
+
+            # Family Link Suggestions Table: Candidate parent links found by matching পিতার_নাম / মাতার_নাম
+            # against other voters' names, waiting to be accepted or rejected on the Family Tree page.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS family_link_suggestions (
+                    id SERIAL PRIMARY KEY,
+                    child_record_id INTEGER NOT NULL,
+                    parent_record_id INTEGER NOT NULL,
+                    relationship VARCHAR(50) NOT NULL,
+                    score REAL NOT NULL,
+                    same_address BOOLEAN,
+                    age_gap INTEGER,
+                    candidate_count INTEGER,
+                    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    reviewed_at TIMESTAMP,
+                    UNIQUE (child_record_id, parent_record_id, relationship)
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS family_link_suggestions_status_idx ON family_link_suggestions (status, score DESC)")
+
+            # Analytics Cube Table: Record counts per batch, gender, exact age, relationship
+            # status, canonical occupation and locality, maintained by refresh_analytics_cube and rolled up by
+            # get_analytics_rollup for the analysis charts.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS analytics_cube (
+                    batch_id INTEGER NOT NULL,
+                    gender VARCHAR(10),
+                    age INTEGER,
+                    relationship_status VARCHAR(20),
+                    occupation_id INTEGER,
+                    locality_id INTEGER,
+                    record_count INTEGER NOT NULL
+                )
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS analytics_cube_batch_idx ON analytics_cube (batch_id)")
+
+            # Analytics Cube Batches Table: The batches.generation each batch's cube rows were built at.
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS analytics_cube_batches (
+                    batch_id INTEGER PRIMARY KEY,
+                    generation BIGINT NOT NULL,
+                    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
             self.conn.commit()
 
     def add_missing_columns(self):
@@ -118,14 +617,13 @@ class Database:
         This is crucial for schema evolution without dropping data.
         """
         with self.conn.cursor() as cur:
+            # Profile columns added over time (tiktok_link, occupation_details, ...) now live
+            # in record_profiles; see split_record_profiles.
             columns_to_add = {
                 'age': 'INTEGER',
                 'political_status': 'TEXT',
-                'tiktok_link': 'TEXT',
-                'youtube_link': 'TEXT',
-                'insta_link': 'TEXT',
-                'occupation_details': 'TEXT',
-                'whatsapp_number': 'VARCHAR(100)'
+                'household_id': 'INTEGER',
+                'file_id': 'INTEGER'
             }
             for col, col_type in columns_to_add.items():
                 try:
@@ -134,18 +632,373 @@ class Database:
                 except psycopg2.Error as e:
                     logger.warning(f"Could not add '{col}' column: {e}")
                     self.conn.rollback()
-            
-            # Set default for photo_link and update existing records
-            try:
-                cur.execute("ALTER TABLE records ALTER COLUMN photo_link SET DEFAULT 'https://placehold.co/100x100/EEE/31343C?text=No+Image'")
-                cur.execute("UPDATE records SET photo_link = 'https://placehold.co/100x100/EEE/31343C?text=No+Image' WHERE photo_link IS NULL OR photo_link = ''")
-                logger.info("Set default for 'photo_link' and updated existing NULL/empty records.")
-            except psycopg2.Error as e:
-                logger.warning(f"Could not set default for 'photo_link' column: {e}")
-                self.conn.rollback()
 
+            # Columns added to supporting tables after they were first released.
+            table_columns_to_add = [
+                ('batches', 'generation', "BIGINT NOT NULL DEFAULT nextval('batch_generation_seq')"),
+                ('ingest_job_files', 'records_staged', 'INTEGER DEFAULT 0'),
+                ('ingest_job_files', 'parse_stats', 'JSONB'),
+                ('records_staging', 'src_line', 'INTEGER'),
+                ('records_staging', 'src_offset', 'BIGINT'),
+            ]
+            for table, col, col_type in table_columns_to_add:
+                try:
+                    cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col} {col_type}")
+                except psycopg2.Error as e:
+                    logger.warning(f"Could not add '{col}' column to '{table}': {e}")
+                    self.conn.rollback()
+
+            self.conn.commit()
+
+
+    def ensure_batch_partition(self, batch_id):
+        """
+        Creates the records partition of a batch if it does not exist.
+        Part of the caller's transaction; does not commit.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT to_regclass(%s)", (f"records_batch_{int(batch_id)}",))
+            if cur.fetchone()[0] is None:
+                cur.execute(
+                    f"CREATE TABLE records_batch_{int(batch_id)} PARTITION OF records FOR VALUES IN ({int(batch_id)})"
+                )
+
+    def partition_records(self):
+        """
+        Makes sure records is partitioned by batch, with a partition per batch and a
+        default partition, converting an unpartitioned records table from an older
+        version in place. Rows without a batch cannot be kept in the partitioned
+        table and are dropped.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT relkind FROM pg_class WHERE oid = 'records'::regclass")
+            if cur.fetchone()[0] != 'p':
+                logger.info("Converting 'records' to a table partitioned by batch...")
+                cur.execute("LOCK TABLE records IN ACCESS EXCLUSIVE MODE")
+                cur.execute("SELECT pg_get_serial_sequence('records', 'id')")
+                id_sequence = cur.fetchone()[0]
+                cur.execute("ALTER TABLE records RENAME TO records_unpartitioned")
+                cur.execute("""
+                    CREATE TABLE records (LIKE records_unpartitioned INCLUDING DEFAULTS)
+                    PARTITION BY LIST (batch_id)
+                """)
+                cur.execute("""
+                    ALTER TABLE records
+                        ADD PRIMARY KEY (id, batch_id),
+                        ADD FOREIGN KEY (batch_id) REFERENCES batches(id) ON DELETE CASCADE
+                """)
+                cur.execute(f"ALTER SEQUENCE {id_sequence} OWNED BY records.id")
+                cur.execute("CREATE TABLE records_default PARTITION OF records DEFAULT")
+                cur.execute("SELECT DISTINCT batch_id FROM records_unpartitioned WHERE batch_id IS NOT NULL")
+                for (batch_id,) in cur.fetchall():
+                    self.ensure_batch_partition(batch_id)
+                cur.execute("INSERT INTO records SELECT * FROM records_unpartitioned WHERE batch_id IS NOT NULL")
+                moved = cur.rowcount
+                # Also drops the foreign keys other tables had on the old table
+                cur.execute("DROP TABLE records_unpartitioned CASCADE")
+                self.conn.commit()
+                logger.info(f"Moved {moved} records into batch partitions.")
+                return
+
+            cur.execute("SELECT to_regclass('records_default')")
+            if cur.fetchone()[0] is None:
+                cur.execute("CREATE TABLE records_default PARTITION OF records DEFAULT")
+            cur.execute("""
+                SELECT b.id FROM batches b
+                WHERE to_regclass('records_batch_' || b.id) IS NULL
+            """)
+            for (batch_id,) in cur.fetchall():
+                self.ensure_batch_partition(batch_id)
+            self.conn.commit()
+
+    def migrate_record_files(self):
+        """
+        Moves file names from records.file_name, as stored by older versions, into the
+        files table and records.file_id, then drops the column.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'records' AND column_name = 'file_name'
+            """)
+            if cur.fetchone() is None:
+                return
+            logger.info("Moving record file names into the files table...")
+            cur.execute("""
+                INSERT INTO files (batch_id, name, record_count, ingested_at)
+                SELECT batch_id, COALESCE(file_name, ''), COUNT(*), MIN(created_at)
+                FROM records
+                GROUP BY batch_id, COALESCE(file_name, '')
+                ON CONFLICT (batch_id, name) DO NOTHING
+            """)
+            cur.execute("""
+                UPDATE records r SET file_id = f.id
+                FROM files f
+                WHERE f.batch_id = r.batch_id AND f.name = COALESCE(r.file_name, '')
+            """)
+            cur.execute("DROP INDEX IF EXISTS records_batch_file_idx")
+            cur.execute("ALTER TABLE records DROP COLUMN file_name")
+            self.conn.commit()
+
+    def split_record_profiles(self):
+        """
+        Moves the profile columns of records, as stored by older versions, into
+        record_profiles and drops them from records. Empty values and placeholder
+        photo links are not copied.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'records' AND column_name = ANY(%s)
+            """, (list(PROFILE_COLUMNS),))
+            present = [row[0] for row in cur.fetchall()]
+            if not present:
+                return
+            logger.info(f"Moving {', '.join(present)} from records to record_profiles...")
+            # Unset fields become NULL as in profile_value, so only records with a field set get a row
+            values = []
+            for column in present:
+                value = f"CASE WHEN btrim({column}) IN %(empty)s THEN NULL ELSE {column} END"
+                if column == 'photo_link':
+                    value = f"NULLIF({value}, %(default_photo)s)"
+                values.append(value)
+            cur.execute(f"""
+                INSERT INTO record_profiles (record_id, {', '.join(present)})
+                SELECT id, {', '.join(values)}
+                FROM records
+                WHERE ({' OR '.join(f'{value} IS NOT NULL' for value in values)})
+                ON CONFLICT (record_id) DO NOTHING
+            """, {'default_photo': DEFAULT_PHOTO_LINK, 'empty': PROFILE_EMPTY_VALUES})
+            moved = cur.rowcount
+            for column in present:
+                cur.execute(f"ALTER TABLE records DROP COLUMN {column}")
+            self.conn.commit()
+            logger.info(f"Moved {moved} record profiles.")
+
+    def migrate_occupations(self):
+        """
+        Adds records.occupation_id to databases from older versions and assigns it
+        for every record. The analytics cube, which counted the free-text পেশা, is
+        emptied so refresh_analytics_cube rebuilds it by occupation id.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'records' AND column_name = 'occupation_id'
+            """)
+            if cur.fetchone() is not None:
+                return
+            logger.info("Assigning canonical occupations to existing records...")
+            cur.execute("ALTER TABLE records ADD COLUMN occupation_id INTEGER")
+            cur.execute("TRUNCATE analytics_cube, analytics_cube_batches")
+            cur.execute("ALTER TABLE analytics_cube DROP COLUMN IF EXISTS occupation")
+            cur.execute("ALTER TABLE analytics_cube ADD COLUMN IF NOT EXISTS occupation_id INTEGER")
+        self.assign_occupations()
+        self.conn.commit()
+
+    def migrate_localities(self):
+        """
+        Adds records.locality_id to databases from older versions and parses every
+        record's ঠিকানা into it. The analytics cube is emptied so it is rebuilt with
+        the locality dimension.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'records' AND column_name = 'locality_id'
+            """)
+            if cur.fetchone() is not None:
+                return
+            logger.info("Parsing the addresses of existing records into localities...")
+            cur.execute("ALTER TABLE records ADD COLUMN locality_id INTEGER")
+            cur.execute("TRUNCATE analytics_cube, analytics_cube_batches")
+            cur.execute("ALTER TABLE analytics_cube ADD COLUMN IF NOT EXISTS locality_id INTEGER")
+        self.assign_localities()
+        self.conn.commit()
+
+    def create_generation_triggers(self):
+        """
+        Bumps batches.generation from statement-level triggers whenever records of
+        the batch are inserted or deleted, one of their ANALYTICS_FIELDS is updated,
+        or their event assignments change. Functions are only replaced when their
+        body changed (e.g. with ANALYTICS_FIELDS) and only missing triggers are created.
+        """
+        changed_fields = ' OR '.join(f"o.{field} IS DISTINCT FROM n.{field}" for field in ANALYTICS_FIELDS)
+        functions = {
+            'bump_batch_generation': """
+                BEGIN
+                    UPDATE batches SET generation = nextval('batch_generation_seq')
+                    WHERE id IN (SELECT DISTINCT batch_id FROM changed_rows);
+                    RETURN NULL;
+                END
+            """,
+            'bump_updated_batch_generation': f"""
+                BEGIN
+                    UPDATE batches SET generation = nextval('batch_generation_seq')
+                    WHERE id IN (
+                        SELECT DISTINCT n.batch_id FROM changed_rows n
+                        JOIN old_rows o ON o.id = n.id
+                        WHERE {changed_fields}
+                    );
+                    RETURN NULL;
+                END
+            """,
+            'bump_event_batch_generation': """
+                BEGIN
+                    UPDATE batches SET generation = nextval('batch_generation_seq')
+                    WHERE id IN (
+                        SELECT DISTINCT r.batch_id FROM records r
+                        WHERE r.id IN (SELECT record_id FROM changed_rows)
+                    );
+                    RETURN NULL;
+                END
+            """,
+        }
+        # Transition tables allow a single event per trigger, hence one trigger per event.
+        # Updates of records only count when an analysis field changed (e.g. not for
+        # household rebuilds); record_events rows are never updated.
+        triggers = (
+            ('records', 'INSERT', 'NEW TABLE AS changed_rows', 'bump_batch_generation'),
+            ('records', 'DELETE', 'OLD TABLE AS changed_rows', 'bump_batch_generation'),
+            ('records', 'UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS changed_rows', 'bump_updated_batch_generation'),
+            ('record_events', 'INSERT', 'NEW TABLE AS changed_rows', 'bump_event_batch_generation'),
+            ('record_events', 'DELETE', 'OLD TABLE AS changed_rows', 'bump_event_batch_generation'),
+        )
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT proname, prosrc FROM pg_proc
+                WHERE pronamespace = current_schema()::regnamespace AND proname = ANY(%s)
+            """, (list(functions),))
+            existing_functions = dict(cur.fetchall())
+            for function, body in functions.items():
+                if existing_functions.get(function) != body:
+                    cur.execute(f"""
+                        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger
+                        LANGUAGE plpgsql AS ${function}${body}${function}$
+                    """)
+                    logger.info(f"Created function {function}()")
+            cur.execute("""
+                SELECT tgname FROM pg_trigger
+                WHERE tgrelid IN ('records'::regclass, 'record_events'::regclass) AND NOT tgisinternal
+            """)
+            existing_triggers = {row[0] for row in cur.fetchall()}
+            for table, event, transition, function in triggers:
+                trigger = f"{table}_{event.lower()}_generation"
+                if trigger in existing_triggers:
+                    continue
+                cur.execute(f"""
+                    CREATE TRIGGER {trigger}
+                    AFTER {event} ON {table}
+                    REFERENCING {transition}
+                    FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+                """)
+                logger.info(f"Created trigger {trigger}")
+            self.conn.commit()
+
+    def create_indexes(self):
+        """Creates the secondary indexes in INDEX_DEFINITIONS that do not exist yet."""
+        with self.conn.cursor() as cur:
+            for index_name, definition in INDEX_DEFINITIONS.items():
+                try:
+                    cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {definition}")
+                except psycopg2.Error as e:
+                    logger.warning(f"Could not create index '{index_name}': {e}")
+                    self.conn.rollback()
             self.conn.commit()
 
+    def verify_indexes(self):
+        """Returns the names of the indexes in INDEX_DEFINITIONS that are missing from the database."""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()")
+            existing = {row[0] for row in cur.fetchall()}
+        missing = [index_name for index_name in INDEX_DEFINITIONS if index_name not in existing]
+        if missing:
+            logger.warning(f"Missing indexes: {', '.join(missing)}")
+        return missing
+
+    def check_index_usage(self):
+        """
+        Runs EXPLAIN on the query in INDEX_USAGE_QUERIES for each index and reports
+        whether the planner can serve it from that index: {index_name: bool}.
+        Sequential scans are disabled for the check, so the result does not depend
+        on how much data the tables hold.
+        """
+        def plan_indexes(plan):
+            names = {plan['Index Name']} if 'Index Name' in plan else set()
+            for child in plan.get('Plans', []):
+                names |= plan_indexes(child)
+            return names
+
+        usage = {}
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SET LOCAL enable_seqscan = off")
+                for index_name, query in INDEX_USAGE_QUERIES.items():
+                    # On the partitioned records table plans name the partitions' copies of the index
+                    cur.execute("""
+                        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                        WHERE i.inhparent = to_regclass(%s)
+                    """, (index_name,))
+                    names = {index_name} | {row[0] for row in cur.fetchall()}
+                    cur.execute(f"EXPLAIN (FORMAT JSON) {query}")
+                    usage[index_name] = bool(names & plan_indexes(cur.fetchone()[0][0]['Plan']))
+        finally:
+            # Also undoes SET LOCAL
+            self.conn.rollback()
+        for index_name, used in usage.items():
+            if not used:
+                logger.warning(f"Index '{index_name}' is not used by its query plan.")
+        return usage
+
+    def migrate_family_connections(self):
+        """
+        Collapses family links stored as two reciprocal rows (A→B "পিতা" and B→A "সন্তান")
+        into one row and adds the unique index that keeps one row per pair of records.
+        Runs once: it is skipped when the index already exists.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('family_connections_pair_idx')")
+            if cur.fetchone()[0]:
+                return
+            try:
+                # A row is dropped when its reverse row already implies it. When both rows imply
+                # each other (ভাই/ভাই, স্বামী/স্ত্রী) the older one is kept.
+                cur.execute("""
+                    DELETE FROM family_connections x
+                    USING family_connections y
+                    LEFT JOIN family_relationship_types yt ON yt.label = y.relationship_to_source
+                    WHERE y.source_record_id = x.target_record_id
+                      AND y.target_record_id = x.source_record_id
+                      AND yt.inverse_label = x.relationship_to_source
+                      AND (
+                          NOT EXISTS (
+                              SELECT 1 FROM family_relationship_types xt
+                              WHERE xt.label = x.relationship_to_source AND xt.inverse_label = y.relationship_to_source
+                          )
+                          OR y.id < x.id
+                      )
+                """)
+                collapsed = cur.rowcount
+                self.conn.commit()
+                if collapsed:
+                    logger.info(f"Collapsed {collapsed} reciprocal family connection rows.")
+            except psycopg2.Error as e:
+                logger.warning(f"Could not collapse reciprocal family connections: {e}")
+                self.conn.rollback()
+                return
+            try:
+                cur.execute("""
+                    CREATE UNIQUE INDEX family_connections_pair_idx ON family_connections
+                    (LEAST(source_record_id, target_record_id), GREATEST(source_record_id, target_record_id))
+                """)
+                self.conn.commit()
+            except psycopg2.Error as e:
+                # Pairs linked twice with unrelated labels need manual review; keep the data as is.
+                logger.warning(f"Could not make family connections one row per pair: {e}")
+                self.conn.rollback()
+                return
+        # Links saved before households existed were never merged into one
+        self.rebuild_households()
 
     def get_dashboard_stats(self):
         """Retrieves key statistics for the main dashboard."""
@@ -163,20 +1016,17 @@ class Database:
             cur.execute("SELECT COUNT(*) as total_events FROM events")
             stats['total_events'] = cur.fetchone()['total_events']
 
-            # Relationship counts
-            cur.execute("SELECT relationship_status, COUNT(*) as count FROM records GROUP BY relationship_status")
-            relationship_counts = cur.fetchall()
-            stats['relationships'] = {item['relationship_status']: item['count'] for item in relationship_counts}
-
-            # Gender counts
-            cur.execute("SELECT gender, COUNT(*) as count FROM records WHERE gender IS NOT NULL AND gender != '' GROUP BY gender")
-            gender_counts = cur.fetchall()
-            stats['genders'] = {item['gender']: item['count'] for item in gender_counts}
-
-            # Age distribution (optional, for dashboard or analysis page)
-            cur.execute("SELECT CASE WHEN age IS NULL THEN 'Unknown' ELSE (FLOOR(age / 10) * 10 || '-' || (FLOOR(age / 10) * 10 + 9)) END as age_group, COUNT(*) as count FROM records WHERE age IS NOT NULL GROUP BY age_group ORDER BY age_group")
-            age_distribution = cur.fetchall()
-            stats['age_distribution'] = age_distribution
+        # Breakdowns are rolled up from the analytics cube
+        self.refresh_analytics_cube()
+        stats['relationships'] = {
+            item['relationship_status']: item['count'] for item in self.get_analytics_rollup(['relationship_status'])
+        }
+        stats['genders'] = {
+            item['gender']: item['count'] for item in self.get_analytics_rollup(['gender']) if item['gender']
+        }
+        stats['age_distribution'] = [
+            item for item in self.get_analytics_rollup(['age_group']) if item['age_group'] != 'Unknown'
+        ]
 
         return stats
 
@@ -213,86 +1063,431 @@ class Database:
             return [row[0] for row in cur.fetchall()]
 
     def assign_events_to_record(self, record_id, event_ids):
-        """Assigns a list of events to a record, replacing any existing assignments."""
+        """
+        Makes `event_ids` the events of a record, writing only the links that were
+        added or removed. Returns (links added, links removed); nothing is written
+        when the assignment did not change.
+        """
+        wanted = set(event_ids)
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT event_id FROM record_events WHERE record_id = %s", (record_id,))
+            current = {row[0] for row in cur.fetchall()}
+            to_add, to_remove = wanted - current, current - wanted
+            if to_remove:
+                cur.execute(
+                    "DELETE FROM record_events WHERE record_id = %s AND event_id = ANY(%s)",
+                    (record_id, list(to_remove))
+                )
+            if to_add:
+                cur.execute("""
+                    INSERT INTO record_events (record_id, event_id)
+                    SELECT %s, unnest(%s::int[])
+                    ON CONFLICT (record_id, event_id) DO NOTHING
+                """, (record_id, list(to_add)))
+            self.conn.commit()
+        return len(to_add), len(to_remove)
+
+    def update_events_bulk(self, add_event_ids=(), remove_event_ids=(), record_ids=None, criteria=None):
+        """
+        Adds and removes events for many records at once: the given record ids, or every
+        record matching a search criteria dict (see build_search_filter). Links that
+        already exist are kept, and both changes are applied in one transaction.
+        Returns (links added, links removed).
+        """
+        if record_ids is not None and not record_ids:
+            return 0, 0
+        where_sql, params = self.build_record_selection(record_ids, criteria)
+        added = removed = 0
         with self.conn.cursor() as cur:
-            cur.execute("DELETE FROM record_events WHERE record_id = %s", (record_id,))
-            if event_ids:
-                args_str = ','.join(cur.mogrify("(%s,%s)", (record_id, event_id)).decode('utf-8') for event_id in event_ids)
-                cur.execute("INSERT INTO record_events (record_id, event_id) VALUES " + args_str)
+            if remove_event_ids:
+                cur.execute(f"""
+                    DELETE FROM record_events re
+                    USING records r
+                    WHERE re.record_id = r.id AND re.event_id = ANY(%s) AND {where_sql}
+                """, [list(remove_event_ids)] + params)
+                removed = cur.rowcount
+            if add_event_ids:
+                cur.execute(f"""
+                    INSERT INTO record_events (record_id, event_id)
+                    SELECT r.id, e.id
+                    FROM records r
+                    CROSS JOIN events e
+                    WHERE e.id = ANY(%s) AND {where_sql}
+                    ON CONFLICT (record_id, event_id) DO NOTHING
+                """, [list(add_event_ids)] + params)
+                added = cur.rowcount
             self.conn.commit()
+        logger.info(f"Bulk event update: {added} links added, {removed} removed.")
+        return added, removed
+
+    def build_event_filter(self, all_of=(), any_of=(), none_of=()):
+        """
+        WHERE clause (sql, params) over records `r` for event membership: records
+        assigned every event in `all_of`, at least one in `any_of` and none in
+        `none_of`. Empty lists are ignored.
+        """
+        query_parts = []
+        params = []
+        if all_of:
+            query_parts.append("""
+                r.id IN (SELECT record_id FROM record_events WHERE event_id = ANY(%s)
+                         GROUP BY record_id HAVING COUNT(*) = %s)
+            """)
+            params.extend([list(set(all_of)), len(set(all_of))])
+        if any_of:
+            query_parts.append("r.id IN (SELECT record_id FROM record_events WHERE event_id = ANY(%s))")
+            params.append(list(any_of))
+        if none_of:
+            query_parts.append("""
+                NOT EXISTS (SELECT 1 FROM record_events re WHERE re.record_id = r.id AND re.event_id = ANY(%s))
+            """)
+            params.append(list(none_of))
+        return " AND ".join(query_parts), params
+
+    def build_event_query_filter(self, all_of=(), any_of=(), none_of=(), criteria=None):
+        """Combines build_event_filter with the search filter for `criteria`."""
+        event_sql, params = self.build_event_filter(all_of, any_of, none_of)
+        query_parts = [event_sql] if event_sql else []
+        if criteria:
+            record_sql, record_params = self.build_search_filter(criteria)
+            if record_sql:
+                query_parts.append(record_sql)
+                params = params + record_params
+        return " AND ".join(query_parts), params
+
+    def count_records_by_events(self, all_of=(), any_of=(), none_of=(), criteria=None):
+        """Counts the records matching an event combination and optional search criteria."""
+        where_sql, params = self.build_event_query_filter(all_of, any_of, none_of, criteria)
+        with self.conn.cursor() as cur:
+            cur.execute(f"SELECT COUNT(*) FROM records r {'WHERE ' + where_sql if where_sql else ''}", params)
+            return cur.fetchone()[0]
+
+    def get_records_by_events(self, all_of=(), any_of=(), none_of=(), criteria=None, limit=50, offset=0,
+                              projection='card'):
+        """
+        One page of the records matching an event combination (see build_event_filter)
+        and optional search criteria, ordered by id, with the columns of `projection`.
+        """
+        where_sql, params = self.build_event_query_filter(all_of, any_of, none_of, criteria)
+        columns_sql, from_sql = self.record_projection_sql(projection)
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                SELECT {columns_sql}
+                FROM {from_sql}
+                {'WHERE ' + where_sql if where_sql else ''}
+                ORDER BY r.id
+                LIMIT %s OFFSET %s
+            """, params + [limit, offset])
+            return cur.fetchall()
 
-    def get_records_for_event(self, event_id):
-        """Gets all records associated with a specific event ID."""
+    def get_records_for_event(self, event_id, projection='card'):
+        """Gets all records associated with a specific event ID, with the columns of `projection`."""
+        columns_sql, from_sql = self.record_projection_sql(projection)
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT r.*, b.name as batch_name
-                FROM records r
-                JOIN record_events re ON r.id = re.record_id
-                JOIN batches b ON r.batch_id = b.id
-                WHERE re.event_id = %s
+            cur.execute(f"""
+                SELECT {columns_sql}
+                FROM {from_sql}
+                WHERE r.id IN (SELECT record_id FROM record_events WHERE event_id = %s)
                 ORDER BY r.id
             """, (event_id,))
-            records = cur.fetchall()
-        # Fetch associated events for each record (though they should all include the filtered event)
-        for record in records:
-            record['events'] = self.get_events_for_record(record['id'])
-        return records
+            return cur.fetchall()
 
     # --- Record & Batch Management ---
     def add_batch(self, batch_name):
-        """Adds a new batch or returns the ID of an existing one."""
+        """Adds a new batch, with its records partition, or returns the ID of an existing one."""
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute(
                 "INSERT INTO batches (name) VALUES (%s) ON CONFLICT (name) DO UPDATE SET name=EXCLUDED.name RETURNING id",
                 (batch_name,)
             )
             result = cur.fetchone()
+            self.ensure_batch_partition(result['id'])
             self.conn.commit()
             return result['id']
 
-    def add_record(self, batch_id, file_name, record_data):
+    def get_or_create_file(self, batch_id, file_name):
         """
-        Adds a new record to the database, including calculated age.
-        This function only executes the INSERT statement; the calling function
-        is responsible for committing or rolling back the transaction.
+        Returns the id of a batch's file, adding the files row if needed.
+        Part of the caller's transaction; does not commit.
         """
         with self.conn.cursor() as cur:
-            whatsapp_number = record_data.get('whatsapp_number')
-            if whatsapp_number and not whatsapp_number.startswith('https://wa.me/'):
-                whatsapp_number = f"https://wa.me/{whatsapp_number}"
-
-            phone_number = record_data.get('phone_number')
-            if phone_number and not phone_number.startswith('tel:'):
-                phone_number = f"tel:{phone_number}"
-            
-            photo_link = record_data.get('photo_link')
-            if not photo_link or not photo_link.strip():
-                photo_link = 'https://placehold.co/100x100/EEE/31343C?text=No+Image'
-            
             cur.execute("""
-                INSERT INTO records (
-                    batch_id, file_name, ক্রমিক_নং, নাম, ভোটার_নং,
-                    পিতার_নাম, মাতার_নাম, পেশা, occupation_details, জন্ম_তারিখ, ঠিকানা,
-                    phone_number, whatsapp_number, facebook_link, tiktok_link, youtube_link, insta_link, photo_link, description,
-                    political_status, relationship_status, gender, age
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO files (batch_id, name) VALUES (%s, %s)
+                ON CONFLICT (batch_id, name) DO UPDATE SET name = EXCLUDED.name
                 RETURNING id
-            """, ( # Added RETURNING id here
-                batch_id, file_name,
-                record_data.get('ক্রমিক_নং'), record_data.get('নাম'),
-                record_data.get('ভোটার_নং'), record_data.get('পিতার_নাম'),
-                record_data.get('মাতার_নাম'), record_data.get('পেশা'), record_data.get('occupation_details'),
-                record_data.get('জন্ম_তারিখ'), record_data.get('ঠিকানা'),
-                phone_number, whatsapp_number, record_data.get('facebook_link'),
-                record_data.get('tiktok_link'), record_data.get('youtube_link'), record_data.get('insta_link'),
-                photo_link, record_data.get('description'),
-                record_data.get('political_status'),
-                record_data.get('relationship_status', 'Regular'),
-                record_data.get('gender'),
-                record_data.get('age')
-            ))
-            return cur.fetchone()[0] # Return the ID of the newly added record
+            """, (batch_id, file_name or ''))
+            return cur.fetchone()[0]
+
+    def prepare_record_values(self, batch_id, file_id, record_data):
+        """
+        Normalises contact links and the photo placeholder for a record and returns
+        (values in RECORD_INSERT_COLUMNS order, values in PROFILE_COLUMNS order).
+        The profile values are None when none of them is set.
+        """
+        whatsapp_number = profile_value(record_data.get('whatsapp_number'))
+        if whatsapp_number and not whatsapp_number.startswith('https://wa.me/'):
+            whatsapp_number = f"https://wa.me/{whatsapp_number}"
+
+        phone_number = record_data.get('phone_number')
+        if phone_number and not phone_number.startswith('tel:'):
+            phone_number = f"tel:{phone_number}"
+
+        # The placeholder is not stored; a missing photo link reads as DEFAULT_PHOTO_LINK
+        photo_link = profile_value(record_data.get('photo_link'))
+        if photo_link == DEFAULT_PHOTO_LINK:
+            photo_link = None
+
+        values = (
+            batch_id, file_id,
+            record_data.get('ক্রমিক_নং'), record_data.get('নাম'),
+            record_data.get('ভোটার_নং'), record_data.get('পিতার_নাম'),
+            record_data.get('মাতার_নাম'), record_data.get('পেশা'),
+            record_data.get('জন্ম_তারিখ'), record_data.get('ঠিকানা'),
+            phone_number,
+            record_data.get('political_status'),
+            record_data.get('relationship_status', 'Regular'),
+            record_data.get('gender'),
+            record_data.get('age')
+        )
+        profile = (
+            profile_value(record_data.get('occupation_details')), whatsapp_number,
+            profile_value(record_data.get('facebook_link')), profile_value(record_data.get('tiktok_link')),
+            profile_value(record_data.get('youtube_link')), profile_value(record_data.get('insta_link')),
+            photo_link, profile_value(record_data.get('description'))
+        )
+        return values, (profile if any(profile) else None)
+
+    def add_record(self, batch_id, file_name, record_data):
+        """
+        Adds a new record to the database, including calculated age.
+        This function only executes the INSERT statement; the calling function
+        is responsible for committing or rolling back the transaction.
+        """
+        file_id = self.get_or_create_file(batch_id, file_name)
+        values, profile = self.prepare_record_values(batch_id, file_id, record_data)
+        with self.conn.cursor() as cur:
+            placeholders = ', '.join(['%s'] * len(RECORD_INSERT_COLUMNS))
+            cur.execute(
+                f"INSERT INTO records ({', '.join(RECORD_INSERT_COLUMNS)}) VALUES ({placeholders}) RETURNING id",
+                values
+            )
+            record_id = cur.fetchone()[0]
+            if profile:
+                cur.execute(
+                    f"INSERT INTO record_profiles (record_id, {', '.join(PROFILE_COLUMNS)}) "
+                    f"VALUES (%s, {', '.join(['%s'] * len(PROFILE_COLUMNS))})",
+                    (record_id,) + profile
+                )
+            cur.execute("UPDATE files SET record_count = record_count + 1 WHERE id = %s", (file_id,))
+        self.assign_occupations(record_ids=[record_id])
+        self.assign_localities(record_ids=[record_id])
+        return record_id # Return the ID of the newly added record
 
+    def stage_records(self, load_id, batch_id, file_name, records, start_seq=0, positions=None):
+        """
+        Bulk-loads parsed records into the unlogged staging table with COPY.
+        `positions` optionally holds the (line_no, byte_offset) of each record in its
+        source file, so rows rejected by the merge can be traced back.
+        Staged rows never touch the live records table until merge_staged_records runs.
+        Commits and returns the number of rows staged.
+        """
+        if not records:
+            return 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for offset, record in enumerate(records):
+            line_no, byte_offset = positions[offset] if positions else (None, None)
+            writer.writerow(
+                [load_id, start_seq + offset, line_no, byte_offset, batch_id, file_name] +
+                [record.get(field) for field in STAGED_RECORD_FIELDS]
+            )
+        buffer.seek(0)
+        self.copy_into_staging(buffer)
+        return len(records)
+
+    def stage_frame(self, load_id, batch_id, file_name, frame, start_seq=0):
+        """
+        Bulk-loads a DataFrame of records (as produced by tabular_processor) into the
+        staging table. The frame is serialised to CSV column-wise by pandas and sent
+        with a single COPY. An optional 'src_line' column records the source row.
+        Commits and returns the number of rows staged.
+        """
+        if frame.empty:
+            return 0
+        staged = frame.reindex(columns=list(STAGED_RECORD_FIELDS))
+        staged.insert(0, 'file_name', file_name)
+        staged.insert(0, 'batch_id', batch_id)
+        staged.insert(0, 'src_offset', None)
+        staged.insert(0, 'src_line', frame['src_line'] if 'src_line' in frame.columns else None)
+        staged.insert(0, 'src_seq', range(start_seq, start_seq + len(frame)))
+        staged.insert(0, 'load_id', load_id)
+        buffer = io.StringIO()
+        staged.to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        self.copy_into_staging(buffer)
+        return len(frame)
+
+    def copy_into_staging(self, buffer):
+        """COPYs CSV rows in staging column order into records_staging and commits."""
+        columns = ', '.join(STAGING_COPY_COLUMNS)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(f"COPY records_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        self.conn.commit()
+
+    def discard_staged_records(self, load_id):
+        """Removes all staging rows of a load, e.g. after a cancelled or failed file."""
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM records_staging WHERE load_id = %s", (load_id,))
+        self.conn.commit()
+
+    def merge_staged_records(self, load_id, job_file_id=None, content_hash=None):
+        """
+        Validates, de-duplicates and normalises a staged load in SQL and moves it into
+        records with a single INSERT ... SELECT, then clears the staging rows.
+
+        Rows missing a serial number, name or voter number are rejected. Rows are
+        de-duplicated on the normalised voter number within the load and against
+        records already in the same batch. The whole merge is one short transaction,
+        so a failure leaves neither partial records nor leftover staging rows behind.
+        When `job_file_id` is given, the rejected rows are written to ingest_rejects.
+        The load's files row is created if needed and gets its record count,
+        `content_hash` and ingest time refreshed. Profile fields go to
+        record_profiles in the same statement.
+        Returns a dict with 'staged', 'invalid', 'duplicate_in_file',
+        'duplicate_in_batch' and 'inserted' counts.
+        """
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            try:
+                cur.execute("""
+                    INSERT INTO files (batch_id, name)
+                    SELECT DISTINCT batch_id, COALESCE(file_name, '') FROM records_staging WHERE load_id = %s
+                    ON CONFLICT (batch_id, name) DO NOTHING
+                """, (load_id,))
+                cur.execute("""
+                    WITH staged AS (
+                        SELECT s.*, f.id as file_id,
+                               voter_no_key(s.ভোটার_নং) as voter_key,
+                               (NULLIF(btrim(s.ক্রমিক_নং), '') IS NOT NULL
+                                AND NULLIF(btrim(s.নাম), '') IS NOT NULL
+                                AND voter_no_key(s.ভোটার_নং) IS NOT NULL) as is_valid
+                        FROM records_staging s
+                        JOIN files f ON f.batch_id = s.batch_id AND f.name = COALESCE(s.file_name, '')
+                        WHERE s.load_id = %(load_id)s
+                    ), unique_rows AS (
+                        SELECT DISTINCT ON (batch_id, voter_key) *
+                        FROM staged
+                        WHERE is_valid
+                        ORDER BY batch_id, voter_key, src_seq
+                    ), new_rows AS MATERIALIZED (
+                        -- Record ids are drawn here, in file order, so the profile rows can refer to them
+                        SELECT n.*, nextval(pg_get_serial_sequence('records', 'id')) as record_id
+                        FROM (
+                            SELECT u.*
+                            FROM unique_rows u
+                            WHERE NOT EXISTS (
+                                SELECT 1 FROM records r
+                                WHERE r.batch_id = u.batch_id AND voter_no_key(r.ভোটার_নং) = u.voter_key
+                            )
+                            ORDER BY u.src_seq
+                        ) n
+                    ), profiles AS (
+                        SELECT record_id,
+                               NULLIF(btrim(occupation_details), '') as occupation_details,
+                               CASE
+                                   WHEN NULLIF(btrim(whatsapp_number), '') IS NULL THEN NULL
+                                   WHEN starts_with(btrim(whatsapp_number), 'https://wa.me/') THEN btrim(whatsapp_number)
+                                   ELSE 'https://wa.me/' || btrim(whatsapp_number)
+                               END as whatsapp_number,
+                               NULLIF(btrim(facebook_link), '') as facebook_link,
+                               NULLIF(btrim(tiktok_link), '') as tiktok_link,
+                               NULLIF(btrim(youtube_link), '') as youtube_link,
+                               NULLIF(btrim(insta_link), '') as insta_link,
+                               NULLIF(NULLIF(btrim(photo_link), ''), %(default_photo)s) as photo_link,
+                               NULLIF(btrim(description), '') as description
+                        FROM new_rows
+                    ), inserted_profiles AS (
+                        INSERT INTO record_profiles (
+                            record_id, occupation_details, whatsapp_number, facebook_link, tiktok_link,
+                            youtube_link, insta_link, photo_link, description
+                        )
+                        SELECT * FROM profiles p
+                        WHERE num_nonnulls(p.occupation_details, p.whatsapp_number, p.facebook_link, p.tiktok_link,
+                                           p.youtube_link, p.insta_link, p.photo_link, p.description) > 0
+                        RETURNING 1
+                    ), inserted AS (
+                        INSERT INTO records (
+                            id, batch_id, file_id, ক্রমিক_নং, নাম, ভোটার_নং,
+                            পিতার_নাম, মাতার_নাম, পেশা, জন্ম_তারিখ, ঠিকানা,
+                            phone_number, political_status, relationship_status, gender, age
+                        )
+                        SELECT
+                            record_id, batch_id, file_id,
+                            btrim(ক্রমিক_নং), btrim(নাম), btrim(ভোটার_নং),
+                            NULLIF(btrim(পিতার_নাম), ''), NULLIF(btrim(মাতার_নাম), ''),
+                            NULLIF(btrim(পেশা), ''),
+                            NULLIF(btrim(জন্ম_তারিখ), ''), NULLIF(btrim(ঠিকানা), ''),
+                            CASE
+                                WHEN NULLIF(btrim(phone_number), '') IS NULL THEN NULL
+                                WHEN starts_with(btrim(phone_number), 'tel:') THEN btrim(phone_number)
+                                ELSE 'tel:' || btrim(phone_number)
+                            END,
+                            NULLIF(btrim(political_status), ''),
+                            COALESCE(NULLIF(btrim(relationship_status), ''), 'Regular'),
+                            CASE lower(btrim(gender))
+                                WHEN 'পুরুষ' THEN 'Male' WHEN 'male' THEN 'Male'
+                                WHEN 'মহিলা' THEN 'Female' WHEN 'female' THEN 'Female'
+                                WHEN 'অন্যান্য' THEN 'Other' WHEN 'other' THEN 'Other'
+                                ELSE NULLIF(btrim(gender), '')
+                            END,
+                            age
+                        FROM new_rows
+                        ORDER BY src_seq
+                        RETURNING 1
+                    ), rejected AS (
+                        INSERT INTO ingest_rejects (job_file_id, line_no, byte_offset, reason, detail, raw_text)
+                        SELECT
+                            %(job_file_id)s, s.src_line, s.src_offset,
+                            CASE
+                                WHEN NOT s.is_valid THEN 'invalid_required_fields'
+                                WHEN u.src_seq IS NULL THEN 'duplicate_voter_no_in_file'
+                                ELSE 'duplicate_voter_no_in_batch'
+                            END,
+                            'voter_no_key=' || COALESCE(s.voter_key, ''),
+                            concat_ws(' | ', s.ক্রমিক_নং, s.নাম, s.ভোটার_নং)
+                        FROM staged s
+                        LEFT JOIN unique_rows u ON u.src_seq = s.src_seq
+                        WHERE %(job_file_id)s IS NOT NULL
+                          AND NOT EXISTS (SELECT 1 FROM new_rows n WHERE n.src_seq = s.src_seq)
+                        RETURNING 1
+                    )
+                    SELECT
+                        (SELECT COUNT(*) FROM staged) as staged,
+                        (SELECT COUNT(*) FROM staged WHERE NOT is_valid) as invalid,
+                        (SELECT COUNT(*) FROM staged WHERE is_valid) - (SELECT COUNT(*) FROM unique_rows) as duplicate_in_file,
+                        (SELECT COUNT(*) FROM unique_rows) - (SELECT COUNT(*) FROM new_rows) as duplicate_in_batch,
+                        (SELECT COUNT(*) FROM inserted) as inserted,
+                        (SELECT COUNT(*) FROM inserted_profiles) as profiles,
+                        (SELECT COUNT(*) FROM rejected) as rejects_recorded
+                """, {'load_id': load_id, 'default_photo': DEFAULT_PHOTO_LINK, 'job_file_id': job_file_id})
+                result = dict(cur.fetchone())
+                cur.execute("""
+                    UPDATE files f
+                    SET record_count = (SELECT COUNT(*) FROM records r WHERE r.batch_id = f.batch_id AND r.file_id = f.id),
+                        content_hash = COALESCE(%(content_hash)s, f.content_hash),
+                        ingested_at = now()
+                    WHERE (f.batch_id, f.name) IN (
+                        SELECT batch_id, COALESCE(file_name, '') FROM records_staging WHERE load_id = %(load_id)s
+                    )
+                """, {'load_id': load_id, 'content_hash': content_hash})
+                cur.execute("DELETE FROM records_staging WHERE load_id = %s", (load_id,))
+                self.conn.commit()
+            except psycopg2.Error as e:
+                logger.error(f"Merging staged load '{load_id}' failed: {e}")
+                self.conn.rollback()
+                self.discard_staged_records(load_id)
+                raise
+        logger.info(f"Merged staged load '{load_id}': {result}")
+        return result
 
     def commit_changes(self):
         """Commits the current database transaction."""
@@ -310,26 +1505,29 @@ class Database:
         logger.warning("Database transaction rolled back.")
 
     def update_record(self, record_id, updated_data):
-        """Updates an existing record with new data, including age if provided."""
+        """
+        Updates an existing record with new data, including age if provided. Empty
+        profile fields are stored as NULL, and the profile row is deleted when none
+        of them is set.
+        """
         with self.conn.cursor() as cur:
-            whatsapp_number = updated_data.get('whatsapp_number')
-            if whatsapp_number and not str(whatsapp_number).startswith('https://wa.me/'):
+            whatsapp_number = profile_value(updated_data.get('whatsapp_number'))
+            if whatsapp_number and not whatsapp_number.startswith('https://wa.me/'):
                 whatsapp_number = f"https://wa.me/{whatsapp_number}"
             
             phone_number = updated_data.get('phone_number')
             if phone_number and not str(phone_number).startswith('tel:'):
                 phone_number = f"tel:{phone_number}"
 
-            photo_link = updated_data.get('photo_link')
-            if not photo_link or not photo_link.strip():
-                photo_link = 'https://placehold.co/100x100/EEE/31343C?text=No+Image'
+            photo_link = profile_value(updated_data.get('photo_link'))
+            if photo_link == DEFAULT_PHOTO_LINK:
+                photo_link = None
 
             query = """
                 UPDATE records SET
                     ক্রমিক_নং = %s, নাম = %s, ভোটার_নং = %s, পিতার_নাম = %s,
-                    মাতার_নাম = %s, পেশা = %s, occupation_details = %s, ঠিকানা = %s, জন্ম_তারিখ = %s,
-                    phone_number = %s, whatsapp_number = %s, facebook_link = %s, tiktok_link = %s, youtube_link = %s, insta_link = %s, photo_link = %s,
-                    description = %s, political_status = %s, relationship_status = %s,
+                    মাতার_নাম = %s, পেশা = %s, ঠিকানা = %s, জন্ম_তারিখ = %s,
+                    phone_number = %s, political_status = %s, relationship_status = %s,
                     gender = %s, age = %s
                 WHERE id = %s
             """
@@ -337,10 +1535,8 @@ class Database:
                 str(updated_data.get('ক্রমিক_নং', '')), str(updated_data.get('নাম', '')),
                 str(updated_data.get('ভোটার_নং', '')), str(updated_data.get('পিতার_নাম', '')),
                 str(updated_data.get('মাতার_নাম', '')), str(updated_data.get('পেশা', '')),
-                str(updated_data.get('occupation_details', '')), str(updated_data.get('ঠিকানা', '')), str(updated_data.get('জন্ম_তারিখ', '')),
-                phone_number, whatsapp_number, str(updated_data.get('facebook_link', '')),
-                str(updated_data.get('tiktok_link', '')), str(updated_data.get('youtube_link', '')), str(updated_data.get('insta_link', '')),
-                photo_link, str(updated_data.get('description', '')),
+                str(updated_data.get('ঠিকানা', '')), str(updated_data.get('জন্ম_তারিখ', '')),
+                phone_number,
                 str(updated_data.get('political_status', '')),
                 str(updated_data.get('relationship_status', 'Regular')),
                 str(updated_data.get('gender', '')),
@@ -348,52 +1544,157 @@ class Database:
                 record_id
             )
             cur.execute(query, values)
+            profile = (
+                profile_value(updated_data.get('occupation_details')), whatsapp_number,
+                profile_value(updated_data.get('facebook_link')), profile_value(updated_data.get('tiktok_link')),
+                profile_value(updated_data.get('youtube_link')), profile_value(updated_data.get('insta_link')),
+                photo_link, profile_value(updated_data.get('description'))
+            )
+            if any(profile):
+                cur.execute(f"""
+                    INSERT INTO record_profiles (record_id, {', '.join(PROFILE_COLUMNS)})
+                    VALUES (%s, {', '.join(['%s'] * len(PROFILE_COLUMNS))})
+                    ON CONFLICT (record_id) DO UPDATE SET
+                        {', '.join(f'{column} = EXCLUDED.{column}' for column in PROFILE_COLUMNS)}
+                """, (record_id,) + profile)
+            else:
+                cur.execute("DELETE FROM record_profiles WHERE record_id = %s", (record_id,))
+            self.assign_occupations(record_ids=[record_id])
+            self.assign_localities(record_ids=[record_id])
             self.conn.commit()
 
-    def search_records_advanced(self, criteria):
-        """Performs an advanced search for records based on multiple criteria."""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            query_parts = []
-            params = []
+    def build_search_filter(self, criteria):
+        """
+        Builds the WHERE clause for a search criteria dict, as used by the search page.
+        Returns (sql, params), where sql refers to the records table as `r` and is
+        empty when no criterion is set.
+        """
+        query_parts = []
+        params = []
+
+        # Handle 'নাম' and 'ভোটার_নং' with OR logic if both are provided
+        name_query = criteria.get('নাম')
+        voter_no_query = criteria.get('ভোটার_নং')
+
+        if name_query and voter_no_query and name_query == voter_no_query:
+            # If the same query is used for both, search either name OR voter_no
+            query_parts.append("(r.নাম ILIKE %s OR r.ভোটার_নং ILIKE %s)")
+            params.extend([f"%{name_query}%", f"%{voter_no_query}%"])
+        else:
+            # Otherwise, treat them as separate AND conditions or if only one is present
+            if name_query:
+                query_parts.append("r.নাম ILIKE %s")
+                params.append(f"%{name_query}%")
+            if voter_no_query:
+                query_parts.append("r.ভোটার_নং ILIKE %s")
+                params.append(f"%{voter_no_query}%")
 
-            # Handle 'নাম' and 'ভোটার_নং' with OR logic if both are provided
-            name_query = criteria.get('নাম')
-            voter_no_query = criteria.get('ভোটার_নং')
+        # Household filters: a household id, or households of at least this many members
+        household_id = criteria.get('household_id')
+        if household_id:
+            query_parts.append("(r.household_id = %s OR (r.id = %s AND r.household_id IS NULL))")
+            params.extend([int(household_id), int(household_id)])
+        min_household_size = criteria.get('min_household_size')
+        if min_household_size:
+            query_parts.append(f"""
+                (r.household_id IN (SELECT household_id FROM ({HOUSEHOLD_SIZES_SQL}) hs WHERE hs.size >= %s)
+                 OR (r.household_id IS NULL AND %s <= 1))
+            """)
+            params.extend([int(min_household_size), int(min_household_size)])
 
-            if name_query and voter_no_query and name_query == voter_no_query:
-                # If the same query is used for both, search either name OR voter_no
-                query_parts.append("(নাম ILIKE %s OR ভোটার_নং ILIKE %s)")
-                params.extend([f"%{name_query}%", f"%{voter_no_query}%"])
+        # Locality components (see assign_localities) are matched on the small localities
+        # table; records are then found through their indexed locality_id. Wards are
+        # compared as normalised numbers, the other components as substrings.
+        locality_conditions = []
+        for level in LOCALITY_LEVELS:
+            value = criteria.get(level)
+            if not value:
+                continue
+            if level == 'ward':
+                locality_conditions.append("l.ward = %s")
+                params.append(clean_component('ward', str(value)))
             else:
-                # Otherwise, treat them as separate AND conditions or if only one is present
-                if name_query:
-                    query_parts.append("নাম ILIKE %s")
-                    params.append(f"%{name_query}%")
-                if voter_no_query:
-                    query_parts.append("ভোটার_নং ILIKE %s")
-                    params.append(f"%{voter_no_query}%")
-
-            # Handle other criteria (e.g., gender) with AND logic
-            for field, value in criteria.items():
-                if field not in ['নাম', 'ভোটার_নং'] and value:
-                    if field == 'gender' and value != 'সব':
-                        query_parts.append(f"{field} = %s")
-                        params.append(value)
-                    elif field != 'gender':
-                        query_parts.append(f"{field} ILIKE %s")
-                        params.append(f"%{value}%")
-            
-            final_query = "SELECT r.*, b.name as batch_name FROM records r JOIN batches b ON r.batch_id = b.id"
-            if query_parts:
-                final_query += " WHERE " + " AND ".join(query_parts)
+                locality_conditions.append(f"l.{level} ILIKE %s")
+                params.append(f"%{str(value).strip()}%")
+        if locality_conditions:
+            query_parts.append(
+                f"r.locality_id IN (SELECT l.id FROM localities l WHERE {' AND '.join(locality_conditions)})"
+            )
+
+        # Exact matches, e.g. to address one file or one relationship list of a batch
+        for field in ('batch_id', 'file_id', 'relationship_status'):
+            if criteria.get(field):
+                query_parts.append(f"r.{field} = %s")
+                params.append(criteria[field])
+
+        # Handle other criteria (e.g., gender) with AND logic
+        for field, value in criteria.items():
+            if field not in ['নাম', 'ভোটার_নং', 'household_id', 'min_household_size', 'batch_id', 'file_id', 'relationship_status', *LOCALITY_LEVELS] and value:
+                if field == 'gender' and value != 'সব':
+                    query_parts.append(f"r.{field} = %s")
+                    params.append(value)
+                elif field != 'gender':
+                    query_parts.append(f"r.{field} ILIKE %s")
+                    params.append(f"%{value}%")
+
+        return " AND ".join(query_parts), params
+
+    def record_projection_sql(self, projection):
+        """
+        Returns (select list, FROM clause) over records aliased r for one of the
+        RECORD_PROJECTIONS. Batches, files, profiles and event names are joined only
+        for the projections that return them. Raises ValueError for an unknown name.
+        """
+        if projection not in RECORD_PROJECTIONS:
+            raise ValueError(f"Unknown record projection: {projection}")
+        from_sql = "records r"
+        if projection in ('card', 'full'):
+            from_sql += """
+                JOIN batches b ON r.batch_id = b.id
+                LEFT JOIN files f ON f.id = r.file_id
+                CROSS JOIN LATERAL (
+                    SELECT COALESCE(array_agg(e.name ORDER BY e.name), '{}') AS events
+                    FROM record_events re
+                    JOIN events e ON e.id = re.event_id
+                    WHERE re.record_id = r.id
+                ) ev
+            """
+        if projection in ('summary', 'full'):
+            from_sql += " LEFT JOIN record_profiles p ON p.record_id = r.id"
+        return RECORD_PROJECTIONS[projection], from_sql
+
+    def search_records_advanced(self, criteria, projection='card', compact=False):
+        """
+        Performs an advanced search for records based on multiple criteria. The card
+        and full projections also carry the household key and size of each record.
+        With `compact`, rows are returned as CompactRows instead of dicts.
+        """
+        where_sql, params = self.build_search_filter(criteria)
+        columns_sql, from_sql = self.record_projection_sql(projection)
+        with self.conn.cursor(cursor_factory=None if compact else RealDictCursor) as cur:
+            final_query = f"SELECT {columns_sql} FROM {from_sql}"
+            if projection in ('card', 'full'):
+                final_query = f"""
+                    WITH household_sizes AS ({HOUSEHOLD_SIZES_SQL})
+                    SELECT {columns_sql}, COALESCE(r.household_id, r.id) AS household_key,
+                           COALESCE(hs.size, 1) AS household_size
+                    FROM {from_sql}
+                    LEFT JOIN household_sizes hs ON hs.household_id = r.household_id
+                """
+            if where_sql:
+                final_query += " WHERE " + where_sql
             
             final_query += " ORDER BY r.id"
             
             cur.execute(final_query, params)
-            records = cur.fetchall()
-        for record in records:
-            record['events'] = self.get_events_for_record(record['id'])
-        return records
+            return compact_rows(cur) if compact else cur.fetchall()
+
+    def count_records_matching(self, criteria):
+        """Counts the records a search criteria dict matches, e.g. to preview a bulk update."""
+        where_sql, params = self.build_search_filter(criteria)
+        with self.conn.cursor() as cur:
+            cur.execute(f"SELECT COUNT(*) FROM records r {'WHERE ' + where_sql if where_sql else ''}", params)
+            return cur.fetchone()[0]
 
     def get_all_batches(self):
         """Retrieves all batches from the database."""
@@ -401,66 +1702,107 @@ class Database:
             cur.execute("SELECT * FROM batches ORDER BY created_at DESC")
             return cur.fetchall()
 
-    def get_batch_records(self, batch_id):
-        """Retrieves all records for a specific batch."""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT r.*, b.name as batch_name
-                FROM records r
-                JOIN batches b ON r.batch_id = b.id
+    def get_batch_records(self, batch_id, projection='card', compact=False):
+        """
+        Retrieves all records for a specific batch, with the columns of `projection`.
+        With `compact`, rows are returned as CompactRows instead of dicts.
+        """
+        columns_sql, from_sql = self.record_projection_sql(projection)
+        with self.conn.cursor(cursor_factory=None if compact else RealDictCursor) as cur:
+            cur.execute(f"""
+                SELECT {columns_sql}
+                FROM {from_sql}
                 WHERE r.batch_id = %s
                 ORDER BY r.id
             """, (batch_id,))
-            records = cur.fetchall()
-        for record in records:
-            record['events'] = self.get_events_for_record(record['id'])
-        return records
+            return compact_rows(cur) if compact else cur.fetchall()
+
+    def get_records_frame(self, batch_id, file_id=None, projection='card', chunk_size=10000):
+        """
+        Reads the records of a batch, or of one of its files, straight into a
+        DataFrame with one column per field of `projection`. Rows are streamed from
+        a server-side cursor in chunks and only kept as column lists, so no per-row
+        dicts are built.
+        """
+        columns_sql, from_sql = self.record_projection_sql(projection)
+        with self.conn.cursor(name='records_frame') as cur:
+            cur.itersize = chunk_size
+            cur.execute(f"""
+                SELECT {columns_sql}
+                FROM {from_sql}
+                WHERE r.batch_id = %s AND (%s::int IS NULL OR r.file_id = %s)
+                ORDER BY r.id
+            """, (batch_id, file_id, file_id))
+            columns = None
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if columns is None:
+                    names = [column.name for column in cur.description]
+                    columns = [[] for _ in names]
+                if not rows:
+                    break
+                for values, column_chunk in zip(columns, zip(*rows)):
+                    values.extend(column_chunk)
+        return pd.DataFrame(dict(zip(names, columns)), columns=names)
         
     def get_batch_files(self, batch_id):
-        """Get unique files in a batch"""
+        """Get the files of a batch with their record counts"""
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT DISTINCT file_name
-                FROM records
+                SELECT id, name as file_name, record_count, content_hash, ingested_at
+                FROM files
                 WHERE batch_id = %s
-                ORDER BY file_name
+                ORDER BY name
             """, (batch_id,))
             return cur.fetchall()
 
-    def get_file_records(self, batch_id, file_name):
-        """Get records for a specific file in a batch"""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT r.*, b.name as batch_name
-                FROM records r
-                JOIN batches b ON r.batch_id = b.id
-                WHERE r.batch_id = %s AND r.file_name = %s
+    def get_batch_record_counts(self):
+        """Record count of every batch, {batch_id: count}, summed from the files' record_count."""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT batch_id, SUM(record_count)::int FROM files GROUP BY batch_id")
+            return dict(cur.fetchall())
+
+    def get_file_records(self, batch_id, file_id, projection='card', compact=False):
+        """Get records for a specific file in a batch, with the columns of `projection` (CompactRows with `compact`)"""
+        columns_sql, from_sql = self.record_projection_sql(projection)
+        with self.conn.cursor(cursor_factory=None if compact else RealDictCursor) as cur:
+            cur.execute(f"""
+                SELECT {columns_sql}
+                FROM {from_sql}
+                WHERE r.batch_id = %s AND r.file_id = %s
                 ORDER BY r.id
-            """, (batch_id, file_name))
-            records = cur.fetchall()
-        for record in records:
-            record['events'] = self.get_events_for_record(record['id'])
-        return records
+            """, (batch_id, file_id))
+            return compact_rows(cur) if compact else cur.fetchall()
 
     def get_batch_occupation_stats(self, batch_id):
-        """Retrieves occupation statistics for a specific batch."""
+        """Retrieves canonical occupation statistics for a specific batch."""
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT পেশা, COUNT(*) as count
-                FROM records
-                WHERE batch_id = %s AND পেশা IS NOT NULL AND পেশা != ''
-                GROUP BY পেশা ORDER BY count DESC
+                SELECT o.name AS পেশা, s.count
+                FROM (
+                    SELECT occupation_id, COUNT(*) as count
+                    FROM records
+                    WHERE batch_id = %s AND occupation_id IS NOT NULL
+                    GROUP BY occupation_id
+                ) s
+                JOIN occupations o ON o.id = s.occupation_id
+                ORDER BY s.count DESC
             """, (batch_id,))
             return cur.fetchall()
 
     def get_occupation_stats(self):
-        """Retrieves overall occupation statistics across all batches."""
+        """Retrieves overall canonical occupation statistics across all batches."""
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT পেশা, COUNT(*) as count
-                FROM records
-                WHERE পেশা IS NOT NULL AND পেশা != ''
-                GROUP BY পেশা ORDER BY count DESC
+                SELECT o.name AS পেশা, s.count
+                FROM (
+                    SELECT occupation_id, COUNT(*) as count
+                    FROM records
+                    WHERE occupation_id IS NOT NULL
+                    GROUP BY occupation_id
+                ) s
+                JOIN occupations o ON o.id = s.occupation_id
+                ORDER BY s.count DESC
             """)
             return cur.fetchall()
 
@@ -487,20 +1829,70 @@ class Database:
             cur.execute("UPDATE records SET relationship_status = %s WHERE id = %s", (status, record_id))
             self.conn.commit()
 
-    def get_relationship_records(self, status: str):
-        """Retrieves all records with a specific relationship status, including their events."""
+    def build_record_selection(self, record_ids=None, criteria=None):
+        """
+        WHERE clause (sql, params) over records `r` for a bulk operation: the given
+        record ids, or every record matching a search criteria dict. Refuses an empty
+        criteria set so a bulk operation never silently applies to every record.
+        """
+        if record_ids is not None:
+            return "r.id = ANY(%s)", [list(record_ids)]
+        if criteria is not None:
+            where_sql, params = self.build_search_filter(criteria)
+            if not where_sql:
+                raise ValueError("A bulk update needs at least one search criterion.")
+            return where_sql, params
+        raise ValueError("Either record_ids or criteria is required.")
+
+    def update_relationship_status_bulk(self, status: str, record_ids=None, criteria=None):
+        """
+        Sets the relationship status of many records in one UPDATE: either the given
+        record ids or every record matching a search criteria dict (see
+        build_search_filter). Records already in that status are left untouched.
+        Returns the number of records changed.
+        """
+        if record_ids is not None and not record_ids:
+            return 0
+        where_sql, params = self.build_record_selection(record_ids, criteria)
+
+        with self.conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE records r SET relationship_status = %s
+                WHERE {where_sql} AND r.relationship_status IS DISTINCT FROM %s
+            """, [status] + params + [status])
+            updated = cur.rowcount
+            self.conn.commit()
+        logger.info(f"Set relationship status '{status}' on {updated} records.")
+        return updated
+
+    def get_relationship_records(self, status: str, batch_id=None, limit=None, offset=0, projection='card'):
+        """
+        Retrieves records with a specific relationship status, newest first, with the
+        columns of `projection`. Optionally restricted to one batch and to a page of
+        `limit` rows.
+        """
+        columns_sql, from_sql = self.record_projection_sql(projection)
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                SELECT {columns_sql}
+                FROM {from_sql}
+                WHERE r.relationship_status = %(status)s
+                  AND (%(batch_id)s::int IS NULL OR r.batch_id = %(batch_id)s)
+                ORDER BY r.created_at DESC, r.id DESC
+                LIMIT %(limit)s OFFSET %(offset)s
+            """, {'status': status, 'batch_id': batch_id, 'limit': limit, 'offset': offset})
+            return cur.fetchall()
+
+    def get_relationship_counts(self, batch_id=None):
+        """Returns {relationship_status: record count}, optionally for one batch, from one grouped query."""
+        with self.conn.cursor() as cur:
             cur.execute("""
-                SELECT r.*, b.name as batch_name
-                FROM records r
-                JOIN batches b ON r.batch_id = b.id
-                WHERE r.relationship_status = %s
-                ORDER BY r.created_at DESC
-            """, (status,))
-            records = cur.fetchall()
-        for record in records:
-            record['events'] = self.get_events_for_record(record['id'])
-        return records
+                SELECT relationship_status, COUNT(*)
+                FROM records
+                WHERE %(batch_id)s::int IS NULL OR batch_id = %(batch_id)s
+                GROUP BY relationship_status
+            """, {'batch_id': batch_id})
+            return dict(cur.fetchall())
 
     def get_batch_by_name(self, batch_name):
         """Retrieves batch information by its name."""
@@ -515,11 +1907,75 @@ class Database:
             return cur.fetchone()
 
     def delete_batch(self, batch_id: int):
-        """Deletes a batch and all its associated records."""
+        """
+        Deletes a batch and all its associated records. The batch's partition is
+        detached and dropped instead of deleting its rows one by one; profiles, event
+        assignments, family connections and link suggestions of its records are
+        deleted first, and households of other batches that lost members are refreshed.
+        """
         with self.conn.cursor() as cur:
-            cur.execute("DELETE FROM records WHERE batch_id = %s", (batch_id,))
+            cur.execute("""
+                DELETE FROM record_events re USING records r
+                WHERE r.batch_id = %(batch_id)s AND re.record_id = r.id
+            """, {'batch_id': batch_id})
+            cur.execute("""
+                DELETE FROM record_profiles p USING records r
+                WHERE r.batch_id = %(batch_id)s AND p.record_id = r.id
+            """, {'batch_id': batch_id})
+            # Records of other batches sharing a household with the batch, through family links
+            cur.execute("""
+                SELECT id FROM records
+                WHERE batch_id <> %(batch_id)s AND household_id IN (
+                    SELECT household_id FROM records WHERE batch_id = %(batch_id)s AND household_id IS NOT NULL)
+            """, {'batch_id': batch_id})
+            linked_ids = [row[0] for row in cur.fetchall()]
+            cur.execute("""
+                DELETE FROM family_connections fc USING records r
+                WHERE r.batch_id = %(batch_id)s AND r.id IN (fc.source_record_id, fc.target_record_id)
+            """, {'batch_id': batch_id})
+            cur.execute("""
+                DELETE FROM family_link_suggestions s USING records r
+                WHERE r.batch_id = %(batch_id)s AND r.id IN (s.child_record_id, s.parent_record_id)
+            """, {'batch_id': batch_id})
+            partition = f"records_batch_{int(batch_id)}"
+            cur.execute("SELECT to_regclass(%s)", (partition,))
+            if cur.fetchone()[0] is not None:
+                cur.execute(f"ALTER TABLE records DETACH PARTITION {partition}")
+                cur.execute(f"DROP TABLE {partition}")
+            else:
+                # Rows that landed in the default partition
+                cur.execute("DELETE FROM records WHERE batch_id = %s", (batch_id,))
             cur.execute("DELETE FROM batches WHERE id = %s", (batch_id,))
+            cur.execute("DELETE FROM analytics_cube WHERE batch_id = %s", (batch_id,))
+            cur.execute("DELETE FROM analytics_cube_batches WHERE batch_id = %s", (batch_id,))
+            # Only the households that lost members may split
+            self.refresh_households(linked_ids)
             self.conn.commit()
+        family_graph.invalidate()
+
+    def clear_all_data(self):
+        """
+        Deletes every batch, record and event, with their event assignments, family
+        connections, link suggestions and ingest jobs, by truncating the tables and
+        dropping the batch partitions.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT c.relname FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'records'::regclass AND c.relname <> 'records_default'
+            """)
+            partitions = [row[0] for row in cur.fetchall()]
+            cur.execute("""
+                TRUNCATE records, record_profiles, record_events, family_connections, family_link_suggestions, events, batches,
+                    analytics_cube, analytics_cube_batches
+                CASCADE
+            """)
+            for partition in partitions:
+                cur.execute(f"DROP TABLE {partition}")
+            self.conn.commit()
+        family_graph.invalidate()
+        logger.info(f"Cleared all data and dropped {len(partitions)} batch partitions.")
 
     def get_total_records_count(self):
         """Retrieves the total number of records in the database."""
@@ -546,10 +2002,12 @@ class Database:
     def get_record_by_id(self, record_id: int):
         """Retrieves a single record by its ID."""
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT r.*, b.name as batch_name
+            cur.execute(f"""
+                SELECT r.*, b.name as batch_name, f.name as file_name, {PROFILE_SELECT_SQL}
                 FROM records r
                 JOIN batches b ON r.batch_id = b.id
+                LEFT JOIN files f ON f.id = r.file_id
+                LEFT JOIN record_profiles p ON p.record_id = r.id
                 WHERE r.id = %s
             """, (record_id,))
             record = cur.fetchone()
@@ -557,13 +2015,29 @@ class Database:
                 record['events'] = self.get_events_for_record(record['id'])
             return record
 
+    def get_records_by_ids(self, record_ids):
+        """Retrieves the identifying fields of several records at once, keyed by record id."""
+        if not record_ids:
+            return {}
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT r.id, r.নাম, r.ভোটার_নং, r.পিতার_নাম, r.gender, r.age,
+                       COALESCE(p.photo_link, %s) AS photo_link
+                FROM records r
+                LEFT JOIN record_profiles p ON p.record_id = r.id
+                WHERE r.id = ANY(%s)
+            """, (DEFAULT_PHOTO_LINK, list(record_ids)))
+            return {record['id']: record for record in cur.fetchall()}
+
     def get_record_by_voter_no(self, voter_no: str):
         """Retrieves a single record by its voter number."""
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT r.*, b.name as batch_name
+            cur.execute(f"""
+                SELECT r.*, b.name as batch_name, f.name as file_name, {PROFILE_SELECT_SQL}
                 FROM records r
                 JOIN batches b ON r.batch_id = b.id
+                LEFT JOIN files f ON f.id = r.file_id
+                LEFT JOIN record_profiles p ON p.record_id = r.id
                 WHERE r.ভোটার_নং = %s
             """, (voter_no,))
             record = cur.fetchone()
@@ -573,59 +2047,1019 @@ class Database:
 
     def add_family_connection(self, source_record_id: int, target_record_id: int, relationship_to_source: str):
         """
-        Adds a family connection between two records.
-        This function adds a unidirectional relationship from source to target.
-        For bidirectional relationships (e.g., parent-child), call this function twice.
+        Adds a family link: `target_record_id` is the `relationship_to_source` of
+        `source_record_id`. The link is stored once; the relationship seen from the
+        target is derived from family_relationship_types when it is read.
+        Returns False if the link could not be saved or the two records are already linked.
         """
         with self.conn.cursor() as cur:
             try:
                 cur.execute("""
                     INSERT INTO family_connections (source_record_id, target_record_id, relationship_to_source)
                     VALUES (%s, %s, %s)
-                    ON CONFLICT (source_record_id, target_record_id, relationship_to_source) DO NOTHING
+                    ON CONFLICT DO NOTHING
                 """, (source_record_id, target_record_id, relationship_to_source))
+                if not cur.rowcount:
+                    self.conn.rollback()
+                    return False
+                self.merge_households(source_record_id, target_record_id)
                 self.conn.commit()
+                family_graph.add_connection(source_record_id, target_record_id, relationship_to_source)
                 return True
             except psycopg2.Error as e:
                 logger.error(f"Error adding family connection: {e}")
                 self.conn.rollback()
                 return False
 
+    def get_family_relationship_types(self):
+        """Retrieves {label: inverse_label} for all known family relationships."""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT label, inverse_label FROM family_relationship_types")
+            return dict(cur.fetchall())
+
     def get_family_connections_for_record(self, record_id: int):
         """
-        Retrieves all family connections for a given record.
-        Returns a list of dictionaries, each containing the connected record's details
-        and the relationship type to the source record.
+        Retrieves all family connections for a given record, whichever side of the
+        link it was saved on. Returns a list of dictionaries, each containing the
+        connected record's details and its relationship to the given record.
         """
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
                 SELECT
-                    fc.relationship_to_source,
-                    r.id, r.নাম, r.ভোটার_নং, r.পিতার_নাম, r.মাতার_নাম, r.photo_link, r.gender, r.age
-                FROM family_connections fc
-                JOIN records r ON fc.target_record_id = r.id
-                WHERE fc.source_record_id = %s
+                    links.relationship_to_source,
+                    r.id, r.নাম, r.ভোটার_নং, r.পিতার_নাম, r.মাতার_নাম, r.gender, r.age,
+                    COALESCE(p.photo_link, %(default_photo)s) AS photo_link
+                FROM (
+                    SELECT fc.target_record_id AS record_id, fc.relationship_to_source::text AS relationship_to_source
+                    FROM family_connections fc
+                    WHERE fc.source_record_id = %(record_id)s
+                    UNION ALL
+                    SELECT fc.source_record_id, COALESCE(rt.inverse_label, %(unknown)s)
+                    FROM family_connections fc
+                    LEFT JOIN family_relationship_types rt ON rt.label = fc.relationship_to_source
+                    WHERE fc.target_record_id = %(record_id)s
+                ) links
+                JOIN records r ON links.record_id = r.id
+                LEFT JOIN record_profiles p ON p.record_id = r.id
                 ORDER BY r.নাম
-            """, (record_id,))
+            """, {'record_id': record_id, 'unknown': UNKNOWN_INVERSE_RELATIONSHIP, 'default_photo': DEFAULT_PHOTO_LINK})
             return cur.fetchall()
 
-    def delete_family_connection(self, source_record_id: int, target_record_id: int, relationship_to_source: str):
-        """Deletes a specific unidirectional family connection."""
+    def get_family_tree(self, record_id: int, max_depth: int = 3):
+        """
+        Retrieves every family member reachable from a record within `max_depth`
+        connections, in a single recursive query. Links are followed in both
+        directions, and paths never revisit a record, so cycles terminate.
+
+        Each member appears once, reached by its shortest path. 'parent_id' is the
+        member it was reached from, 'relationship_to_source' the label of that last
+        connection, and 'relationship_path' the labels from the root record onwards.
+        """
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                WITH RECURSIVE tree AS (
+                    SELECT
+                        link.record_id AS member_id,
+                        %(record_id)s AS parent_id,
+                        1 AS depth,
+                        ARRAY[%(record_id)s, link.record_id] AS path_ids,
+                        ARRAY[link.relationship] AS relationship_path
+                    FROM (
+                        SELECT fc.target_record_id AS record_id, fc.relationship_to_source::text AS relationship
+                        FROM family_connections fc
+                        WHERE fc.source_record_id = %(record_id)s
+                        UNION ALL
+                        SELECT fc.source_record_id, COALESCE(rt.inverse_label, %(unknown)s)
+                        FROM family_connections fc
+                        LEFT JOIN family_relationship_types rt ON rt.label = fc.relationship_to_source
+                        WHERE fc.target_record_id = %(record_id)s
+                    ) link
+                    WHERE link.record_id <> %(record_id)s
+                    UNION ALL
+                    SELECT
+                        link.record_id,
+                        t.member_id,
+                        t.depth + 1,
+                        t.path_ids || link.record_id,
+                        t.relationship_path || link.relationship
+                    FROM tree t
+                    CROSS JOIN LATERAL (
+                        -- Links are stored once, so follow them in both directions
+                        SELECT fc.target_record_id AS record_id, fc.relationship_to_source::text AS relationship
+                        FROM family_connections fc
+                        WHERE fc.source_record_id = t.member_id
+                        UNION ALL
+                        SELECT fc.source_record_id, COALESCE(rt.inverse_label, %(unknown)s)
+                        FROM family_connections fc
+                        LEFT JOIN family_relationship_types rt ON rt.label = fc.relationship_to_source
+                        WHERE fc.target_record_id = t.member_id
+                    ) link
+                    WHERE t.depth < %(max_depth)s AND link.record_id <> ALL(t.path_ids)
+                )
+                SELECT DISTINCT ON (t.member_id)
+                    t.member_id AS id, t.parent_id, t.depth, t.path_ids, t.relationship_path,
+                    t.relationship_path[t.depth] AS relationship_to_source,
+                    r.নাম, r.ভোটার_নং, r.পিতার_নাম, r.মাতার_নাম, r.gender, r.age,
+                    COALESCE(p.photo_link, %(default_photo)s) AS photo_link
+                FROM tree t
+                JOIN records r ON r.id = t.member_id
+                LEFT JOIN record_profiles p ON p.record_id = r.id
+                ORDER BY t.member_id, t.depth, t.relationship_path
+            """, {'record_id': record_id, 'max_depth': max_depth, 'unknown': UNKNOWN_INVERSE_RELATIONSHIP,
+                  'default_photo': DEFAULT_PHOTO_LINK})
+            members = cur.fetchall()
+        return sorted(members, key=lambda member: (member['depth'], member['নাম'] or ''))
+
+    def delete_family_connection(self, record_a_id: int, record_b_id: int):
+        """Deletes the family link between two records, whichever direction it was saved in."""
         with self.conn.cursor() as cur:
             try:
                 cur.execute("""
                     DELETE FROM family_connections
-                    WHERE source_record_id = %s AND target_record_id = %s AND relationship_to_source = %s
-                """, (source_record_id, target_record_id, relationship_to_source))
+                    WHERE (source_record_id = %(a)s AND target_record_id = %(b)s)
+                       OR (source_record_id = %(b)s AND target_record_id = %(a)s)
+                    RETURNING source_record_id, target_record_id, relationship_to_source
+                """, {'a': record_a_id, 'b': record_b_id})
+                deleted = cur.fetchall()
+                self.refresh_households([record_a_id, record_b_id])
                 self.conn.commit()
+                for source_id, target_id, relationship in deleted:
+                    family_graph.remove_connection(source_id, target_id, relationship)
                 return True
             except psycopg2.Error as e:
                 logger.error(f"Error deleting family connection: {e}")
                 self.conn.rollback()
                 return False
 
+    def get_all_family_connections(self):
+        """Retrieves every family connection as (source_record_id, target_record_id, relationship_to_source) tuples."""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT source_record_id, target_record_id, relationship_to_source FROM family_connections")
+            return cur.fetchall()
+
     def get_all_voters_for_search(self):
-        """Retrieves a minimal set of voter data for search/selection dropdowns."""
+        """Retrieves the summary projection of every voter for search/selection dropdowns."""
+        columns_sql, from_sql = self.record_projection_sql('summary')
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"SELECT {columns_sql} FROM {from_sql} ORDER BY r.নাম")
+            return cur.fetchall()
+
+    # --- Family Link Suggestions ---
+    def generate_family_link_suggestions(self, batch_id=None, min_score=0.3):
+        """
+        Finds likely parents for voters by matching their পিতার_নাম / মাতার_নাম against
+        the নাম of other voters in the same batch, in one set-based statement over the
+        voter_name_key index. Candidates are scored on a shared address, the expected
+        gender and a plausible age gap, and the score is divided by the number of
+        candidates for the same parent so ambiguous names rank low.
+
+        Pairs that are already connected are skipped, and reviewed suggestions are
+        left as they are. Returns the number of suggestions added or rescored.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                WITH wanted AS (
+                    SELECT r.id AS child_id, r.batch_id, r.age AS child_age, address_key(r.ঠিকানা) AS address,
+                           'পিতা' AS relationship, voter_name_key(r.পিতার_নাম) AS name_key,
+                           ARRAY['male', 'পুরুষ'] AS parent_genders
+                    FROM records r
+                    WHERE (%(batch_id)s::int IS NULL OR r.batch_id = %(batch_id)s::int)
+                      AND voter_name_key(r.পিতার_নাম) IS NOT NULL
+                    UNION ALL
+                    SELECT r.id, r.batch_id, r.age, address_key(r.ঠিকানা),
+                           'মাতা', voter_name_key(r.মাতার_নাম),
+                           ARRAY['female', 'মহিলা']
+                    FROM records r
+                    WHERE (%(batch_id)s::int IS NULL OR r.batch_id = %(batch_id)s::int)
+                      AND voter_name_key(r.মাতার_নাম) IS NOT NULL
+                ),
+                candidates AS (
+                    SELECT
+                        w.child_id, p.id AS parent_id, w.relationship,
+                        COALESCE(address_key(p.ঠিকানা) = w.address, FALSE) AS same_address,
+                        p.gender IS NOT NULL AS gender_known,
+                        p.age - w.child_age AS age_gap
+                    FROM wanted w
+                    JOIN records p ON p.batch_id = w.batch_id AND voter_name_key(p.নাম) = w.name_key
+                    WHERE p.id <> w.child_id
+                      AND (p.gender IS NULL OR lower(p.gender) = ANY(w.parent_genders))
+                      AND (p.age IS NULL OR w.child_age IS NULL OR p.age - w.child_age BETWEEN 12 AND 70)
+                ),
+                scored AS (
+                    SELECT
+                        c.*,
+                        COUNT(*) OVER (PARTITION BY c.child_id, c.relationship) AS candidate_count,
+                        (0.4
+                         + CASE WHEN c.same_address THEN 0.3 ELSE 0 END
+                         + CASE WHEN c.gender_known THEN 0.1 ELSE 0 END
+                         + CASE WHEN c.age_gap BETWEEN 16 AND 50 THEN 0.2 WHEN c.age_gap IS NOT NULL THEN 0.1 ELSE 0 END
+                        ) / COUNT(*) OVER (PARTITION BY c.child_id, c.relationship) AS score
+                    FROM candidates c
+                )
+                INSERT INTO family_link_suggestions
+                    (child_record_id, parent_record_id, relationship, score, same_address, age_gap, candidate_count)
+                SELECT s.child_id, s.parent_id, s.relationship, s.score, s.same_address, s.age_gap, s.candidate_count
+                FROM scored s
+                WHERE s.score >= %(min_score)s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM family_connections fc
+                      WHERE (fc.source_record_id = s.child_id AND fc.target_record_id = s.parent_id)
+                         OR (fc.source_record_id = s.parent_id AND fc.target_record_id = s.child_id)
+                  )
+                ON CONFLICT (child_record_id, parent_record_id, relationship) DO UPDATE
+                SET score = EXCLUDED.score, same_address = EXCLUDED.same_address,
+                    age_gap = EXCLUDED.age_gap, candidate_count = EXCLUDED.candidate_count
+                WHERE family_link_suggestions.status = 'pending'
+            """, {'batch_id': batch_id, 'min_score': min_score})
+            count = cur.rowcount
+        self.conn.commit()
+        logger.info(f"Generated {count} family link suggestions (batch {batch_id}).")
+        return count
+
+    def get_family_link_suggestions(self, batch_id=None, status='pending', limit=50, offset=0):
+        """Retrieves suggestions with both voters' details, best scores first."""
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT
+                    s.id, s.relationship, s.score, s.same_address, s.age_gap, s.candidate_count, s.status,
+                    c.id AS child_id, c.নাম AS child_name, c.ভোটার_নং AS child_voter_no,
+                    c.পিতার_নাম AS child_father_name, c.মাতার_নাম AS child_mother_name, c.ঠিকানা AS child_address,
+                    p.id AS parent_id, p.নাম AS parent_name, p.ভোটার_নং AS parent_voter_no,
+                    p.ঠিকানা AS parent_address, p.age AS parent_age
+                FROM family_link_suggestions s
+                JOIN records c ON c.id = s.child_record_id
+                JOIN records p ON p.id = s.parent_record_id
+                WHERE s.status = %(status)s AND (%(batch_id)s::int IS NULL OR c.batch_id = %(batch_id)s::int)
+                ORDER BY s.score DESC, s.id
+                LIMIT %(limit)s OFFSET %(offset)s
+            """, {'batch_id': batch_id, 'status': status, 'limit': limit, 'offset': offset})
+            return cur.fetchall()
+
+    def count_family_link_suggestions(self, batch_id=None, status='pending'):
+        """Counts suggestions with the given status, optionally for one batch."""
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT COUNT(*)
+                FROM family_link_suggestions s
+                JOIN records c ON c.id = s.child_record_id
+                WHERE s.status = %s AND (%s::int IS NULL OR c.batch_id = %s::int)
+            """, (status, batch_id, batch_id))
+            return cur.fetchone()[0]
+
+    def accept_family_link_suggestions(self, suggestion_ids):
+        """
+        Turns pending suggestions into family connections in one transaction, each
+        stored as a single child → parent link with the suggested relationship.
+        Suggestions whose pair is already linked (or covered by another selected
+        suggestion) create no connection and are marked rejected instead.
+        Returns the number of connections created.
+        """
+        if not suggestion_ids:
+            return 0
+        with self.conn.cursor() as cur:
+            try:
+                cur.execute("""
+                    UPDATE family_link_suggestions
+                    SET status = 'accepted', reviewed_at = CURRENT_TIMESTAMP
+                    WHERE id = ANY(%s) AND status = 'pending'
+                    RETURNING id, child_record_id, parent_record_id, relationship
+                """, (list(suggestion_ids),))
+                accepted = sorted(cur.fetchall())
+                connections = [(child, parent, relationship) for _, child, parent, relationship in accepted]
+                inserted = execute_values(cur, """
+                    INSERT INTO family_connections (source_record_id, target_record_id, relationship_to_source)
+                    VALUES %s
+                    ON CONFLICT DO NOTHING
+                    RETURNING source_record_id, target_record_id, relationship_to_source
+                """, connections, fetch=True) if connections else []
+                # The first suggestion of each inserted pair keeps 'accepted'
+                created = {(source_id, target_id) for source_id, target_id, _ in inserted}
+                rejected = []
+                for suggestion_id, child_id, parent_id, _ in accepted:
+                    if (child_id, parent_id) in created:
+                        created.discard((child_id, parent_id))
+                    else:
+                        rejected.append(suggestion_id)
+                if rejected:
+                    cur.execute("""
+                        UPDATE family_link_suggestions SET status = 'rejected'
+                        WHERE id = ANY(%s)
+                    """, (rejected,))
+                for source_id, target_id, _ in inserted:
+                    self.merge_households(source_id, target_id)
+                self.conn.commit()
+            except psycopg2.Error as e:
+                logger.error(f"Error accepting family link suggestions: {e}")
+                self.conn.rollback()
+                raise
+        if rejected:
+            logger.info(f"Rejected {len(rejected)} family link suggestions for pairs that were already linked.")
+        for source_id, target_id, relationship in inserted:
+            family_graph.add_connection(source_id, target_id, relationship)
+        return len(inserted)
+
+    def reject_family_link_suggestions(self, suggestion_ids):
+        """Marks pending suggestions as rejected so they are not suggested again."""
+        if not suggestion_ids:
+            return 0
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE family_link_suggestions
+                SET status = 'rejected', reviewed_at = CURRENT_TIMESTAMP
+                WHERE id = ANY(%s) AND status = 'pending'
+            """, (list(suggestion_ids),))
+            count = cur.rowcount
+        self.conn.commit()
+        return count
+
+    # --- Households ---
+    def save_household_assignments(self, assignments):
+        """
+        Writes {record_id: household_id} to records, touching only rows whose household
+        changed. Part of the caller's transaction; does not commit.
+        Returns the number of records updated.
+        """
+        if not assignments:
+            return 0
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS household_updates (
+                    record_id INTEGER PRIMARY KEY,
+                    household_id INTEGER NOT NULL
+                ) ON COMMIT DELETE ROWS
+            """)
+            cur.execute("DELETE FROM household_updates")
+            execute_values(cur, "INSERT INTO household_updates (record_id, household_id) VALUES %s",
+                           list(assignments.items()), page_size=10000)
+            cur.execute("""
+                UPDATE records r
+                SET household_id = u.household_id
+                FROM household_updates u
+                WHERE r.id = u.record_id AND r.household_id IS DISTINCT FROM u.household_id
+            """)
+            return cur.rowcount
+
+    def rebuild_households(self):
+        """
+        Recomputes every household from scratch: connected components over family
+        links, merged with same-batch exact normalised-address matches (see
+        utils.households). Commits and returns the number of records whose
+        household changed.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT id, batch_id, address_key(ঠিকানা) FROM records")
+            records = cur.fetchall()
+            cur.execute("SELECT source_record_id, target_record_id FROM family_connections")
+            links = cur.fetchall()
+        changed = self.save_household_assignments(compute_households(records, links))
+        self.conn.commit()
+        logger.info(f"Rebuilt households for {len(records)} records; {changed} changed.")
+        return changed
+
+    def merge_households(self, record_a_id, record_b_id):
+        """
+        Joins the households of two newly linked records under the smaller household id.
+        Part of the caller's transaction; does not commit.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                WITH linked AS (
+                    SELECT id, COALESCE(household_id, id) AS household_id
+                    FROM records
+                    WHERE id IN (%(a)s, %(b)s)
+                )
+                UPDATE records
+                SET household_id = (SELECT MIN(household_id) FROM linked)
+                WHERE (household_id IN (SELECT household_id FROM linked) OR id IN (SELECT id FROM linked))
+                  AND household_id IS DISTINCT FROM (SELECT MIN(household_id) FROM linked)
+            """, {'a': record_a_id, 'b': record_b_id})
+
+    def refresh_households(self, record_ids):
+        """
+        Recomputes the households containing `record_ids` and the records now linked
+        to them (same-batch address matches and family connections), e.g. for newly
+        inserted records, or after a family link was removed or a batch was dropped
+        and a household may have split. Only members of those households are loaded.
+        Part of the caller's transaction; does not commit. Returns the number of
+        records whose household changed.
+        """
+        record_ids = list(record_ids)
+        if not record_ids:
+            return 0
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                WITH seeds AS (
+                    SELECT id, batch_id, address_key(ঠিকানা) AS address FROM records WHERE id = ANY(%(ids)s)
+                ), touched AS (
+                    SELECT id FROM seeds
+                    UNION SELECT r.id FROM records r
+                          JOIN seeds s ON r.batch_id = s.batch_id AND address_key(r.ঠিকানা) = s.address
+                    UNION SELECT fc.target_record_id FROM family_connections fc JOIN seeds s ON fc.source_record_id = s.id
+                    UNION SELECT fc.source_record_id FROM family_connections fc JOIN seeds s ON fc.target_record_id = s.id
+                )
+                SELECT id, batch_id, address_key(ঠিকানা)
+                FROM records
+                WHERE id IN (SELECT id FROM touched)
+                   OR household_id IN (SELECT r.household_id FROM records r JOIN touched t ON t.id = r.id)
+            """, {'ids': record_ids})
+            members = cur.fetchall()
+            member_ids = [member[0] for member in members]
+            cur.execute("""
+                SELECT source_record_id, target_record_id
+                FROM family_connections
+                WHERE source_record_id = ANY(%(ids)s) AND target_record_id = ANY(%(ids)s)
+            """, {'ids': member_ids})
+            links = cur.fetchall()
+            # Sizes of the loaded address groups over all their records, not only the loaded ones
+            cur.execute("""
+                SELECT batch_id, address_key(ঠিকানা), COUNT(*)
+                FROM records
+                WHERE batch_id = ANY(%(batches)s) AND address_key(ঠিকানা) = ANY(%(addresses)s)
+                GROUP BY 1, 2
+            """, {'batches': list({member[1] for member in members}),
+                  'addresses': list({member[2] for member in members if member[2]})})
+            sizes = {(batch_id, address): size for batch_id, address, size in cur.fetchall()}
+        changed = self.save_household_assignments(compute_households(members, links, address_group_sizes=sizes))
+        logger.info(f"Refreshed households of {len(members)} records; {changed} changed.")
+        return changed
+
+    def assign_new_households(self, batch_id):
+        """
+        Groups the records of a batch that have no household yet, i.e. were just
+        inserted, with their address matches and linked records. Part of the
+        caller's transaction; does not commit. Returns the number of records whose
+        household changed.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT id FROM records WHERE batch_id = %s AND household_id IS NULL", (batch_id,))
+            record_ids = [row[0] for row in cur.fetchall()]
+        return self.refresh_households(record_ids)
+
+    def get_household_members(self, household_id):
+        """Retrieves all records of a household."""
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT r.id, r.নাম, r.ভোটার_নং, r.পিতার_নাম, r.ঠিকানা, r.gender, r.age, b.name as batch_name
+                FROM records r
+                JOIN batches b ON r.batch_id = b.id
+                WHERE r.household_id = %s OR (r.id = %s AND r.household_id IS NULL)
+                ORDER BY r.age DESC NULLS LAST, r.id
+            """, (household_id, household_id))
+            return cur.fetchall()
+
+    def get_household_stats(self, batch_id=None):
+        """
+        Household counts, optionally limited to the records of one batch. Records that
+        were never grouped count as single-member households.
+        Returns (summary dict, [{'size', 'households'}, ...] size distribution).
+        """
+        household_sizes = """
+            WITH sizes AS (
+                SELECT COALESCE(household_id, id) AS household_id, COUNT(*) AS size
+                FROM records
+                WHERE %s::int IS NULL OR batch_id = %s::int
+                GROUP BY 1
+            )
+        """
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(household_sizes + """
+                SELECT COUNT(*) AS households,
+                       COALESCE(SUM(size), 0)::int AS records,
+                       COALESCE(ROUND(AVG(size), 2), 0)::float AS avg_size,
+                       COALESCE(MAX(size), 0) AS largest,
+                       COUNT(*) FILTER (WHERE size > 1) AS multi_member
+                FROM sizes
+            """, (batch_id, batch_id))
+            summary = cur.fetchone()
+            cur.execute(household_sizes + """
+                SELECT size, COUNT(*) AS households
+                FROM sizes
+                GROUP BY size
+                ORDER BY size
+            """, (batch_id, batch_id))
+            return summary, cur.fetchall()
+
+    # --- Occupations ---
+    def assign_occupations(self, batch_id=None, record_ids=None, rematch=False):
+        """
+        Sets records.occupation_id from পেশা for all records, one batch's or the
+        given ones. Only distinct values not matched before go through
+        OccupationMatcher; their matches are kept in occupation_aliases and the
+        records are then updated in one statement. With `rematch`, earlier matches
+        are forgotten and occupations no longer used by any record are removed.
+        Part of the caller's transaction; does not commit. Returns the number of
+        records whose occupation changed.
+        """
+        scope, params = "TRUE", {}
+        if record_ids is not None:
+            scope, params = "r.id = ANY(%(ids)s)", {'ids': list(record_ids)}
+        elif batch_id is not None:
+            scope, params = "r.batch_id = %(batch_id)s", {'batch_id': batch_id}
+        with self.conn.cursor() as cur:
+            if rematch:
+                cur.execute(f"""
+                    DELETE FROM occupation_aliases a USING records r
+                    WHERE a.value = btrim(r.পেশা) AND {scope}
+                """, params)
+            cur.execute(f"""
+                SELECT DISTINCT btrim(r.পেশা) FROM records r
+                WHERE {scope} AND btrim(r.পেশা) <> ''
+                  AND NOT EXISTS (SELECT 1 FROM occupation_aliases a WHERE a.value = btrim(r.পেশা))
+            """, params)
+            values = [row[0] for row in cur.fetchall()]
+            if values:
+                cur.execute("SELECT name FROM occupations WHERE curated OR id IN (SELECT occupation_id FROM occupation_aliases)")
+                matcher = OccupationMatcher(row[0] for row in cur.fetchall())
+                matches = {value: matcher.match(value) for value in values}
+                execute_values(cur, "INSERT INTO occupations (name) VALUES %s ON CONFLICT (name) DO NOTHING",
+                               [(name,) for name in set(matches.values())])
+                execute_values(cur, """
+                    INSERT INTO occupation_aliases (value, occupation_id)
+                    SELECT v.value, o.id FROM (VALUES %s) AS v(value, name)
+                    JOIN occupations o ON o.name = v.name
+                """, list(matches.items()))
+            cur.execute(f"""
+                UPDATE records r SET occupation_id = a.occupation_id
+                FROM occupation_aliases a
+                WHERE a.value = btrim(r.পেশা) AND {scope}
+                  AND r.occupation_id IS DISTINCT FROM a.occupation_id
+            """, params)
+            changed = cur.rowcount
+            # Records whose পেশা was cleared
+            cur.execute(f"""
+                UPDATE records r SET occupation_id = NULL
+                WHERE {scope} AND r.occupation_id IS NOT NULL AND COALESCE(btrim(r.পেশা), '') = ''
+            """, params)
+            changed += cur.rowcount
+            if rematch:
+                cur.execute("""
+                    DELETE FROM occupations o
+                    WHERE NOT o.curated
+                      AND NOT EXISTS (SELECT 1 FROM occupation_aliases a WHERE a.occupation_id = o.id)
+                      AND NOT EXISTS (SELECT 1 FROM records r WHERE r.occupation_id = o.id)
+                """)
+        logger.info(f"Assigned occupations: {len(values)} new values, {changed} records changed.")
+        return changed
+
+    # --- Localities ---
+    def assign_localities(self, batch_id=None, record_ids=None, reparse=False):
+        """
+        Sets records.locality_id from ঠিকানা for all records, one batch's or the
+        given ones. Only distinct addresses not parsed before go through
+        parse_address; the results are kept in address_localities and the records
+        are then updated in one statement. With `reparse`, earlier parses of the
+        addresses in scope are forgotten and localities no longer used are removed.
+        Part of the caller's transaction; does not commit. Returns the number of
+        records whose locality changed.
+        """
+        scope, params = "TRUE", {}
+        if record_ids is not None:
+            scope, params = "r.id = ANY(%(ids)s)", {'ids': list(record_ids)}
+        elif batch_id is not None:
+            scope, params = "r.batch_id = %(batch_id)s", {'batch_id': batch_id}
+        with self.conn.cursor() as cur:
+            if reparse:
+                cur.execute(f"""
+                    DELETE FROM address_localities a USING records r
+                    WHERE a.address = btrim(r.ঠিকানা) AND {scope}
+                """, params)
+            cur.execute(f"""
+                SELECT DISTINCT btrim(r.ঠিকানা) FROM records r
+                WHERE {scope} AND btrim(r.ঠিকানা) <> ''
+                  AND NOT EXISTS (SELECT 1 FROM address_localities a WHERE a.address = btrim(r.ঠিকানা))
+            """, params)
+            addresses = [row[0] for row in cur.fetchall()]
+            if addresses:
+                parsed = {address: parse_address(address) for address in addresses}
+                localities = {}
+                for components in parsed.values():
+                    key = locality_key(components)
+                    if key is not None:
+                        localities.setdefault(key, components)
+                if localities:
+                    execute_values(cur, f"""
+                        INSERT INTO localities (locality_key, {', '.join(LOCALITY_LEVELS)}) VALUES %s
+                        ON CONFLICT (locality_key) DO NOTHING
+                    """, [(key,) + tuple(components[level] for level in LOCALITY_LEVELS)
+                          for key, components in localities.items()])
+                execute_values(cur, """
+                    INSERT INTO address_localities (address, locality_id)
+                    SELECT v.address, l.id FROM (VALUES %s) AS v(address, locality_key)
+                    LEFT JOIN localities l ON l.locality_key = v.locality_key
+                """, [(address, locality_key(components)) for address, components in parsed.items()])
+            cur.execute(f"""
+                UPDATE records r SET locality_id = a.locality_id
+                FROM address_localities a
+                WHERE a.address = btrim(r.ঠিকানা) AND {scope}
+                  AND r.locality_id IS DISTINCT FROM a.locality_id
+            """, params)
+            changed = cur.rowcount
+            # Records whose ঠিকানা was cleared
+            cur.execute(f"""
+                UPDATE records r SET locality_id = NULL
+                WHERE {scope} AND r.locality_id IS NOT NULL AND COALESCE(btrim(r.ঠিকানা), '') = ''
+            """, params)
+            changed += cur.rowcount
+            if reparse:
+                cur.execute("""
+                    DELETE FROM localities l
+                    WHERE NOT EXISTS (SELECT 1 FROM address_localities a WHERE a.locality_id = l.id)
+                      AND NOT EXISTS (SELECT 1 FROM records r WHERE r.locality_id = l.id)
+                """)
+        logger.info(f"Assigned localities: {len(addresses)} new addresses, {changed} records changed.")
+        return changed
+
+    # --- Analytics Snapshot ---
+    def get_batch_generations(self):
+        """Returns {batch_id: generation} for every batch; see create_generation_triggers."""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT id, generation FROM batches")
+            return dict(cur.fetchall())
+
+    def get_analytics_rows(self, batch_ids):
+        """
+        (id, *ANALYTICS_FIELDS) tuples of the records of `batch_ids`, with the
+        occupation name in place of its id and the LOCALITY_LEVELS in place of the
+        locality id, ordered by batch and id, for the analytics snapshot.
+        """
+        with self.conn.cursor() as cur:
+            # The snapshot keeps occupation names and locality components, not ids
+            joined = {'occupation_id': 'o.name', 'locality_id': ', '.join(f'l.{level}' for level in LOCALITY_LEVELS)}
+            fields = [joined.get(field, f'r.{field}') for field in ANALYTICS_FIELDS]
+            cur.execute(f"""
+                SELECT r.id, {', '.join(fields)}
+                FROM records r
+                LEFT JOIN occupations o ON o.id = r.occupation_id
+                LEFT JOIN localities l ON l.id = r.locality_id
+                WHERE r.batch_id = ANY(%s)
+                ORDER BY r.batch_id, r.id
+            """, (list(batch_ids),))
+            return cur.fetchall()
+
+    def get_analytics_event_links(self, batch_ids):
+        """(record_id, event_id) pairs of the records of `batch_ids`."""
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT re.record_id, re.event_id
+                FROM record_events re
+                JOIN records r ON r.id = re.record_id
+                WHERE r.batch_id = ANY(%s)
+            """, (list(batch_ids),))
+            return cur.fetchall()
+
+    # --- Analytics Cube ---
+    def _stale_cube_batches(self, cur):
+        """({batch_id: generation} of batches whose cube rows are missing or outdated, [deleted batch ids])."""
+        cur.execute("""
+            SELECT b.id, b.generation FROM batches b
+            LEFT JOIN analytics_cube_batches c ON c.batch_id = b.id
+            WHERE c.generation IS DISTINCT FROM b.generation
+        """)
+        stale = dict(cur.fetchall())
+        cur.execute("""
+            SELECT c.batch_id FROM analytics_cube_batches c
+            WHERE NOT EXISTS (SELECT 1 FROM batches b WHERE b.id = c.batch_id)
+        """)
+        return stale, [row[0] for row in cur.fetchall()]
+
+    def refresh_analytics_cube(self):
+        """
+        Re-aggregates the analytics cube rows of the batches whose generation changed
+        since they were last aggregated (see create_generation_triggers) and drops
+        those of deleted batches; unchanged batches are left alone. Returns the
+        number of batches re-aggregated.
+        """
+        with self.conn.cursor() as cur:
+            stale, removed = self._stale_cube_batches(cur)
+            if not stale and not removed:
+                return 0
+            # Concurrent refreshes wait for each other and then find less to do; reads are not blocked
+            cur.execute("LOCK TABLE analytics_cube_batches IN SHARE ROW EXCLUSIVE MODE")
+            stale, removed = self._stale_cube_batches(cur)
+            changed = list(stale) + removed
+            cur.execute("DELETE FROM analytics_cube WHERE batch_id = ANY(%s)", (changed,))
+            cur.execute("DELETE FROM analytics_cube_batches WHERE batch_id = ANY(%s)", (changed,))
+            # The generations were read first, so a write committed meanwhile leaves the batch stale
+            cur.execute("""
+                INSERT INTO analytics_cube (batch_id, gender, age, relationship_status, occupation_id, locality_id, record_count)
+                SELECT batch_id, NULLIF(gender, ''), age, NULLIF(relationship_status, ''), occupation_id, locality_id, COUNT(*)
+                FROM records
+                WHERE batch_id = ANY(%s)
+                GROUP BY 1, 2, 3, 4, 5, 6
+            """, (list(stale),))
+            if stale:
+                execute_values(cur, "INSERT INTO analytics_cube_batches (batch_id, generation) VALUES %s",
+                               list(stale.items()))
+            self.conn.commit()
+        logger.info(f"Analytics cube: refreshed {len(stale)} batches, dropped {len(removed)}.")
+        return len(stale)
+
+    def get_analytics_rollup(self, dimensions, batch_ids=None, genders=None, age_range=None,
+                             occupations=None, relationship_statuses=None, localities=None):
+        """
+        Rolls the analytics cube up to record counts per combination of `dimensions`
+        (names from CUBE_DIMENSIONS; none gives the total). Filters left as None or
+        empty match everything; `age_range` is an inclusive (min, max) and excludes
+        records without an age, and `localities` maps LOCALITY_LEVELS to values. Returns dict rows with the dimensions and 'count',
+        largest groups first. Call refresh_analytics_cube first to include recent writes.
+        """
+        unknown = [name for name in dimensions if name not in CUBE_DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown analytics dimensions: {unknown}")
+        conditions, params = [], []
+        filters = [('batch_id', batch_ids), ('gender', genders), ('o.name', occupations),
+                   ('relationship_status', relationship_statuses)]
+        filters += [(f"l.{level}", values) for level, values in (localities or {}).items() if level in LOCALITY_LEVELS]
+        for column, values in filters:
+            if values:
+                conditions.append(f"{column} = ANY(%s)")
+                params.append(list(values))
+        if age_range is not None:
+            conditions.append("age BETWEEN %s AND %s")
+            params.extend(age_range)
+        columns = [f"{CUBE_DIMENSIONS[name]} AS {name}" for name in dimensions]
+        query = f"SELECT {', '.join(columns + ['COALESCE(SUM(record_count), 0) AS count'])} FROM {CUBE_FROM_SQL}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if dimensions:
+            # Occupations are grouped by their integer key rather than the name
+            group_by = ', '.join('o.id' if name == 'occupation' else str(i) for i, name in enumerate(dimensions, 1))
+            positions = ', '.join(str(i) for i in range(1, len(dimensions) + 1))
+            query += f" GROUP BY {group_by} ORDER BY count DESC, {positions}"
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+    # --- Ingestion Jobs ---
+    def create_ingest_job(self, batch_id, staging_dir, staged_files, default_gender=None):
+        """
+        Queues a background ingest job for files already staged on disk.
+        `staged_files` is a list of (file_name, staged_path) tuples. Returns the new job ID.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO ingest_jobs (batch_id, default_gender, staging_dir, total_files)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+            """, (batch_id, default_gender, staging_dir, len(staged_files)))
+            job_id = cur.fetchone()[0]
+            execute_values(
+                cur,
+                "INSERT INTO ingest_job_files (job_id, file_name, staged_path) VALUES %s",
+                [(job_id, file_name, staged_path) for file_name, staged_path in staged_files]
+            )
+            self.conn.commit()
+            return job_id
+
+    def claim_ingest_job(self, job_id=None, worker_pid=None):
+        """
+        Atomically marks the given (or the oldest) queued job as running and returns it.
+        Returns None when there is nothing to claim or another worker got there first.
+        """
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                UPDATE ingest_jobs SET
+                    status = 'running',
+                    worker_pid = %s,
+                    started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+                    heartbeat_at = CURRENT_TIMESTAMP,
+                    finished_at = NULL
+                WHERE id = (
+                    SELECT id FROM ingest_jobs
+                    WHERE status = 'queued' AND (%s::int IS NULL OR id = %s::int)
+                    ORDER BY id
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING *
+            """, (worker_pid, job_id, job_id))
+            job = cur.fetchone()
+            self.conn.commit()
+            return job
+
+    def get_ingest_job(self, job_id):
+        """Retrieves a single ingest job with its batch name."""
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT j.*, b.name as batch_name,
+                       j.status = 'running' AND j.heartbeat_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second' as is_stale
+                FROM ingest_jobs j
+                LEFT JOIN batches b ON j.batch_id = b.id
+                WHERE j.id = %s
+            """, (INGEST_JOB_STALE_AFTER_SECONDS, job_id))
+            return cur.fetchone()
+
+    def get_recent_ingest_jobs(self, limit=10):
+        """Retrieves the most recent ingest jobs, newest first."""
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT j.*, b.name as batch_name,
+                       j.status = 'running' AND j.heartbeat_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second' as is_stale
+                FROM ingest_jobs j
+                LEFT JOIN batches b ON j.batch_id = b.id
+                ORDER BY j.id DESC
+                LIMIT %s
+            """, (INGEST_JOB_STALE_AFTER_SECONDS, limit))
+            return cur.fetchall()
+
+    def get_ingest_job_files(self, job_id):
+        """Retrieves the per-file progress rows of an ingest job."""
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM ingest_job_files WHERE job_id = %s ORDER BY id", (job_id,))
+            return cur.fetchall()
+
+    def update_ingest_job_file(self, file_id, status=None, records_parsed=None, records_staged=None,
+                               records_inserted=None, records_skipped=None, error=None, parse_stats=None):
+        """
+        Updates the progress of one staged file (fields left as None are not changed),
+        then rolls the file counters up into its ingest job and refreshes the heartbeat.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE ingest_job_files SET
+                    status = COALESCE(%s, status),
+                    records_parsed = COALESCE(%s, records_parsed),
+                    records_staged = COALESCE(%s, records_staged),
+                    records_inserted = COALESCE(%s, records_inserted),
+                    records_skipped = COALESCE(%s, records_skipped),
+                    error = COALESCE(%s, error),
+                    parse_stats = COALESCE(%s, parse_stats),
+                    finished_at = CASE WHEN %s IN ('completed', 'failed', 'cancelled') THEN CURRENT_TIMESTAMP ELSE finished_at END
+                WHERE id = %s
+                RETURNING job_id
+            """, (status, records_parsed, records_staged, records_inserted, records_skipped, error,
+                  Json(parse_stats) if parse_stats is not None else None, status, file_id))
+            job_id = cur.fetchone()[0]
+            # Job totals are always derived from the file rows, so a resumed job never double counts.
+            cur.execute("""
+                UPDATE ingest_jobs j SET
+                    files_done = t.files_done,
+                    records_parsed = t.records_parsed,
+                    records_inserted = t.records_inserted,
+                    records_skipped = t.records_skipped,
+                    errors = t.errors,
+                    last_error = COALESCE(t.last_error, j.last_error),
+                    heartbeat_at = CURRENT_TIMESTAMP
+                FROM (
+                    SELECT
+                        COUNT(*) FILTER (WHERE status = 'completed') as files_done,
+                        COALESCE(SUM(records_parsed), 0) as records_parsed,
+                        COALESCE(SUM(records_inserted), 0) as records_inserted,
+                        COALESCE(SUM(records_skipped), 0) as records_skipped,
+                        COUNT(*) FILTER (WHERE status = 'failed') as errors,
+                        (array_agg(file_name || ': ' || error ORDER BY finished_at DESC) FILTER (WHERE status = 'failed'))[1] as last_error
+                    FROM ingest_job_files
+                    WHERE job_id = %s
+                ) t
+                WHERE j.id = %s
+            """, (job_id, job_id))
+            self.conn.commit()
+
+    def finish_ingest_job(self, job_id, status):
+        """Records the final status ('completed', 'failed' or 'cancelled') of an ingest job."""
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE ingest_jobs SET status = %s, finished_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (status, job_id))
+            self.conn.commit()
+
+    def is_ingest_job_cancel_requested(self, job_id):
+        """Checks whether the user asked to cancel a job; also serves as the worker heartbeat."""
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE ingest_jobs SET heartbeat_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+                RETURNING cancel_requested
+            """, (job_id,))
+            row = cur.fetchone()
+            self.conn.commit()
+            return bool(row and row[0])
+
+    def request_ingest_job_cancel(self, job_id):
+        """
+        Asks the worker to stop a job after the current chunk.
+        Jobs that have not been picked up yet are cancelled immediately.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE ingest_jobs SET
+                    cancel_requested = TRUE,
+                    status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+                    finished_at = CASE WHEN status = 'queued' THEN CURRENT_TIMESTAMP ELSE finished_at END
+                WHERE id = %s AND status IN ('queued', 'running')
+            """, (job_id,))
+            self.conn.commit()
+
+    def resume_ingest_job(self, job_id):
+        """
+        Re-queues a failed, cancelled or abandoned job. Files that were already
+        loaded stay completed, so the worker only processes the remaining ones.
+        Returns True if the job was re-queued.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE ingest_jobs SET status = 'queued', cancel_requested = FALSE, finished_at = NULL
+                WHERE id = %s AND (
+                    status IN ('failed', 'cancelled')
+                    OR (status = 'running' AND heartbeat_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second')
+                )
+            """, (job_id, INGEST_JOB_STALE_AFTER_SECONDS))
+            resumed = cur.rowcount > 0
+            if resumed:
+                cur.execute("""
+                    UPDATE ingest_job_files SET status = 'pending', error = NULL, finished_at = NULL
+                    WHERE job_id = %s AND status <> 'completed'
+                """, (job_id,))
+                # Failed files are retried, so their errors no longer count against the job.
+                cur.execute("""
+                    UPDATE ingest_jobs SET errors = 0, last_error = NULL WHERE id = %s
+                """, (job_id,))
+            self.conn.commit()
+            return resumed
+
+    def record_ingest_rejects(self, job_file_id, rejected_records):
+        """
+        Stores the parser's rejected records for a staged file, replacing any
+        rejects left by an earlier attempt at the same file.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("DELETE FROM ingest_rejects WHERE job_file_id = %s", (job_file_id,))
+            if rejected_records:
+                execute_values(
+                    cur,
+                    "INSERT INTO ingest_rejects (job_file_id, line_no, byte_offset, reason, detail, raw_text) VALUES %s",
+                    [
+                        (job_file_id, r['line_no'], r['byte_offset'], r['reason'], r.get('detail'), r.get('raw_text'))
+                        for r in rejected_records
+                    ]
+                )
+            self.conn.commit()
+
+    def get_ingest_reject_counts(self, job_file_id):
+        """Counts the rejected records of a staged file by reason."""
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT reason, COUNT(*) as count
+                FROM ingest_rejects
+                WHERE job_file_id = %s
+                GROUP BY reason
+                ORDER BY count DESC
+            """, (job_file_id,))
+            return cur.fetchall()
+
+    def get_ingest_rejects(self, job_file_id, reason=None, limit=50, offset=0):
+        """Retrieves rejected records of a staged file in source order, optionally for one reason."""
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT line_no, byte_offset, reason, detail, raw_text
+                FROM ingest_rejects
+                WHERE job_file_id = %s AND (%s::text IS NULL OR reason = %s::text)
+                ORDER BY line_no NULLS LAST, id
+                LIMIT %s OFFSET %s
+            """, (job_file_id, reason, reason, limit, offset))
+            return cur.fetchall()
+
+    # --- Batch Comparison ---
+    def get_batch_diff_summary(self, batch_a, batch_b):
+        """
+        Compares two batches (typically two revisions of the same list) by normalised
+        voter number. Returns the added / removed / changed / unchanged counts and,
+        under 'field_changes', how many changed records differ in each field.
+        """
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(BATCH_DIFF_CTE + """
+                SELECT
+                    COUNT(*) FILTER (WHERE change_type = 'added') AS added,
+                    COUNT(*) FILTER (WHERE change_type = 'removed') AS removed,
+                    COUNT(*) FILTER (WHERE change_type = 'changed') AS changed,
+                    COUNT(*) FILTER (WHERE change_type = 'unchanged') AS unchanged,
+                    (
+                        SELECT COALESCE(jsonb_object_agg(field, count), '{}'::jsonb)
+                        FROM (
+                            SELECT field, COUNT(*) AS count
+                            FROM diff, jsonb_object_keys(diff.changes) AS field
+                            GROUP BY field
+                        ) per_field
+                    ) AS field_changes
+                FROM diff
+            """, {'batch_a': batch_a, 'batch_b': batch_b})
+            return cur.fetchone()
+
+    def get_batch_diff(self, batch_a, batch_b, change_type=None, limit=50, offset=0):
+        """
+        Retrieves one page of the differences between two batches, ordered by voter
+        number. `change_type` limits the page to 'added', 'removed' or 'changed' rows;
+        unchanged records are never returned.
+        """
         with self.conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT id, নাম, ভোটার_নং, পিতার_নাম, মাতার_নাম, photo_link FROM records ORDER BY নাম")
+            cur.execute(BATCH_DIFF_CTE + """
+                SELECT change_type, voter_key, record_a_id, record_b_id,
+                       ভোটার_নং, নাম, পিতার_নাম, ঠিকানা, changes
+                FROM diff
+                WHERE change_type <> 'unchanged'
+                  AND (%(change_type)s::text IS NULL OR change_type = %(change_type)s::text)
+                ORDER BY voter_key
+                LIMIT %(limit)s OFFSET %(offset)s
+            """, {'batch_a': batch_a, 'batch_b': batch_b, 'change_type': change_type, 'limit': limit, 'offset': offset})
             return cur.fetchall()
@@ -0,0 +1,150 @@
+import threading
+import logging
+from collections import deque
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class FamilyGraph:
+    """
+    Process-level adjacency-list copy of the family_connections table.
+
+    The graph is loaded from the database on first use and then kept current by
+    Database.add_family_connection / delete_family_connection, so relationship
+    questions are answered from memory instead of one query per person.
+    Each link is stored once with its label; traversal treats links as undirected
+    and the label seen from the other side comes from family_relationship_types.
+    Writes made by other processes are picked up after invalidate() (e.g. after
+    a batch or the whole database is deleted).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # {source_id: {target_id: {relationship_to_source, ...}}}
+        self._labels = None
+        # {record_id: {neighbour_id, ...}}, ignoring direction
+        self._neighbours = None
+        # {label: inverse_label}
+        self._inverses = {}
+
+    @property
+    def is_loaded(self):
+        return self._neighbours is not None
+
+    def ensure_loaded(self, db):
+        """Loads all family connections through `db` unless the graph is already in memory."""
+        if self._neighbours is not None:
+            return
+        with self._lock:
+            if self._neighbours is not None:
+                return
+            labels = {}
+            neighbours = {}
+            for source_id, target_id, relationship in db.get_all_family_connections():
+                labels.setdefault(source_id, {}).setdefault(target_id, set()).add(relationship)
+                neighbours.setdefault(source_id, set()).add(target_id)
+                neighbours.setdefault(target_id, set()).add(source_id)
+            self._inverses = db.get_family_relationship_types()
+            self._labels = labels
+            self._neighbours = neighbours
+            logger.info(f"Loaded family graph: {len(neighbours)} records, {sum(len(t) for t in labels.values())} connections.")
+
+    def invalidate(self):
+        """Drops the in-memory graph; the next query reloads it from the database."""
+        with self._lock:
+            self._labels = None
+            self._neighbours = None
+
+    def add_connection(self, source_id, target_id, relationship):
+        """Mirrors a connection inserted into family_connections. Ignored until the graph is loaded."""
+        with self._lock:
+            if self._neighbours is None:
+                return
+            self._labels.setdefault(source_id, {}).setdefault(target_id, set()).add(relationship)
+            self._neighbours.setdefault(source_id, set()).add(target_id)
+            self._neighbours.setdefault(target_id, set()).add(source_id)
+
+    def remove_connection(self, source_id, target_id, relationship):
+        """Mirrors a connection deleted from family_connections."""
+        with self._lock:
+            if self._neighbours is None:
+                return
+            forward = self._labels.get(source_id, {})
+            forward.get(target_id, set()).discard(relationship)
+            if not forward.get(target_id, True):
+                del forward[target_id]
+            # The records stay neighbours while a connection remains in either direction
+            if target_id not in forward and source_id not in self._labels.get(target_id, {}):
+                self._neighbours.get(source_id, set()).discard(target_id)
+                self._neighbours.get(target_id, set()).discard(source_id)
+
+    def relationship(self, source_id, target_id):
+        """
+        Label describing `target_id` relative to `source_id`, derived from the inverse
+        label when the link was saved from the other side. None if it is not known.
+        """
+        labels = self._labels.get(source_id, {}).get(target_id)
+        if labels:
+            return min(labels)
+        reverse_labels = self._labels.get(target_id, {}).get(source_id)
+        if reverse_labels:
+            return self._inverses.get(min(reverse_labels))
+        return None
+
+    def shortest_path(self, db, source_id, target_id, max_depth=None):
+        """
+        Breadth-first search for the shortest chain of connections between two records.
+        Returns [(record_id, relationship_to_previous), ...] starting with
+        (source_id, None), or None when the records are not connected.
+        """
+        self.ensure_loaded(db)
+        with self._lock:
+            if source_id == target_id:
+                return [(source_id, None)]
+            previous = {source_id: None}
+            frontier = deque([(source_id, 0)])
+            while frontier:
+                record_id, depth = frontier.popleft()
+                if max_depth is not None and depth >= max_depth:
+                    continue
+                for neighbour_id in self._neighbours.get(record_id, ()):
+                    if neighbour_id in previous:
+                        continue
+                    previous[neighbour_id] = record_id
+                    if neighbour_id == target_id:
+                        path = []
+                        step = target_id
+                        while step is not None:
+                            path.append(step)
+                            step = previous[step]
+                        path.reverse()
+                        return [(path[0], None)] + [
+                            (path[i], self.relationship(path[i - 1], path[i])) for i in range(1, len(path))
+                        ]
+                    frontier.append((neighbour_id, depth + 1))
+            return None
+
+    def neighbourhood(self, db, record_id, hops=1):
+        """Returns {record_id: distance} for every record within `hops` connections, including the record itself."""
+        self.ensure_loaded(db)
+        with self._lock:
+            distances = {record_id: 0}
+            frontier = deque([record_id])
+            while frontier:
+                current = frontier.popleft()
+                if distances[current] >= hops:
+                    continue
+                for neighbour_id in self._neighbours.get(current, ()):
+                    if neighbour_id not in distances:
+                        distances[neighbour_id] = distances[current] + 1
+                        frontier.append(neighbour_id)
+            return distances
+
+    def connected_component(self, db, record_id):
+        """Returns the set of all records linked to `record_id` through any chain of connections."""
+        return set(self.neighbourhood(db, record_id, hops=float('inf')))
+
+
+# Shared by every Database instance in the process
+family_graph = FamilyGraph()
@@ -0,0 +1,72 @@
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Records of one batch sharing a normalised address are one household only when the
+# address is specific enough. Voter lists often carry a village or ward as the
+# address, and hundreds of voters sharing it are not a household.
+HOUSEHOLD_MAX_ADDRESS_GROUP = 12
+
+
+class UnionFind:
+    """Disjoint-set forest over record ids; the representative of a set is its smallest id."""
+
+    def __init__(self, ids=()):
+        self.parent = {record_id: record_id for record_id in ids}
+
+    def find(self, record_id):
+        parent = self.parent.setdefault(record_id, record_id)
+        if parent == record_id:
+            return record_id
+        root = record_id
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Path compression
+        while self.parent[record_id] != root:
+            self.parent[record_id], record_id = root, self.parent[record_id]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            # Keep the smaller id as root so it doubles as the household id
+            if root_b < root_a:
+                root_a, root_b = root_b, root_a
+            self.parent[root_b] = root_a
+
+
+def compute_households(records, links, max_address_group=HOUSEHOLD_MAX_ADDRESS_GROUP, address_group_sizes=None):
+    """
+    Groups records into households.
+
+    `records` is an iterable of (record_id, batch_id, address_key) and `links` of
+    (record_id, record_id) family connections. Records connected through any chain
+    of family links are one household, and so are records of the same batch with
+    the same normalised address (for addresses shared by at most
+    `max_address_group` records). When only some households are recomputed,
+    `address_group_sizes` gives the number of records of each (batch_id,
+    address_key) in the whole table, so a partly loaded address group is not
+    taken for a small one. Returns {record_id: household_id}, where the household
+    id is the smallest record id in the household.
+    """
+    records = list(records)
+    households = UnionFind(record_id for record_id, _, _ in records)
+
+    address_groups = {}
+    for record_id, batch_id, address in records:
+        if address:
+            address_groups.setdefault((batch_id, address), []).append(record_id)
+    for group, members in address_groups.items():
+        size = address_group_sizes.get(group, len(members)) if address_group_sizes else len(members)
+        if 1 < len(members) and size <= max_address_group:
+            for record_id in members[1:]:
+                households.union(members[0], record_id)
+
+    known = households.parent.keys()
+    for source_id, target_id in links:
+        # Links to records outside this set (e.g. a partial recompute) are ignored
+        if source_id in known and target_id in known:
+            households.union(source_id, target_id)
+
+    return {record_id: households.find(record_id) for record_id, _, _ in records}
@@ -0,0 +1,227 @@
+import os
+import sys
+import hashlib
+import shutil
+import subprocess
+import tempfile
+import logging
+
+from attached_assets.data_processor import process_text_file_with_report
+from attached_assets.tabular_processor import TABULAR_EXTENSIONS, read_tabular_file, process_tabular_frame
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Uploaded files are written here before the worker picks them up.
+INGEST_STAGING_DIR = os.environ.get('INGEST_STAGING_DIR', os.path.join(PROJECT_ROOT, 'ingest_staging'))
+
+# Records are copied into the staging table in chunks of this size; cancellation is checked between chunks.
+INGEST_CHUNK_SIZE = 2000
+
+# Spreadsheets are already columnar, so they are staged in much larger chunks.
+TABULAR_CHUNK_SIZE = 50000
+
+WORKER_SCRIPT = os.path.join(PROJECT_ROOT, 'ingest_worker.py')
+
+
+def stage_uploaded_files(uploaded_files):
+    """
+    Writes Streamlit uploaded files to a fresh job directory on disk.
+    Returns (staging_dir, [(file_name, staged_path), ...]).
+    """
+    os.makedirs(INGEST_STAGING_DIR, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix='job_', dir=INGEST_STAGING_DIR)
+    staged_files = []
+    for index, uploaded_file in enumerate(uploaded_files):
+        file_name = os.path.basename(uploaded_file.name)
+        # Prefix with the position so two uploads with the same name never overwrite each other.
+        staged_path = os.path.join(staging_dir, f"{index:04d}_{file_name}")
+        with open(staged_path, 'wb') as f:
+            f.write(uploaded_file.getbuffer())
+        staged_files.append((file_name, staged_path))
+    return staging_dir, staged_files
+
+
+def start_ingest_worker(job_id):
+    """Launches ingest_worker.py for a job in a detached process, so it survives page reruns."""
+    log_path = os.path.join(INGEST_STAGING_DIR, 'worker.log')
+    os.makedirs(INGEST_STAGING_DIR, exist_ok=True)
+    with open(log_path, 'ab') as log_file:
+        subprocess.Popen(
+            [sys.executable, WORKER_SCRIPT, '--job-id', str(job_id)],
+            cwd=PROJECT_ROOT,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            start_new_session=True
+        )
+    logger.info(f"Started ingest worker for job {job_id}.")
+
+
+# Reasons recorded in ingest_rejects for rows dropped by Database.merge_staged_records.
+MERGE_REJECT_REASONS = {
+    'invalid': 'invalid_required_fields',
+    'duplicate_in_file': 'duplicate_voter_no_in_file',
+    'duplicate_in_batch': 'duplicate_voter_no_in_batch',
+}
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a staged file, stored with the batch's files row."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_parse_stats(report):
+    """Keeps the summary part of a parser report; per-record details live in ingest_rejects."""
+    return {
+        'records_found': report['records_found'],
+        'records_accepted': report['records_accepted'],
+        'records_rejected': report['records_rejected'],
+        'rejected_by_reason': dict(report['rejected_by_reason']),
+        'date_formats': dict(report['date_formats']),
+        'parse_seconds': report['parse_seconds'],
+        'unmapped_columns': report.get('unmapped_columns', []),
+    }
+
+
+def process_ingest_job(job_db, data_db, job):
+    """
+    Parses and loads every pending file of a claimed job.
+
+    `job_db` is used for progress bookkeeping, which is committed immediately so
+    the upload page can poll it. Each file is copied into the unlogged staging
+    table in chunks and then merged into records with one short INSERT ... SELECT,
+    so a failed or cancelled file never leaves partial rows in records, and
+    resuming the job only reprocesses unfinished files. Records merged before a
+    cancel are still post-processed. Returns the final job status.
+    """
+    job_id = job['id']
+    cancelled = False
+    for job_file in job_db.get_ingest_job_files(job_id):
+        if job_file['status'] == 'completed':
+            continue
+
+        if job_db.is_ingest_job_cancel_requested(job_id):
+            cancelled = True
+            break
+
+        load_id = f"job{job_id}_file{job_file['id']}"
+        # Clear leftovers from an earlier, interrupted attempt at this file.
+        data_db.discard_staged_records(load_id)
+        job_db.update_ingest_job_file(job_file['id'], status='running', records_staged=0, records_inserted=0)
+        try:
+            is_tabular = os.path.splitext(job_file['file_name'])[1].lower() in TABULAR_EXTENSIONS
+            if is_tabular:
+                frame = read_tabular_file(job_file['staged_path'], job_file['file_name'])
+                records, report = process_tabular_frame(frame, default_gender=job['default_gender'])
+                chunk_size = TABULAR_CHUNK_SIZE
+            else:
+                with open(job_file['staged_path'], 'rb') as f:
+                    content = f.read().decode('utf-8')
+                records, report = process_text_file_with_report(content, default_gender=job['default_gender'])
+                chunk_size = INGEST_CHUNK_SIZE
+            parse_stats = build_parse_stats(report)
+            job_db.record_ingest_rejects(job_file['id'], report['rejected_records'])
+            job_db.update_ingest_job_file(
+                job_file['id'],
+                records_parsed=report['records_found'],
+                records_skipped=report['records_rejected'],
+                parse_stats=parse_stats
+            )
+
+            staged = 0
+            for start in range(0, len(records), chunk_size):
+                if job_db.is_ingest_job_cancel_requested(job_id):
+                    data_db.discard_staged_records(load_id)
+                    job_db.update_ingest_job_file(job_file['id'], status='cancelled', records_staged=0)
+                    cancelled = True
+                    break
+                if is_tabular:
+                    staged += data_db.stage_frame(
+                        load_id, job['batch_id'], job_file['file_name'],
+                        records.iloc[start:start + chunk_size], start_seq=start
+                    )
+                else:
+                    staged += data_db.stage_records(
+                        load_id, job['batch_id'], job_file['file_name'],
+                        records[start:start + chunk_size], start_seq=start,
+                        positions=report['accepted_positions'][start:start + chunk_size]
+                    )
+                job_db.update_ingest_job_file(job_file['id'], records_staged=staged)
+            if cancelled:
+                break
+
+            merge_result = data_db.merge_staged_records(
+                load_id, job_file_id=job_file['id'], content_hash=file_sha256(job_file['staged_path'])
+            )
+            for reason in ('invalid', 'duplicate_in_file', 'duplicate_in_batch'):
+                if merge_result[reason]:
+                    merge_reason = MERGE_REJECT_REASONS[reason]
+                    parse_stats['rejected_by_reason'][merge_reason] = merge_result[reason]
+            parse_stats['records_inserted'] = merge_result['inserted']
+            skipped = report['records_rejected'] + merge_result['invalid'] + merge_result['duplicate_in_file'] + merge_result['duplicate_in_batch']
+            job_db.update_ingest_job_file(
+                job_file['id'], status='completed',
+                records_inserted=merge_result['inserted'], records_skipped=skipped,
+                parse_stats=parse_stats
+            )
+            logger.info(f"Job {job_id}: loaded {merge_result['inserted']} records from '{job_file['file_name']}'.")
+
+        except Exception as e:
+            data_db.rollback_changes()
+            data_db.discard_staged_records(load_id)
+            logger.error(f"Job {job_id}: failed to load '{job_file['file_name']}': {e}")
+            job_db.update_ingest_job_file(job_file['id'], status='failed', records_staged=0, error=str(e))
+
+    final_job = job_db.get_ingest_job(job_id)
+    if cancelled:
+        status = 'cancelled'
+    else:
+        status = 'failed' if final_job['errors'] else 'completed'
+    job_db.finish_ingest_job(job_id, status)
+    if status == 'completed':
+        # Staged copies are only needed while the job can still be resumed.
+        shutil.rmtree(job['staging_dir'], ignore_errors=True)
+
+    # Files merged before a cancel or a failed file keep their records; finish them too.
+    if final_job['records_inserted']:
+        # Match the new records' পেশা values to canonical occupations.
+        try:
+            data_db.assign_occupations(batch_id=job['batch_id'])
+            data_db.commit_changes()
+        except Exception as e:
+            data_db.rollback_changes()
+            logger.error(f"Job {job_id}: could not assign occupations: {e}")
+        # Parse the new records' addresses into localities.
+        try:
+            data_db.assign_localities(batch_id=job['batch_id'])
+            data_db.commit_changes()
+        except Exception as e:
+            data_db.rollback_changes()
+            logger.error(f"Job {job_id}: could not assign localities: {e}")
+        # New voters may be the parents named on other records of the batch.
+        try:
+            data_db.generate_family_link_suggestions(job['batch_id'])
+        except Exception as e:
+            data_db.rollback_changes()
+            logger.error(f"Job {job_id}: could not generate family link suggestions: {e}")
+        # New records start without a household; group them with their address matches.
+        try:
+            data_db.assign_new_households(job['batch_id'])
+            data_db.commit_changes()
+        except Exception as e:
+            data_db.rollback_changes()
+            logger.error(f"Job {job_id}: could not assign households: {e}")
+        # Aggregate the new records now rather than on the next analysis page load.
+        try:
+            data_db.refresh_analytics_cube()
+        except Exception as e:
+            data_db.rollback_changes()
+            logger.error(f"Job {job_id}: could not refresh the analytics cube: {e}")
+    return status
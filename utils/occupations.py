@@ -0,0 +1,122 @@
+import os
+import sys
+import re
+import difflib
+import argparse
+import unicodedata
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Canonical occupations and the spellings voter lists use for them. Values matching
+# none of these (after occupation_key) become occupations of their own.
+OCCUPATION_DICTIONARY = {
+    'কৃষক': ('কৃষি', 'কৃষি কাজ', 'কৃষিজীবী', 'কৃষান', 'চাষী', 'চাষাবাদ', 'farmer', 'agriculture', 'cultivation'),
+    'গৃহিণী': ('গৃহিনী', 'গৃহিনি', 'গৃহকর্ম', 'গৃহস্থালী', 'গৃহস্থালি কাজ', 'housewife', 'house wife', 'homemaker'),
+    'ছাত্র/ছাত্রী': ('ছাত্র', 'ছাত্রী', 'শিক্ষার্থী', 'student'),
+    'ব্যবসা': ('ব্যবসায়ী', 'ব্যাবসা', 'ব্যাবসায়ী', 'ব্যবসায়', 'business', 'businessman'),
+    'চাকরি': ('চাকুরী', 'চাকুরি', 'চাকরী', 'চাকরিজীবী', 'চাকুরিজীবী', 'service', 'job'),
+    'সরকারি চাকরি': ('সরকারী চাকরি', 'সরকারি চাকুরী', 'সরকারী চাকুরী', 'govt service', 'government service'),
+    'বেসরকারি চাকরি': ('বেসরকারী চাকরি', 'বেসরকারি চাকুরী', 'বেসরকারী চাকুরী', 'বেসরকারি চাকুরি',
+                        'প্রাইভেট চাকরি', 'private service', 'private job'),
+    'ব্যাংকার': ('ব্যাংক কর্মকর্তা', 'ব্যাংক কর্মচারী', 'ব্যাংক চাকরি', 'ব্যাংকে চাকরি', 'banker', 'bank officer'),
+    'শিক্ষক': ('শিক্ষিকা', 'শিক্ষকতা', 'teacher'),
+    'শ্রমিক': ('দিনমজুর', 'মজুর', 'শ্রমজীবী', 'labour', 'labor', 'day labourer', 'worker'),
+    'গার্মেন্টস কর্মী': ('গার্মেন্টস', 'গার্মেন্টস শ্রমিক', 'পোশাক শ্রমিক', 'garments', 'garments worker'),
+    'ড্রাইভার': ('চালক', 'গাড়ি চালক', 'গাড়িচালক', 'driver'),
+    'প্রবাসী': ('প্রবাস', 'বিদেশ', 'expatriate'),
+    'ডাক্তার': ('চিকিৎসক', 'doctor'),
+    'জেলে': ('মৎস্যজীবী', 'মৎস্য শিকারী', 'fisherman'),
+    'অবসরপ্রাপ্ত': ('অবসর', 'retired'),
+    'বেকার': ('কর্মহীন', 'unemployed'),
+}
+
+# Minimum difflib ratio for a value to be matched to a known occupation by spelling
+# similarity; keys shorter than OCCUPATION_FUZZY_MIN_LENGTH are only matched exactly.
+# A similar key must also start with the same letter and differ in length by at most
+# OCCUPATION_FUZZY_MAX_LENGTH_DIFF, so a misspelling matches but "ব্যাংকার" does not
+# become "বেকার"; anything further apart is left as an occupation of its own.
+OCCUPATION_FUZZY_CUTOFF = 0.9
+OCCUPATION_FUZZY_MIN_LENGTH = 4
+OCCUPATION_FUZZY_MAX_LENGTH_DIFF = 1
+
+# Spelling variants folded together by occupation_key (long and short vowel signs,
+# the three sibilants, ণ/ন, khanda ta, chandrabindu).
+OCCUPATION_SPELLING_FOLDS = str.maketrans({
+    'ী': 'ি', 'ূ': 'ু', 'ণ': 'ন', 'ষ': 'স', 'শ': 'স', 'ৎ': 'ত', 'ঁ': None,
+})
+
+
+def occupation_key(value):
+    """
+    Normalised spelling of an occupation used for matching: NFC, lower case,
+    OCCUPATION_SPELLING_FOLDS applied, punctuation and whitespace dropped.
+    Returns None for empty values.
+    """
+    if value is None:
+        return None
+    key = unicodedata.normalize('NFC', str(value)).lower().translate(OCCUPATION_SPELLING_FOLDS)
+    key = re.sub(r'[\W_]+', '', key)
+    return key or None
+
+
+def clean_occupation(value):
+    """The value as shown when it becomes an occupation of its own: trimmed, whitespace collapsed, trailing punctuation dropped."""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', str(value))).strip(' .,;:-।')
+
+
+class OccupationMatcher:
+    """
+    Maps free-text পেশা values to canonical occupation names: first by exact
+    occupation_key against OCCUPATION_DICTIONARY and the known occupations, then
+    by spelling similarity. Values matching nothing become new occupations, which
+    later values can match in turn.
+    """
+
+    def __init__(self, known_names=()):
+        # {occupation_key: canonical name}
+        self._names = {}
+        for name, variants in OCCUPATION_DICTIONARY.items():
+            for spelling in (name,) + variants:
+                self._names.setdefault(occupation_key(spelling), name)
+        for name in known_names:
+            self._names.setdefault(occupation_key(name), name)
+
+    def match(self, value):
+        """Canonical occupation name for `value`, or None when it is empty."""
+        key = occupation_key(value)
+        if key is None:
+            return None
+        name = self._names.get(key)
+        if name is None and len(key) >= OCCUPATION_FUZZY_MIN_LENGTH:
+            candidates = [known for known in self._names
+                          if known[0] == key[0] and abs(len(known) - len(key)) <= OCCUPATION_FUZZY_MAX_LENGTH_DIFF]
+            close = difflib.get_close_matches(key, candidates, n=1, cutoff=OCCUPATION_FUZZY_CUTOFF)
+            if close:
+                name = self._names[close[0]]
+                logger.info(f"Matched occupation {value!r} to {name!r} by spelling")
+        if name is None:
+            name = clean_occupation(value)
+        self._names[key] = name
+        return name
+
+
+if __name__ == "__main__":
+    # Allow `python utils/occupations.py` as well as `python -m utils.occupations`
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.database import Database
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Assigns canonical occupations to records that do not have one yet.")
+    parser.add_argument("--batch-id", type=int, help="Only assign the records of this batch.")
+    parser.add_argument("--rematch", action="store_true",
+                        help="Forget earlier matches and match every value again, e.g. after editing OCCUPATION_DICTIONARY.")
+    args = parser.parse_args()
+    db = Database()
+    try:
+        changed = db.assign_occupations(batch_id=args.batch_id, rematch=args.rematch)
+        db.commit_changes()
+        print(f"{changed} records changed occupation.")
+    finally:
+        db.conn.close()